@@ -0,0 +1,436 @@
+"""
+Inference Backends for Ask Rumi Backend
+A common interface over inference engines: Ollama over HTTP and an optional
+in-process llama.cpp engine for GGUF models.
+"""
+
+import asyncio
+import json
+import logging
+import math
+import threading
+import time
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, AsyncGenerator, Callable, Dict, Optional, Tuple
+
+import httpx
+
+from core.deadline import remaining_time
+from core.model_manager import get_residency_manager
+from core.provider_health import get_provider_health
+
+if TYPE_CHECKING:
+    from core.local_runner import InferenceRequest
+
+logger = logging.getLogger(__name__)
+
+NS_PER_SECOND = 1_000_000_000
+
+# Seconds a backend HTTP call may wait on the server; a request deadline caps it further
+BACKEND_TIMEOUT = 60.0
+
+def backend_timeout() -> httpx.Timeout:
+    """HTTP timeout for a backend call made on behalf of the current request"""
+    return httpx.Timeout(remaining_time(BACKEND_TIMEOUT))
+
+def ollama_metrics(data: Dict[str, Any]) -> Dict[str, Any]:
+    """Convert the counters of a final Ollama response into InferenceResponse fields"""
+    metrics: Dict[str, Any] = {}
+    if "prompt_eval_count" in data:
+        metrics["prompt_tokens"] = data["prompt_eval_count"]
+    if "eval_count" in data:
+        metrics["tokens_used"] = data["eval_count"]
+    for source, target in (
+        ("prompt_eval_duration", "prompt_eval_time"),
+        ("eval_duration", "eval_time"),
+        ("load_duration", "load_time")
+    ):
+        if data.get(source) is not None:
+            metrics[target] = data[source] / NS_PER_SECOND
+
+    if metrics.get("tokens_used") and metrics.get("eval_time"):
+        metrics["tokens_per_second"] = metrics["tokens_used"] / metrics["eval_time"]
+    return metrics
+
+SENTENCE_END = ".!?"
+CLOSING_CHARS = "\"')]”’"
+
+class GenerationBudget:
+    """Counts generated words and decides when to stop at a sentence boundary"""
+
+    # Extra words allowed past the limit when no sentence end shows up, since
+    # post-processing may still strip some of the generated text
+    GRACE_WORDS = 30
+    # Rough tokens per English word, to express the word budget in tokens
+    TOKENS_PER_WORD = 1.3
+
+    def __init__(self, max_words: int):
+        self.max_words = max_words
+        self.words = 0
+        self._in_word = False
+
+    def update(self, text: str) -> bool:
+        """Account for newly generated text; returns True when generation should stop"""
+        for ch in text:
+            if ch.isspace():
+                self._in_word = False
+            elif not self._in_word:
+                self._in_word = True
+                self.words += 1
+
+        if self.words < self.max_words:
+            return False
+        if self.words >= self.max_words + self.GRACE_WORDS:
+            return True
+
+        tail = text.rstrip().rstrip(CLOSING_CHARS)
+        return bool(tail) and tail[-1] in SENTENCE_END
+
+    def tokens_saved(self, tokens_generated: int, max_tokens: Optional[int] = None) -> int:
+        """Estimated tokens not generated by stopping now
+
+        Measured against the budget's own hard limit (words plus grace, in
+        tokens) rather than max_tokens, which is usually far above what the
+        reply would have used; max_tokens still caps it.
+        """
+        limit = math.ceil((self.max_words + self.GRACE_WORDS) * self.TOKENS_PER_WORD)
+        if max_tokens:
+            limit = min(limit, max_tokens)
+        return max(limit - tokens_generated, 0)
+
+class StreamStats:
+    """Token timing for a streamed generation, for backends without their own counters"""
+
+    def __init__(self, request: "InferenceRequest"):
+        self.request = request
+        self.budget = GenerationBudget(request.max_words) if request.max_words else None
+        self.tokens = 0
+        self.stopped_early = False
+        self.start = time.perf_counter()
+        self.first_token_at: Optional[float] = None
+        self.last_token_at: Optional[float] = None
+
+    def token(self, text: str, final: bool = False) -> bool:
+        """Record one generated chunk; returns True when the word budget says stop"""
+        self.tokens += 1
+        self.last_token_at = time.perf_counter()
+        if self.first_token_at is None:
+            self.first_token_at = self.last_token_at
+        if self.budget is not None and not final and self.budget.update(text):
+            self.stopped_early = True
+        return self.stopped_early
+
+    def metrics(self, reported: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Backend-reported metrics completed with what was measured while streaming"""
+        metrics = dict(reported or {})
+        if self.first_token_at is not None:
+            metrics["time_to_first_token"] = self.first_token_at - self.start
+        if "tokens_used" not in metrics:
+            # Aborted before the backend reported its counters - use what we streamed
+            metrics["tokens_used"] = self.tokens
+            if self.first_token_at is not None and self.last_token_at > self.first_token_at and self.tokens > 1:
+                metrics["tokens_per_second"] = (self.tokens - 1) / (self.last_token_at - self.first_token_at)
+
+        tokens_saved = None
+        if self.stopped_early:
+            tokens_saved = self.budget.tokens_saved(self.tokens, self.request.max_tokens)
+            logger.info(f"Stopped {self.request.model} early at {self.budget.words} words, ~{tokens_saved} tokens saved")
+
+        metrics["stopped_early"] = self.stopped_early
+        metrics["tokens_saved"] = tokens_saved
+        return metrics
+
+class InferenceBackend(ABC):
+    """
+    An engine that generates text for a model
+
+    `generate` yields `{"content": ...}` events followed by one
+    `{"done": True, "metrics": {...}}` event, stopping at the first sentence
+    end past `request.max_words` when it is set. Backends that cannot stream
+    leave `supports_streaming` off and are read through `complete`.
+    """
+
+    name: str = ""
+    # Provider whose health and circuit breaker apply to this backend, if any
+    provider: Optional[str] = None
+    supports_streaming: bool = False
+
+    async def unavailable_reason(self) -> Optional[str]:
+        """Why the backend cannot serve requests right now, if it cannot"""
+        return None
+
+    @abstractmethod
+    async def is_model_available(self, model: str) -> bool:
+        """Whether the model can be served without downloading anything"""
+
+    async def prepare(self, model: str):
+        """Get the model ready before a request (load it, make room for it)"""
+
+    async def warm_up(self, model: str) -> bool:
+        """Load a model ahead of its request; returns whether it was not loaded yet"""
+        await self.prepare(model)
+        return False
+
+    @abstractmethod
+    def generate(self, request: "InferenceRequest") -> AsyncGenerator[Dict[str, Any], None]:
+        """Stream generation events"""
+
+    async def complete(self, request: "InferenceRequest") -> Tuple[str, Dict[str, Any]]:
+        """Run a whole generation, returning the text and backend metrics"""
+        parts = []
+        metrics: Dict[str, Any] = {}
+        async for event in self.generate(request):
+            if event.get("done"):
+                metrics = event["metrics"]
+            else:
+                parts.append(event["content"])
+        return "".join(parts).strip(), metrics
+
+    async def close(self):
+        """Release resources held by the backend"""
+
+class OllamaBackend(InferenceBackend):
+    """Models served by a local Ollama server over its HTTP API"""
+
+    name = "ollama"
+    provider = "ollama"
+    supports_streaming = True
+
+    def __init__(self, get_client: Callable[[], httpx.AsyncClient]):
+        self._get_client = get_client
+
+    async def unavailable_reason(self) -> Optional[str]:
+        # Only an open circuit refuses requests; a single failed probe does not
+        health_monitor = get_provider_health()
+        if health_monitor.is_available("ollama"):
+            return None
+        cached = health_monitor.cached("ollama")
+        detail = f": {cached.message}" if cached is not None else ""
+        return f"Provider ollama is unavailable, circuit open after {health_monitor.breaker('ollama').failures} failures{detail}"
+
+    async def is_model_available(self, model: str) -> bool:
+        # Installed models come from the cached Ollama health probe
+        health_monitor = get_provider_health()
+        health = await health_monitor.check("ollama")
+        if not health.healthy:
+            # Without a model list, let the request try; its outcome feeds the circuit breaker
+            return health_monitor.is_available("ollama")
+        if any(model in name for name in health.models or []):
+            return True
+        # A model pulled since the last probe is not in the cached list yet
+        health = await health_monitor.check("ollama", force=True)
+        return health.healthy and any(model in name for name in health.models or [])
+
+    async def prepare(self, model: str):
+        await get_residency_manager().prepare(model)
+
+    async def warm_up(self, model: str) -> bool:
+        # An empty generate with keep_alive loads the model without producing tokens
+        return await get_residency_manager().warm(model)
+
+    def _build_payload(self, request: "InferenceRequest", stream: bool) -> Dict[str, Any]:
+        """Build an Ollama /api/generate payload"""
+        payload = {
+            "model": request.model,
+            "prompt": request.prompt,
+            "stream": stream
+        }
+        payload["keep_alive"] = get_residency_manager().keep_alive_for(request.model)
+
+        # Add optional parameters
+        options = {}
+        if request.temperature is not None:
+            options["temperature"] = request.temperature
+        if request.max_tokens is not None:
+            options["num_predict"] = request.max_tokens
+        if options:
+            payload["options"] = options
+
+        return payload
+
+    async def complete(self, request: "InferenceRequest") -> Tuple[str, Dict[str, Any]]:
+        """Run inference using Ollama, returning the text and backend metrics"""
+        if request.max_words:
+            # Stream so generation can be aborted once the word budget is spent
+            logger.info(f"Running budgeted Ollama inference for model: {request.model} ({request.max_words} words)")
+            return await super().complete(request)
+
+        logger.info(f"Running Ollama inference for model: {request.model}")
+        response = await self._get_client().post(
+            "/api/generate",
+            json=self._build_payload(request, stream=False),
+            timeout=backend_timeout()
+        )
+        if response.status_code != 200:
+            error_msg = f"Ollama API error: {response.status_code} - {response.text}"
+            logger.error(error_msg)
+            raise Exception(error_msg)
+
+        result = response.json()
+        metrics = ollama_metrics(result)
+        # Without streaming the first token arrives after load and prompt processing
+        metrics["time_to_first_token"] = (
+            (metrics.get("load_time") or 0.0) + (metrics.get("prompt_eval_time") or 0.0)
+        ) or None
+        logger.info("Ollama inference completed successfully")
+        return result.get("response", "").strip(), metrics
+
+    async def generate(self, request: "InferenceRequest") -> AsyncGenerator[Dict[str, Any], None]:
+        """Stream generation events from the Ollama HTTP API
+
+        Closing this generator closes the HTTP stream, which makes Ollama abort
+        the generation.
+        """
+        payload = self._build_payload(request, stream=True)
+        stats = StreamStats(request)
+        final: Dict[str, Any] = {}
+
+        async with self._get_client().stream("POST", "/api/generate", json=payload, timeout=backend_timeout()) as response:
+            if response.status_code != 200:
+                body = await response.aread()
+                raise Exception(f"Ollama API error: {response.status_code} - {body.decode(errors='replace')}")
+
+            async for line in response.aiter_lines():
+                if not line.strip():
+                    continue
+
+                data = json.loads(line)
+                if data.get("error"):
+                    raise Exception(data["error"])
+
+                text = data.get("response")
+                if text:
+                    # Ollama streams one token per chunk
+                    stop = stats.token(text, final=data.get("done", False))
+                    yield {"content": text}
+                    if stop:
+                        break
+
+                if data.get("done"):
+                    final = data
+                    break
+
+        yield {"done": True, "metrics": stats.metrics(ollama_metrics(final))}
+
+class LlamaCppBackend(InferenceBackend):
+    """
+    GGUF models run in-process with llama-cpp-python
+
+    Avoids the HTTP hop and JSON framing of a separate server, which matters on
+    CPU-only nodes. llama_cpp is imported on first use, so the backend costs
+    nothing when it is not installed or not used. A model context is not
+    thread-safe, so generations on the same model run one at a time.
+    """
+
+    name = "llama_cpp"
+    supports_streaming = True
+
+    def __init__(self, n_ctx: int = 2048, n_threads: Optional[int] = None, n_gpu_layers: int = 0):
+        self.n_ctx = n_ctx
+        self.n_threads = n_threads
+        self.n_gpu_layers = n_gpu_layers
+        self._models: Dict[str, Any] = {}
+        self._locks: Dict[str, asyncio.Lock] = {}
+
+    @staticmethod
+    def installed() -> bool:
+        try:
+            import llama_cpp  # noqa: F401
+            return True
+        except ImportError:
+            return False
+
+    async def unavailable_reason(self) -> Optional[str]:
+        if not self.installed():
+            return "llama-cpp-python is not installed (pip install llama-cpp-python)"
+        return None
+
+    @staticmethod
+    def model_path(model: str) -> Path:
+        """GGUF file for a registry model: its `model_path`, else local_models/<name>.gguf"""
+        from core.model_manager import get_model_registry
+
+        registry = get_model_registry()
+        info = registry.get_model(registry.resolve(model).name)
+        if info is not None and info.model_path:
+            return Path(info.model_path)
+        return Path("local_models") / f"{model}.gguf"
+
+    async def is_model_available(self, model: str) -> bool:
+        return model in self._models or self.model_path(model).exists()
+
+    def _load(self, model: str):
+        from llama_cpp import Llama
+
+        path = self.model_path(model)
+        logger.info(f"Loading GGUF model {model} from {path}")
+        return Llama(
+            model_path=str(path),
+            n_ctx=self.n_ctx,
+            n_threads=self.n_threads,
+            n_gpu_layers=self.n_gpu_layers,
+            verbose=False
+        )
+
+    async def prepare(self, model: str):
+        lock = self._locks.setdefault(model, asyncio.Lock())
+        if model not in self._models:
+            async with lock:
+                if model not in self._models:
+                    self._models[model] = await asyncio.to_thread(self._load, model)
+
+    async def warm_up(self, model: str) -> bool:
+        cold = model not in self._models
+        await self.prepare(model)
+        return cold
+
+    async def generate(self, request: "InferenceRequest") -> AsyncGenerator[Dict[str, Any], None]:
+        """Stream tokens from llama.cpp running in a worker thread"""
+        await self.prepare(request.model)
+        llm = self._models[request.model]
+        loop = asyncio.get_running_loop()
+        queue: asyncio.Queue = asyncio.Queue()
+        cancel = threading.Event()
+        stats = StreamStats(request)
+
+        def run():
+            try:
+                chunks = llm.create_completion(
+                    request.prompt,
+                    max_tokens=request.max_tokens or 256,
+                    temperature=request.temperature if request.temperature is not None else 0.8,
+                    top_p=request.top_p if request.top_p is not None else 0.95,
+                    stream=True
+                )
+                for chunk in chunks:
+                    if cancel.is_set():
+                        break
+                    loop.call_soon_threadsafe(queue.put_nowait, ("token", chunk["choices"][0].get("text", "")))
+                loop.call_soon_threadsafe(queue.put_nowait, ("done", None))
+            except Exception as e:
+                loop.call_soon_threadsafe(queue.put_nowait, ("error", e))
+
+        async with self._locks.setdefault(request.model, asyncio.Lock()):
+            worker = loop.run_in_executor(None, run)
+            try:
+                while True:
+                    kind, value = await queue.get()
+                    if kind == "error":
+                        raise value
+                    if kind == "done":
+                        break
+                    if value:
+                        stop = stats.token(value)
+                        yield {"content": value}
+                        if stop:
+                            break
+            finally:
+                # Stop the worker thread (early stop, error or client disconnect)
+                cancel.set()
+                await worker
+
+        yield {"done": True, "metrics": stats.metrics()}
+
+    async def close(self):
+        self._models.clear()
@@ -1,146 +1,85 @@
 """
-Core configuration and GPU management for Ask Rumi Backend
-Handles device detection, configuration, and GPU switching.
+Core configuration for Ask Rumi Backend
+Device detection and switching live in core.gpu_manager.
 """
 
 import os
-import torch
 import json
 from pathlib import Path
-from typing import Dict, Any, Optional
+from typing import List, Optional
 from pydantic import BaseModel
 import logging
+import psutil
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-class DeviceConfig(BaseModel):
-    """Device configuration model"""
-    device: str
-    device_name: str
-    is_available: bool
-    memory_info: Optional[Dict[str, Any]] = None
-
 class AppConfig(BaseModel):
     """Main application configuration"""
     app_name: str = "Ask Rumi Backend"
     version: str = "1.0.0"
     debug: bool = False
     max_concurrent_requests: int = 10
-    model_timeout: int = 300  # 5 minutes
+    model_timeout: int = 300  # default request deadline in seconds; clients may set a shorter one with X-Request-Timeout
+    parallel_requests_per_model: int = 4  # concurrent generations per model and worker (OLLAMA_NUM_PARALLEL / workers); others wait
     ollama_base_url: str = "http://localhost:11434"
     data_dir: str = "data"
     models_dir: str = "models"
+    max_concurrent_downloads: int = 2
+    download_retries: int = 3  # interrupted pulls resume from the layers already downloaded
     
     # GPU settings
     prefer_gpu: bool = True
     fallback_to_cpu: bool = True
-    max_gpu_memory: Optional[float] = None  # GB
-
-class GPUManager:
-    """Manages GPU detection and device switching"""
+    max_gpu_memory: Optional[float] = None  # GB, also the budget for models resident in Ollama
+    model_memory_fraction: float = 0.6  # share of system RAM for resident models when max_gpu_memory is unset
+    device_memory_ttl: float = 5.0  # seconds before cached device memory is re-read
+    
+    # In-process llama.cpp backend (GGUF models with provider "local")
+    llama_cpp_context: int = 2048
+    llama_cpp_threads: Optional[int] = None  # None = llama.cpp default
+    llama_cpp_gpu_layers: int = 0
     
-    def __init__(self):
-        self.current_device = self._detect_best_device()
-        self.device_info = self._get_device_info()
-        
-    def _detect_best_device(self) -> str:
-        """Detect the best available device"""
-        if torch.backends.mps.is_available():
-            logger.info("Apple Metal Performance Shaders (MPS) detected")
-            return "mps"
-        elif torch.cuda.is_available():
-            logger.info(f"CUDA detected with {torch.cuda.device_count()} device(s)")
-            return "cuda"
-        else:
-            logger.info("Using CPU")
-            return "cpu"
+    # Provider health probes
+    provider_health_ttl: float = 10.0  # seconds a probe result is reused
+    provider_failure_threshold: int = 3  # consecutive failures before a provider's circuit opens
+    provider_reset_timeout: float = 30.0  # seconds before an open circuit allows a trial call
     
-    def _get_device_info(self) -> Dict[str, Any]:
-        """Get detailed device information"""
-        device_info = {
-            "mps": {
-                "available": torch.backends.mps.is_available(),
-                "device": "mps" if torch.backends.mps.is_available() else None
-            },
-            "cuda": {
-                "available": torch.cuda.is_available(),
-                "device_count": torch.cuda.device_count() if torch.cuda.is_available() else 0,
-                "current_device": torch.cuda.current_device() if torch.cuda.is_available() else None,
-                "device_name": torch.cuda.get_device_name(0) if torch.cuda.is_available() else None
-            },
-            "cpu": {
-                "available": True,
-                "device": "cpu"
-            }
-        }
-        
-        # Add memory info for current device
-        if self.current_device == "cuda" and torch.cuda.is_available():
-            device_info["cuda"]["memory_allocated"] = torch.cuda.memory_allocated(0)
-            device_info["cuda"]["memory_reserved"] = torch.cuda.memory_reserved(0)
-            device_info["cuda"]["max_memory"] = torch.cuda.max_memory_allocated(0)
-        
-        return device_info
+    # Persistence of registry and config files
+    persistence_debounce: float = 0.5  # seconds to coalesce bursts of saves
+    persistence_snapshots: int = 5  # previous versions kept under data/snapshots
     
-    def get_current_device(self) -> str:
-        """Get current device"""
-        return self.current_device
+    # Multi-worker deployment
+    workers: int = 0  # 0 = recommended_workers()
+    state_db_path: str = "data/state.db"  # shared state for all workers
     
-    def set_device(self, device: str) -> bool:
-        """Set device (cpu, mps, cuda)"""
-        if device == "cpu":
-            self.current_device = "cpu"
-            logger.info("Switched to CPU")
-            return True
-        elif device == "mps" and torch.backends.mps.is_available():
-            self.current_device = "mps"
-            logger.info("Switched to Apple Metal (MPS)")
-            return True
-        elif device == "cuda" and torch.cuda.is_available():
-            self.current_device = "cuda"
-            logger.info("Switched to CUDA")
-            return True
-        else:
-            logger.warning(f"Device {device} not available")
-            return False
+    # Startup warm-up
+    default_models: List[str] = ["gemma3:270m"]  # preloaded into Ollama at startup
+    keep_alive: str = "30m"  # how long Ollama keeps models loaded between requests
+    pinned_models: Optional[List[str]] = None  # kept loaded indefinitely; None = default_models
+    speculative_warm_up: bool = True  # load a request's model while its message is analyzed and quotes retrieved
     
-    def get_device_config(self) -> DeviceConfig:
-        """Get current device configuration"""
-        device_info = self.device_info.get(self.current_device, {})
-        
-        return DeviceConfig(
-            device=self.current_device,
-            device_name=device_info.get("device_name", self.current_device.upper()),
-            is_available=device_info.get("available", True),
-            memory_info=device_info
-        )
+    # Background metrics sampling
+    metrics_sample_interval: float = 5.0  # seconds
+    metrics_history_size: int = 120  # snapshots kept in the ring buffer
     
-    def get_all_devices(self) -> Dict[str, DeviceConfig]:
-        """Get configuration for all available devices"""
-        devices = {}
-        for device_name, info in self.device_info.items():
-            devices[device_name] = DeviceConfig(
-                device=device_name,
-                device_name=info.get("device_name", device_name.upper()),
-                is_available=info.get("available", True),
-                memory_info=info
-            )
-        return devices
+    # Tracing export (OTLP JSON)
+    tracing_export_path: Optional[str] = None  # e.g. "data/traces.jsonl"
+    tracing_collector_url: Optional[str] = None  # e.g. "http://localhost:4318"
 
-# Global instances
+def recommended_workers() -> int:
+    """Worker processes for production: one per physical core, since generation runs in Ollama"""
+    cores = psutil.cpu_count(logical=False) or os.cpu_count() or 1
+    return max(1, cores)
+
+# Global instance
 config = AppConfig()
-gpu_manager = GPUManager()
 
 def get_config() -> AppConfig:
     """Get application configuration"""
     return config
 
-def get_gpu_manager() -> GPUManager:
-    """Get GPU manager instance"""
-    return gpu_manager
-
 def load_config_from_file(config_path: str = "config.json") -> AppConfig:
     """Load configuration from JSON file"""
     config_file = Path(config_path)
@@ -0,0 +1,187 @@
+"""
+Config Store for Ask Rumi Backend
+Keeps JSON config files in memory as immutable, versioned snapshots that are
+reloaded only when the file changes on disk or is updated through the API.
+"""
+
+import logging
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+from types import MappingProxyType
+from typing import Any, Callable, Dict, Generic, List, Optional, TypeVar
+
+from core.persistence import get_persistence_manager
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+def freeze(value: Any) -> Any:
+    """Recursively make JSON data read-only (dicts become mapping proxies, lists tuples)"""
+    if isinstance(value, dict):
+        return MappingProxyType({key: freeze(item) for key, item in value.items()})
+    if isinstance(value, (list, tuple)):
+        return tuple(freeze(item) for item in value)
+    return value
+
+def thaw(value: Any) -> Any:
+    """Recursively copy frozen data back into plain dicts and lists"""
+    if isinstance(value, MappingProxyType):
+        return {key: thaw(item) for key, item in value.items()}
+    if isinstance(value, tuple):
+        return [thaw(item) for item in value]
+    return value
+
+@dataclass(frozen=True)
+class ConfigSnapshot(Generic[T]):
+    """One immutable version of a config file"""
+    version: int
+    data: T
+    raw: Any
+    loaded_at: str = field(default_factory=lambda: datetime.now().isoformat())
+
+    def to_dict(self) -> Any:
+        """A mutable deep copy of the raw JSON, for responses and edits"""
+        return thaw(self.raw)
+
+class ConfigStore(Generic[T]):
+    """
+    A JSON config file held in memory
+
+    `snapshot()` is cheap: the file is only stat'ed once per
+    `check_interval` and re-parsed when its mtime changes (for example when
+    another worker wrote it). `update()` swaps in a new snapshot immediately
+    and schedules a debounced atomic write. Subscribers are called with every
+    new snapshot.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        parse: Callable[[Any], T] = freeze,
+        default: Callable[[], Any] = dict,
+        indent: int = 2,
+        ensure_ascii: bool = True,
+        check_interval: float = 1.0
+    ):
+        self.path = Path(path)
+        self.parse = parse
+        self.default = default
+        self.indent = indent
+        self.ensure_ascii = ensure_ascii
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._subscribers: List[Callable[[ConfigSnapshot[T]], None]] = []
+        self._snapshot: Optional[ConfigSnapshot[T]] = None
+        self._mtime: Optional[float] = None
+        self._last_check = 0.0
+
+    def _file_mtime(self) -> Optional[float]:
+        try:
+            return os.path.getmtime(self.path)
+        except OSError:
+            return None
+
+    def snapshot(self) -> ConfigSnapshot[T]:
+        """The current version, reloading first if the file changed on disk"""
+        now = time.monotonic()
+        if self._snapshot is not None and now - self._last_check < self.check_interval:
+            return self._snapshot
+
+        with self._lock:
+            self._last_check = now
+            # Our own write has not reached the disk yet, so memory is newer
+            if self._snapshot is not None and get_persistence_manager().is_pending(self.path):
+                return self._snapshot
+            mtime = self._file_mtime()
+            if self._snapshot is None or mtime != self._mtime:
+                self._reload(mtime)
+            return self._snapshot
+
+    @property
+    def version(self) -> int:
+        return self.snapshot().version
+
+    def _reload(self, mtime: Optional[float]):
+        """Re-read the file; on a bad file keep serving the previous version"""
+        try:
+            raw = get_persistence_manager().read_json(self.path)
+            if raw is None:
+                raw = self.default()
+            self._publish(raw)
+            self._mtime = mtime
+            logger.info(f"Loaded {self.path} (version {self._snapshot.version})")
+        except Exception as e:
+            logger.error(f"Failed to load {self.path}: {e}")
+            if self._snapshot is None:
+                self._publish(self.default())
+
+    def _publish(self, raw: Any):
+        """Swap in a new snapshot and notify subscribers"""
+        frozen = freeze(raw)
+        version = self._snapshot.version + 1 if self._snapshot is not None else 1
+        self._snapshot = ConfigSnapshot(version=version, data=self.parse(frozen), raw=frozen)
+        for callback in list(self._subscribers):
+            try:
+                callback(self._snapshot)
+            except Exception as e:
+                logger.error(f"Config subscriber for {self.path} failed: {e}")
+
+    def update(self, raw: Any) -> ConfigSnapshot[T]:
+        """Replace the config, persist it, and return the new snapshot"""
+        self.snapshot()
+        with self._lock:
+            self._publish(raw)
+            snapshot = self._snapshot
+            get_persistence_manager().save_json(
+                self.path,
+                lambda: thaw(snapshot.raw),
+                indent=self.indent,
+                ensure_ascii=self.ensure_ascii,
+                on_written=self._on_written
+            )
+        return snapshot
+
+    def _on_written(self, path: Path):
+        # Our own write must not be picked up as an external change
+        self._mtime = self._file_mtime()
+
+    def subscribe(self, callback: Callable[[ConfigSnapshot[T]], None]):
+        """Call `callback(snapshot)` whenever a new version is published"""
+        self._subscribers.append(callback)
+
+    def unsubscribe(self, callback: Callable[[ConfigSnapshot[T]], None]):
+        if callback in self._subscribers:
+            self._subscribers.remove(callback)
+
+# Emotion and keyword tags edited from the frontend
+EMOTION_KEYWORDS_PATH = "data/emotion_keywords_config.json"
+
+def default_emotion_keywords() -> Dict[str, Any]:
+    return {
+        "emotion_keywords": {},
+        "theme_keywords": {},
+        "empathy_triggers": {
+            "distress_patterns": [],
+            "emoticons": []
+        }
+    }
+
+# Global instance
+_emotion_keywords_store: Optional[ConfigStore] = None
+
+def get_emotion_keywords_store() -> ConfigStore:
+    """Get the emotion keywords config store"""
+    global _emotion_keywords_store
+    if _emotion_keywords_store is None:
+        _emotion_keywords_store = ConfigStore(
+            EMOTION_KEYWORDS_PATH,
+            default=default_emotion_keywords,
+            indent=4,
+            ensure_ascii=False
+        )
+    return _emotion_keywords_store
@@ -0,0 +1,166 @@
+"""
+Conversation Store for Ask Rumi Backend
+SQLite-backed conversation storage shared by all worker processes.
+"""
+
+import json
+import logging
+import sqlite3
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS conversations (
+    id TEXT PRIMARY KEY,
+    model TEXT NOT NULL,
+    created_at TEXT NOT NULL,
+    updated_at TEXT NOT NULL,
+    message_count INTEGER NOT NULL DEFAULT 0,
+    messages TEXT NOT NULL DEFAULT '[]'
+);
+CREATE TABLE IF NOT EXISTS counters (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+"""
+
+class ConversationStore:
+    """
+    Conversations persisted in a local SQLite database
+
+    WAL mode lets every uvicorn worker read while one writes, so a conversation
+    started on one worker can be continued on another. Each thread gets its own
+    connection.
+    """
+
+    def __init__(self, db_path: str = "data/state.db", timeout: float = 10.0):
+        self.db_path = Path(db_path)
+        self.timeout = timeout
+        self._local = threading.local()
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        """Get this thread's connection, opening it on first use"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=self.timeout, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def next_id(self, name: str = "conversation") -> int:
+        """Atomically increment and return a named counter across workers"""
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute(
+                "INSERT INTO counters (name, value) VALUES (?, 1) "
+                "ON CONFLICT(name) DO UPDATE SET value = value + 1",
+                (name,)
+            )
+            value = conn.execute("SELECT value FROM counters WHERE name = ?", (name,)).fetchone()[0]
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return value
+
+    def get(self, conversation_id: str) -> Optional[Dict[str, Any]]:
+        """Load a conversation with its messages"""
+        row = self._connect().execute(
+            "SELECT id, model, created_at, updated_at, messages FROM conversations WHERE id = ?",
+            (conversation_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        return {
+            "id": row["id"],
+            "model": row["model"],
+            "created_at": row["created_at"],
+            "updated_at": row["updated_at"],
+            "messages": json.loads(row["messages"])
+        }
+
+    def append(self, conversation_id: str, model: str, messages: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Append messages to a conversation, creating it if needed, and return the result
+
+        The read-modify-write runs inside one write transaction, so concurrent
+        turns on any worker never overwrite each other's messages.
+        """
+        now = datetime.now().isoformat()
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                "SELECT model, created_at, messages FROM conversations WHERE id = ?",
+                (conversation_id,)
+            ).fetchone()
+            if row is None:
+                created_at, stored = now, list(messages)
+                conn.execute(
+                    "INSERT INTO conversations (id, model, created_at, updated_at, message_count, messages) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (conversation_id, model, created_at, now, len(stored), json.dumps(stored))
+                )
+            else:
+                model, created_at = row["model"], row["created_at"]
+                stored = json.loads(row["messages"]) + list(messages)
+                conn.execute(
+                    "UPDATE conversations SET updated_at = ?, message_count = ?, messages = ? WHERE id = ?",
+                    (now, len(stored), json.dumps(stored), conversation_id)
+                )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return {
+            "id": conversation_id,
+            "model": model,
+            "created_at": created_at,
+            "updated_at": now,
+            "messages": stored
+        }
+
+    def clear(self, conversation_id: str) -> bool:
+        """Remove all messages from a conversation, returning whether it existed"""
+        cursor = self._connect().execute(
+            "UPDATE conversations SET messages = '[]', message_count = 0, updated_at = ? WHERE id = ?",
+            (datetime.now().isoformat(), conversation_id)
+        )
+        return cursor.rowcount > 0
+
+    def delete(self, conversation_id: str) -> bool:
+        """Delete a conversation, returning whether it existed"""
+        cursor = self._connect().execute("DELETE FROM conversations WHERE id = ?", (conversation_id,))
+        return cursor.rowcount > 0
+
+    def list(self) -> List[Dict[str, Any]]:
+        """Summaries of all conversations, without messages"""
+        rows = self._connect().execute(
+            "SELECT id, model, created_at, updated_at, message_count FROM conversations ORDER BY created_at"
+        ).fetchall()
+        return [dict(row) for row in rows]
+
+    def count(self) -> int:
+        """Number of stored conversations"""
+        return self._connect().execute("SELECT COUNT(*) FROM conversations").fetchone()[0]
+
+# Global instance
+_conversation_store: Optional[ConversationStore] = None
+
+def get_conversation_store() -> ConversationStore:
+    """Get the global conversation store"""
+    global _conversation_store
+    if _conversation_store is None:
+        from core.config import get_config
+
+        _conversation_store = ConversationStore(get_config().state_db_path)
+    return _conversation_store
@@ -0,0 +1,229 @@
+"""
+Request Deadlines for Ask Rumi Backend
+A per-request time budget carried in a context variable from the HTTP layer
+through queueing, retrieval and inference, so work for a request that can no
+longer be answered in time - or whose client has gone away - is abandoned
+and the backend generation aborted.
+"""
+
+import asyncio
+import logging
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import AsyncGenerator, AsyncIterator, Awaitable, Callable, Iterator, Optional, TypeVar
+
+from core.metrics import ABANDONED, ABANDONED_TOKENS
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# How often a guarded wait checks whether the client is still connected
+DISCONNECT_POLL_INTERVAL = 0.5
+
+_current_deadline: ContextVar[Optional["Deadline"]] = ContextVar("current_deadline", default=None)
+
+class DeadlineExceeded(asyncio.TimeoutError):
+    """The request's time budget ran out"""
+
+    def __init__(self, stage: str, budget: float):
+        super().__init__(f"Request deadline of {budget:.1f}s exceeded during {stage}")
+        self.stage = stage
+        self.budget = budget
+
+class ClientDisconnected(Exception):
+    """The client went away before the reply was ready"""
+
+    def __init__(self, stage: str):
+        super().__init__(f"Client disconnected during {stage}")
+        self.stage = stage
+
+class Deadline:
+    """A point in time by which a request must be answered"""
+
+    def __init__(self, seconds: float):
+        self.budget = seconds
+        self.expires_at = time.monotonic() + seconds
+        self.stage = "start"
+        self.abandoned: Optional[str] = None  # reason, once the work was given up
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires_at - time.monotonic())
+
+    @property
+    def expired(self) -> bool:
+        return time.monotonic() >= self.expires_at
+
+    def check(self, stage: str):
+        """Enter `stage`, raising DeadlineExceeded if the budget is already spent"""
+        self.stage = stage
+        if self.expired:
+            self.abandon("deadline")
+            raise DeadlineExceeded(stage, self.budget)
+
+    def timeout(self, cap: Optional[float] = None) -> float:
+        """Seconds an operation may take: what is left, at most `cap`"""
+        remaining = self.remaining()
+        return remaining if cap is None else min(remaining, cap)
+
+    def abandon(self, reason: str, tokens: int = 0):
+        """Record the request's work as abandoned (counted once per request)"""
+        if self.abandoned is None:
+            self.abandoned = reason
+            ABANDONED.inc(reason=reason, stage=self.stage)
+            logger.info(f"Abandoned request during {self.stage}: {reason}")
+        if tokens:
+            ABANDONED_TOKENS.inc(tokens, reason=reason)
+
+def current_deadline() -> Optional[Deadline]:
+    return _current_deadline.get()
+
+@contextmanager
+def use_deadline(deadline: Optional[Deadline]) -> Iterator[Optional[Deadline]]:
+    """Make `deadline` the current one, or clear it with None, e.g. for background queue tasks"""
+    token = _current_deadline.set(deadline)
+    try:
+        yield deadline
+    finally:
+        _current_deadline.reset(token)
+
+@contextmanager
+def deadline_scope(seconds: Optional[float]) -> Iterator[Optional[Deadline]]:
+    """Run with a budget of `seconds` (no deadline for None); an earlier enclosing deadline wins"""
+    parent = _current_deadline.get()
+    if not seconds or seconds <= 0 or (parent is not None and parent.remaining() <= seconds):
+        yield parent
+        return
+    with use_deadline(Deadline(seconds)) as deadline:
+        yield deadline
+
+def check_deadline(stage: str):
+    """Enter a pipeline stage, failing fast if the current deadline has passed"""
+    deadline = _current_deadline.get()
+    if deadline is not None:
+        deadline.check(stage)
+
+def remaining_time(cap: Optional[float] = None) -> Optional[float]:
+    """Seconds left for the current request (at most `cap`), or `cap` without a deadline"""
+    deadline = _current_deadline.get()
+    return deadline.timeout(cap) if deadline is not None else cap
+
+def abandon(reason: str, stage: str, tokens: int = 0):
+    """Record abandoned work for the current request"""
+    deadline = _current_deadline.get()
+    if deadline is None:
+        ABANDONED.inc(reason=reason, stage=stage)
+        if tokens:
+            ABANDONED_TOKENS.inc(tokens, reason=reason)
+        return
+    deadline.stage = stage
+    deadline.abandon(reason, tokens)
+
+async def within_deadline(awaitable: Awaitable[T], stage: str) -> T:
+    """Await `awaitable`, cancelling it when the current deadline passes"""
+    deadline = _current_deadline.get()
+    if deadline is None:
+        return await awaitable
+    deadline.check(stage)
+    try:
+        return await asyncio.wait_for(awaitable, deadline.remaining())
+    except DeadlineExceeded:
+        raise
+    except asyncio.TimeoutError:
+        deadline.abandon("deadline")
+        raise DeadlineExceeded(stage, deadline.budget) from None
+
+async def _abandon_if_due(stage: str, disconnected: Optional[Callable[[], Awaitable[bool]]]):
+    deadline = _current_deadline.get()
+    if deadline is not None and deadline.stage != "start":
+        # The guarded work has recorded how far it got
+        stage = deadline.stage
+    if deadline is not None and deadline.expired:
+        abandon("deadline", stage)
+        raise DeadlineExceeded(stage, deadline.budget)
+    if disconnected is not None and await disconnected():
+        abandon("disconnect", stage)
+        raise ClientDisconnected(stage)
+
+def _wait_interval(disconnected: Optional[Callable[[], Awaitable[bool]]]) -> Optional[float]:
+    interval = DISCONNECT_POLL_INTERVAL if disconnected is not None else None
+    return remaining_time(interval)
+
+async def _cancel(task: asyncio.Task):
+    if not task.done():
+        task.cancel()
+    # Wait so the cancelled work (and its HTTP request) is torn down before we return
+    await asyncio.gather(task, return_exceptions=True)
+
+async def guard(
+    awaitable: Awaitable[T],
+    stage: str,
+    disconnected: Optional[Callable[[], Awaitable[bool]]] = None
+) -> T:
+    """
+    Run `awaitable` as a task, cancelling it when the deadline passes or
+    `disconnected()` reports that the client went away
+
+    Cancelling closes any in-flight backend request, which makes Ollama abort
+    the generation and free its slot.
+    """
+    task = asyncio.ensure_future(awaitable)
+    try:
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=_wait_interval(disconnected))
+            if done:
+                return task.result()
+            await _abandon_if_due(stage, disconnected)
+    finally:
+        await _cancel(task)
+
+async def guard_stream(
+    source: AsyncIterator[T],
+    stage: str,
+    disconnected: Optional[Callable[[], Awaitable[bool]]] = None
+) -> AsyncGenerator[T, None]:
+    """
+    Iterate `source` in its own task so a deadline or disconnect can interrupt
+    a read that is stalled (e.g. while the model loads), not just notice it at
+    the next chunk
+    """
+    queue: asyncio.Queue = asyncio.Queue(maxsize=1)
+    finished = object()
+
+    async def pump():
+        try:
+            async for item in source:
+                await queue.put(item)
+        finally:
+            close = getattr(source, "aclose", None)
+            if close is not None:
+                await close()
+        await queue.put(finished)
+
+    producer = asyncio.ensure_future(pump())
+    getter: Optional[asyncio.Future] = None
+    try:
+        while True:
+            getter = asyncio.ensure_future(queue.get())
+            done, _ = await asyncio.wait(
+                {getter, producer},
+                timeout=_wait_interval(disconnected),
+                return_when=asyncio.FIRST_COMPLETED
+            )
+            if getter in done:
+                item = getter.result()
+                if item is finished:
+                    return
+                yield item
+                continue
+            await _cancel(getter)
+            if producer in done:
+                # The source failed before producing its next item
+                producer.result()
+                return
+            await _abandon_if_due(stage, disconnected)
+    finally:
+        if getter is not None:
+            getter.cancel()
+        await _cancel(producer)
@@ -0,0 +1,117 @@
+"""
+Lightweight device probing for Ask Rumi Backend
+Detects CPU/MPS/CUDA without importing torch. torch is only imported when a
+torch-backed feature is actually used.
+"""
+
+import ctypes.util
+import functools
+import importlib
+import importlib.metadata
+import logging
+import os
+import platform
+import shutil
+import subprocess
+import sys
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+NVIDIA_SMI_TIMEOUT = 5  # seconds
+
+@functools.lru_cache(maxsize=None)
+def has_mps() -> bool:
+    """Apple Silicon Macs expose Metal Performance Shaders"""
+    return platform.system() == "Darwin" and platform.machine() == "arm64"
+
+@functools.lru_cache(maxsize=None)
+def has_cuda() -> bool:
+    """Check for an NVIDIA driver without initializing CUDA"""
+    if os.environ.get("CUDA_VISIBLE_DEVICES") in ("", "-1"):
+        return False
+    return bool(
+        os.path.exists("/proc/driver/nvidia/version")
+        or shutil.which("nvidia-smi")
+        or ctypes.util.find_library("cuda")
+    ) and bool(cuda_devices())
+
+def query_nvidia_smi(fields: List[str]) -> List[List[str]]:
+    """Run nvidia-smi for the given query fields, one row per GPU"""
+    if not shutil.which("nvidia-smi"):
+        return []
+    try:
+        result = subprocess.run(
+            ["nvidia-smi", f"--query-gpu={','.join(fields)}", "--format=csv,noheader,nounits"],
+            capture_output=True,
+            text=True,
+            timeout=NVIDIA_SMI_TIMEOUT
+        )
+    except Exception as e:
+        logger.warning(f"nvidia-smi probe failed: {e}")
+        return []
+    if result.returncode != 0:
+        return []
+    return [
+        [value.strip() for value in line.split(",")]
+        for line in result.stdout.strip().splitlines()
+        if line.strip()
+    ]
+
+@functools.lru_cache(maxsize=None)
+def cuda_devices() -> List[Dict[str, Any]]:
+    """Static description of each CUDA device (cached)"""
+    rows = query_nvidia_smi(["index", "name", "memory.total", "compute_cap"])
+    if not rows:
+        # Older drivers do not know compute_cap
+        rows = [row + [""] for row in query_nvidia_smi(["index", "name", "memory.total"])]
+
+    devices = []
+    for row in rows:
+        if len(row) < 4:
+            continue
+        index, name, memory_total, compute_cap = row[:4]
+        devices.append({
+            "index": int(index),
+            "name": name,
+            "memory_total": float(memory_total) / 1024 if memory_total else None,  # MiB -> GB
+            "compute_capability": compute_cap or None
+        })
+    return devices
+
+def cuda_memory_all() -> Dict[int, Dict[str, float]]:
+    """Current memory usage of every CUDA device in GB, from one nvidia-smi call"""
+    usage = {}
+    for row in query_nvidia_smi(["index", "memory.total", "memory.used", "memory.free"]):
+        if len(row) == 4:
+            total, used, free = (float(value) / 1024 for value in row[1:])
+            usage[int(row[0])] = {"total": total, "used": used, "free": free}
+    return usage
+
+def cuda_memory(index: int) -> Optional[Dict[str, float]]:
+    """Current memory usage of a CUDA device in GB, read via nvidia-smi"""
+    return cuda_memory_all().get(index)
+
+@functools.lru_cache(maxsize=None)
+def torch_version() -> Optional[str]:
+    """Installed torch version, read from package metadata without importing it"""
+    try:
+        return importlib.metadata.version("torch")
+    except importlib.metadata.PackageNotFoundError:
+        return None
+
+def torch_loaded() -> bool:
+    """Whether torch has already been imported by some feature in this process"""
+    return "torch" in sys.modules
+
+def get_torch():
+    """Import torch on demand for torch-backed features"""
+    return importlib.import_module("torch")
+
+def detect_best_device() -> str:
+    """Pick the preferred device: MPS, then CUDA, then CPU"""
+    if has_mps():
+        return "mps"
+    if has_cuda():
+        return "cuda"
+    return "cpu"
@@ -3,12 +3,16 @@ GPU Manager for Ask Rumi Backend
 Handles device detection, GPU switching, and memory management.
 """
 
-import torch
 import logging
-from typing import Dict, Any, Optional, List
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, Any, Optional, List, Tuple
 from pydantic import BaseModel
 import psutil
 
+from core import device_probe
+
 logger = logging.getLogger(__name__)
 
 class DeviceInfo(BaseModel):
@@ -21,144 +25,157 @@ class DeviceInfo(BaseModel):
     memory_free: Optional[float] = None  # GB
     compute_capability: Optional[str] = None
 
+@dataclass(frozen=True)
+class DeviceDescriptor:
+    """Static facts about a device, probed once at startup"""
+    name: str
+    device_type: str
+    device_name: str
+    index: Optional[int] = None
+    memory_total: Optional[float] = None  # GB
+    compute_capability: Optional[str] = None
+
 class GPUManager:
-    """Manages GPU detection, switching, and memory monitoring"""
-    
-    def __init__(self):
+    """Manages GPU detection, switching, and memory monitoring
+
+    Devices are probed once into immutable descriptors. Memory usage is the only
+    volatile part: it is cached per device and re-read when older than
+    `memory_ttl`, normally by the system monitor's background sampler.
+    torch is never imported here unless a torch-backed feature is in use.
+    """
+
+    def __init__(self, memory_ttl: float = 5.0):
+        self.memory_ttl = memory_ttl
+        self.descriptors = self._probe_devices()
         self.current_device = self._detect_best_device()
-        self.device_info = self._get_all_device_info()
+        self._memory: Dict[str, Tuple[float, Dict[str, Any]]] = {}
+        self._memory_lock = threading.Lock()
         logger.info(f"GPU Manager initialized with device: {self.current_device}")
-    
-    def _detect_best_device(self) -> str:
-        """Detect the best available device for inference"""
-        # Check Apple Metal Performance Shaders (MPS) - preferred for Apple Silicon
-        if torch.backends.mps.is_available():
-            logger.info("Apple Metal Performance Shaders (MPS) detected")
-            return "mps"
-        
-        # Check CUDA - preferred for NVIDIA GPUs
-        elif torch.cuda.is_available():
-            device_count = torch.cuda.device_count()
-            logger.info(f"CUDA detected with {device_count} device(s)")
-            return "cuda"
-        
-        # Fallback to CPU
-        else:
-            logger.info("No GPU detected, using CPU")
-            return "cpu"
-    
-    def _get_all_device_info(self) -> Dict[str, DeviceInfo]:
-        """Get comprehensive information about all available devices"""
-        devices = {}
-        
-        # CPU Information
+
+    def _probe_devices(self) -> Dict[str, DeviceDescriptor]:
+        """Probe all available devices once"""
         cpu_count = psutil.cpu_count()
-        memory = psutil.virtual_memory()
-        devices["cpu"] = DeviceInfo(
-            device_type="cpu",
-            device_name=f"CPU ({cpu_count} cores)",
-            is_available=True,
-            memory_total=memory.total / (1024**3),  # Convert to GB
-            memory_used=memory.used / (1024**3),
-            memory_free=memory.available / (1024**3)
-        )
-        
+        devices = {
+            "cpu": DeviceDescriptor(
+                name="cpu",
+                device_type="cpu",
+                device_name=f"CPU ({cpu_count} cores)",
+                memory_total=psutil.virtual_memory().total / (1024**3)  # Convert to GB
+            )
+        }
+
         # Apple Metal Performance Shaders (MPS)
-        if torch.backends.mps.is_available():
-            devices["mps"] = DeviceInfo(
+        if device_probe.has_mps():
+            devices["mps"] = DeviceDescriptor(
+                name="mps",
                 device_type="mps",
-                device_name="Apple Metal Performance Shaders",
-                is_available=True,
-                memory_total=None,  # MPS doesn't expose memory info directly
-                memory_used=None,
-                memory_free=None
+                device_name="Apple Metal Performance Shaders"
             )
-        
+
         # CUDA Information
-        if torch.cuda.is_available():
-            device_count = torch.cuda.device_count()
-            for i in range(device_count):
-                device_name = torch.cuda.get_device_name(i)
-                memory_total = torch.cuda.get_device_properties(i).total_memory / (1024**3)
-                memory_allocated = torch.cuda.memory_allocated(i) / (1024**3)
-                memory_reserved = torch.cuda.memory_reserved(i) / (1024**3)
-                
-                devices[f"cuda:{i}"] = DeviceInfo(
+        if device_probe.has_cuda():
+            for cuda_device in device_probe.cuda_devices():
+                name = f"cuda:{cuda_device['index']}"
+                devices[name] = DeviceDescriptor(
+                    name=name,
                     device_type="cuda",
-                    device_name=device_name,
-                    is_available=True,
-                    memory_total=memory_total,
-                    memory_used=memory_allocated,
-                    memory_free=memory_total - memory_reserved,
-                    compute_capability=f"{torch.cuda.get_device_properties(i).major}.{torch.cuda.get_device_properties(i).minor}"
+                    device_name=cuda_device["name"],
+                    index=cuda_device["index"],
+                    memory_total=cuda_device["memory_total"],
+                    compute_capability=cuda_device["compute_capability"]
                 )
-        
+
         return devices
-    
+
+    def _detect_best_device(self) -> str:
+        """Detect the best available device for inference"""
+        if "mps" in self.descriptors:
+            logger.info("Apple Metal Performance Shaders (MPS) detected")
+            return "mps"
+        cuda_count = sum(1 for d in self.descriptors.values() if d.device_type == "cuda")
+        if cuda_count:
+            logger.info(f"CUDA detected with {cuda_count} device(s)")
+            return "cuda:0"
+        logger.info("No GPU detected, using CPU")
+        return "cpu"
+
+    @staticmethod
+    def _normalize(device: str) -> str:
+        """Map the bare `cuda` alias to the first CUDA device"""
+        return "cuda:0" if device == "cuda" else device
+
     def get_current_device(self) -> str:
         """Get the current active device"""
         return self.current_device
-    
+
     def set_device(self, device: str) -> bool:
         """Switch to a specific device"""
-        if device == "cpu":
-            self.current_device = "cpu"
-            logger.info("Switched to CPU")
-            return True
-        
-        elif device == "mps":
-            if torch.backends.mps.is_available():
-                self.current_device = "mps"
-                logger.info("Switched to Apple Metal (MPS)")
-                return True
-            else:
-                logger.warning("MPS not available")
-                return False
-        
-        elif device.startswith("cuda"):
-            if torch.cuda.is_available():
-                # Extract device index if specified
-                if ":" in device:
-                    device_idx = int(device.split(":")[1])
-                    if device_idx < torch.cuda.device_count():
-                        torch.cuda.set_device(device_idx)
-                        self.current_device = device
-                        logger.info(f"Switched to CUDA device {device_idx}")
-                        return True
-                else:
-                    self.current_device = "cuda:0"
-                    logger.info("Switched to CUDA device 0")
-                    return True
+        target = self._normalize(device)
+        descriptor = self.descriptors.get(target)
+
+        if descriptor is None:
+            if device == "mps" or device.startswith("cuda"):
+                logger.warning(f"{device} not available")
             else:
-                logger.warning("CUDA not available")
-                return False
-        
-        else:
-            logger.warning(f"Unknown device: {device}")
+                logger.warning(f"Unknown device: {device}")
             return False
-    
+
+        if descriptor.device_type == "cuda" and device_probe.torch_loaded():
+            device_probe.get_torch().cuda.set_device(descriptor.index)
+
+        self.current_device = target
+        logger.info(f"Switched to {descriptor.device_name} ({target})")
+        return True
+
     def get_device_info(self, device: Optional[str] = None) -> DeviceInfo:
         """Get information about a specific device"""
-        target_device = device or self.current_device
-        return self.device_info.get(target_device, self.device_info["cpu"])
-    
+        target_device = self._normalize(device or self.current_device)
+        if target_device not in self.descriptors:
+            target_device = "cpu"
+        return self._to_device_info(self.descriptors[target_device])
+
     def get_all_devices(self) -> Dict[str, DeviceInfo]:
         """Get information about all available devices"""
-        return self.device_info
-    
+        return {name: self._to_device_info(d) for name, d in self.descriptors.items()}
+
     def get_available_devices(self) -> List[str]:
         """Get list of available device names"""
-        return [name for name, info in self.device_info.items() if info.is_available]
-    
-    def get_memory_usage(self, device: Optional[str] = None) -> Dict[str, float]:
-        """Get memory usage for a specific device"""
-        target_device = device or self.current_device
-        device_info = self.device_info.get(target_device)
-        
-        if not device_info:
+        return list(self.descriptors.keys())
+
+    def get_memory_usage(self, device: Optional[str] = None) -> Dict[str, Any]:
+        """Get memory usage for a specific device, from cache when fresh"""
+        target_device = self._normalize(device or self.current_device)
+        if target_device not in self.descriptors:
             return {"error": "Device not found"}
-        
-        if target_device == "cpu":
+
+        cached = self._memory.get(target_device)
+        if cached is not None and time.monotonic() - cached[0] < self.memory_ttl:
+            return cached[1]
+        return self.refresh_memory([target_device])[target_device]
+
+    def refresh_memory(self, devices: Optional[List[str]] = None) -> Dict[str, Dict[str, Any]]:
+        """Re-read memory usage for the given devices (all by default) and cache it"""
+        names = devices or list(self.descriptors.keys())
+        cuda_usage = None
+        if any(self.descriptors[name].device_type == "cuda" for name in names):
+            cuda_usage = device_probe.cuda_memory_all()
+
+        now = time.monotonic()
+        usage = {}
+        for name in names:
+            try:
+                usage[name] = self._read_memory(self.descriptors[name], cuda_usage)
+            except Exception as e:
+                usage[name] = {"error": str(e)}
+
+        with self._memory_lock:
+            for name, value in usage.items():
+                self._memory[name] = (now, value)
+        return usage
+
+    def _read_memory(self, descriptor: DeviceDescriptor, cuda_usage: Optional[Dict[int, Dict[str, float]]]) -> Dict[str, Any]:
+        """Read current memory usage for one device"""
+        if descriptor.device_type == "cpu":
             memory = psutil.virtual_memory()
             return {
                 "total": memory.total / (1024**3),
@@ -166,56 +183,77 @@ class GPUManager:
                 "free": memory.available / (1024**3),
                 "percent": memory.percent
             }
-        
-        elif target_device.startswith("cuda"):
-            device_idx = int(target_device.split(":")[1]) if ":" in target_device else 0
-            if torch.cuda.is_available():
-                memory_allocated = torch.cuda.memory_allocated(device_idx) / (1024**3)
-                memory_reserved = torch.cuda.memory_reserved(device_idx) / (1024**3)
-                memory_total = torch.cuda.get_device_properties(device_idx).total_memory / (1024**3)
-                
-                return {
-                    "total": memory_total,
-                    "allocated": memory_allocated,
-                    "reserved": memory_reserved,
-                    "free": memory_total - memory_reserved
-                }
-        
-        elif target_device == "mps":
+
+        elif descriptor.device_type == "cuda":
+            memory = (cuda_usage or {}).get(descriptor.index)
+            usage: Dict[str, Any] = dict(memory) if memory else {"total": descriptor.memory_total}
+
+            # Allocator stats only exist if torch is already in use
+            if device_probe.torch_loaded():
+                torch = device_probe.get_torch()
+                usage["allocated"] = torch.cuda.memory_allocated(descriptor.index) / (1024**3)
+                usage["reserved"] = torch.cuda.memory_reserved(descriptor.index) / (1024**3)
+            return usage
+
+        elif descriptor.device_type == "mps":
             # MPS doesn't expose memory info directly
             return {"note": "MPS memory info not available"}
-        
+
         return {"error": "Unknown device type"}
-    
+
+    def _to_device_info(self, descriptor: DeviceDescriptor) -> DeviceInfo:
+        """Combine a descriptor with its last cached memory reading"""
+        cached = self._memory.get(descriptor.name)
+        memory = cached[1] if cached else {}
+        return DeviceInfo(
+            device_type=descriptor.device_type,
+            device_name=descriptor.device_name,
+            is_available=True,
+            memory_total=memory.get("total", descriptor.memory_total),
+            memory_used=memory.get("used"),
+            memory_free=memory.get("free"),
+            compute_capability=descriptor.compute_capability
+        )
+
     def clear_cache(self, device: Optional[str] = None):
         """Clear GPU cache for a specific device"""
-        target_device = device or self.current_device
-        
+        target_device = self._normalize(device or self.current_device)
+
+        if not device_probe.torch_loaded():
+            # No torch allocator in this process, so there is nothing cached
+            logger.info("torch not in use, no cache to clear")
+            return
+
         if target_device.startswith("cuda"):
-            device_idx = int(target_device.split(":")[1]) if ":" in target_device else 0
+            torch = device_probe.get_torch()
             if torch.cuda.is_available():
                 torch.cuda.empty_cache()
-                logger.info(f"Cleared CUDA cache for device {device_idx}")
-        
+                logger.info(f"Cleared CUDA cache for {target_device}")
+
         elif target_device == "mps":
             # MPS doesn't have explicit cache clearing
             logger.info("MPS cache clearing not available")
-        
+
         else:
             logger.info("No cache to clear for CPU")
-    
+
     def get_recommended_device(self) -> str:
         """Get the recommended device based on available hardware"""
-        if torch.backends.mps.is_available():
+        if "mps" in self.descriptors:
             return "mps"  # Apple Silicon Macs
-        elif torch.cuda.is_available():
+        elif "cuda:0" in self.descriptors:
             return "cuda:0"  # NVIDIA GPUs
         else:
             return "cpu"  # Fallback
 
-# Global instance
-gpu_manager = GPUManager()
+# Global instance, created on first use
+gpu_manager: Optional[GPUManager] = None
 
 def get_gpu_manager() -> GPUManager:
     """Get the global GPU manager instance"""
+    global gpu_manager
+    if gpu_manager is None:
+        from core.config import get_config
+
+        gpu_manager = GPUManager(memory_ttl=get_config().device_memory_ttl)
     return gpu_manager
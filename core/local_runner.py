@@ -1,19 +1,32 @@
 """
 Local Runner for Ask Rumi Backend
-Handles local model inference using Ollama and other local providers.
+Handles local model inference, dispatching each model to its inference backend.
 """
 
 import asyncio
 import subprocess
 import json
 import logging
-from typing import Dict, Any, Optional, List, AsyncGenerator
+import time
+from contextlib import asynccontextmanager
+from typing import Dict, Any, Optional, List, AsyncGenerator, AsyncIterator, Tuple
 from pydantic import BaseModel
 import aiofiles
+import httpx
 from datetime import datetime
 
+from core.backends import BACKEND_TIMEOUT, InferenceBackend, LlamaCppBackend, OllamaBackend
+from core.config import get_config
+from core.deadline import DeadlineExceeded, check_deadline, within_deadline
+from core.metrics import QUEUE_WAIT, WARMUPS
+from core.tracing import traced
+from core.model_manager import get_model_registry
+from core.provider_health import get_provider_health
+
 logger = logging.getLogger(__name__)
 
+OLLAMA_BASE_URL = "http://localhost:11434"
+
 class InferenceRequest(BaseModel):
     """Inference request model"""
     model: str
@@ -23,6 +36,7 @@ class InferenceRequest(BaseModel):
     top_p: Optional[float] = 0.9
     stream: bool = False
     context: Optional[str] = None
+    max_words: Optional[int] = None  # Stop at the first sentence end past this many words
 
 class InferenceResponse(BaseModel):
     """Inference response model"""
@@ -33,6 +47,82 @@ class InferenceResponse(BaseModel):
     timestamp: str
     success: bool
     error: Optional[str] = None
+    stopped_early: bool = False
+    tokens_saved: Optional[int] = None  # Estimated tokens of the word budget not generated due to early stop
+    prompt_tokens: Optional[int] = None
+    prompt_eval_time: Optional[float] = None  # seconds
+    eval_time: Optional[float] = None  # seconds
+    load_time: Optional[float] = None  # seconds
+    tokens_per_second: Optional[float] = None
+    time_to_first_token: Optional[float] = None  # seconds
+
+class ModelSlots:
+    """
+    Limits concurrent generations per model; further requests wait their turn
+
+    Waiting is bounded by the request deadline, and a slot is released as soon
+    as its generation finishes or is cancelled. How long slots are held is
+    tracked per model to estimate the wait of the next request.
+
+    Slots are per worker process: with N workers up to N x per_model
+    generations reach Ollama at once, and estimated_wait only sees this
+    worker's queue. Ollama's own OLLAMA_NUM_PARALLEL queue still bounds
+    the total.
+    """
+    
+    # Assumed seconds per generation before any has been measured for a model
+    DEFAULT_HOLD_TIME = 10.0
+    # Weight of the newest measurement in the moving average
+    HOLD_TIME_WEIGHT = 0.3
+    
+    def __init__(self, per_model: int):
+        self.per_model = per_model
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+        self.waiting: Dict[str, int] = {}
+        self.active: Dict[str, int] = {}
+        self.hold_time: Dict[str, float] = {}
+    
+    @asynccontextmanager
+    async def acquire(self, model: str) -> AsyncIterator[None]:
+        semaphore = self._semaphores.setdefault(model, asyncio.Semaphore(self.per_model))
+        self.waiting[model] = self.waiting.get(model, 0) + 1
+        start = time.perf_counter()
+        try:
+            await within_deadline(semaphore.acquire(), "queue")
+        finally:
+            self.waiting[model] -= 1
+        QUEUE_WAIT.observe(time.perf_counter() - start, function="inference")
+        self.active[model] = self.active.get(model, 0) + 1
+        held_from = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.active[model] -= 1
+            semaphore.release()
+            held = time.perf_counter() - held_from
+            previous = self.hold_time.get(model)
+            self.hold_time[model] = held if previous is None else (
+                self.HOLD_TIME_WEIGHT * held + (1 - self.HOLD_TIME_WEIGHT) * previous
+            )
+    
+    def estimated_wait(self, model: str) -> float:
+        """Seconds a request for `model` arriving now would wait for a slot"""
+        busy = self.active.get(model, 0) + self.waiting.get(model, 0)
+        if busy < self.per_model:
+            return 0.0
+        rounds = (busy - self.per_model) // self.per_model + 1
+        return rounds * self.hold_time.get(model, self.DEFAULT_HOLD_TIME)
+    
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        return {
+            model: {
+                "active": self.active.get(model, 0),
+                "waiting": self.waiting.get(model, 0),
+                "hold_time": self.hold_time.get(model),
+                "estimated_wait": self.estimated_wait(model)
+            }
+            for model in self._semaphores
+        }
 
 class LocalRunner:
     """Handles local model inference"""
@@ -41,27 +131,89 @@ class LocalRunner:
         self.active_processes: Dict[str, subprocess.Popen] = {}
         self.inference_history: List[InferenceResponse] = []
         self.max_history = 100
+        self._http_client: Optional[httpx.AsyncClient] = None
+        self._warm_ups: set = set()
+        config = get_config()
+        self.slots = ModelSlots(config.parallel_requests_per_model)
+        self.backends: Dict[str, InferenceBackend] = {
+            "ollama": OllamaBackend(self._get_http_client),
+            "llama_cpp": LlamaCppBackend(
+                n_ctx=config.llama_cpp_context,
+                n_threads=config.llama_cpp_threads,
+                n_gpu_layers=config.llama_cpp_gpu_layers
+            ),
+        }
+    
+    def backend_for(self, model: str) -> Optional[InferenceBackend]:
+        """Backend for a model name, alias or tag, from the registry's dispatch table"""
+        route = get_model_registry().resolve(model)
+        return self.backends.get(route.backend) if route.backend else None
+    
+    def _route(self, request: InferenceRequest) -> Tuple[Optional[InferenceBackend], InferenceRequest]:
+        """Backend for a request, and the request as that backend names the model"""
+        route = get_model_registry().resolve(request.model)
+        backend = self.backends.get(route.backend) if route.backend else None
+        if route.target != request.model:
+            request = request.copy(update={"model": route.target})
+        return backend, request
     
+    def start_warm_up(self, model: str) -> Optional[asyncio.Task]:
+        """Start loading a model in the background so the load overlaps with request preparation"""
+        if not get_config().speculative_warm_up:
+            return None
+        task = asyncio.create_task(self.warm_up(model))
+        # Keep a reference until it finishes; the request does not wait for it
+        self._warm_ups.add(task)
+        task.add_done_callback(self._warm_ups.discard)
+        return task
+    
+    def estimated_wait(self, model: str) -> float:
+        """Seconds a new request for a model name, alias or tag would queue before generating"""
+        return self.slots.estimated_wait(get_model_registry().resolve(model).target)
+    
+    async def warm_up(self, model: str) -> Optional[bool]:
+        """Load a model ahead of its request; returns whether it had to be loaded
+        
+        Returns None when the model cannot be served. Failures are only logged,
+        since the request itself reports them.
+        """
+        try:
+            route = get_model_registry().resolve(model)
+            backend = self.backends.get(route.backend) if route.backend else None
+            if await self._backend_error(backend, model, route.target):
+                return None
+            cold = await backend.warm_up(route.target)
+            WARMUPS.inc(model=model, outcome="loaded" if cold else "resident")
+            return cold
+        except Exception as e:
+            logger.warning(f"Warm-up failed for model {model}: {e}")
+            WARMUPS.inc(model=model, outcome="failed")
+            return None
+    
+    @traced("LocalRunner.run_inference")
     async def run_inference(self, request: InferenceRequest) -> InferenceResponse:
         """Run inference on a local model"""
         start_time = datetime.now()
+        backend = None
         
         try:
-            # Check if model is available
-            if not await self._check_model_availability(request.model):
+            backend, target = self._route(request)
+            error = await self._backend_error(backend, request.model, target.model)
+            if error:
                 return InferenceResponse(
                     model=request.model,
                     response="",
                     timestamp=start_time.isoformat(),
                     success=False,
-                    error=f"Model {request.model} not available"
+                    error=error
                 )
             
-            # Run inference based on model provider
-            if await self._is_ollama_model(request.model):
-                response_text = await self._run_ollama_inference(request)
-            else:
-                response_text = await self._run_generic_inference(request)
+            await within_deadline(backend.prepare(target.model), "load")
+            async with self.slots.acquire(target.model):
+                # Cancelling on the deadline closes the HTTP request, so Ollama stops generating
+                response_text, metrics = await within_deadline(backend.complete(target), "inference")
+            if backend.provider:
+                get_provider_health().record_success(backend.provider)
             
             end_time = datetime.now()
             inference_time = (end_time - start_time).total_seconds()
@@ -71,7 +223,8 @@ class LocalRunner:
                 response=response_text,
                 inference_time=inference_time,
                 timestamp=end_time.isoformat(),
-                success=True
+                success=True,
+                **metrics
             )
             
             # Add to history
@@ -79,8 +232,11 @@ class LocalRunner:
             
             return response
             
+        except DeadlineExceeded:
+            raise
         except Exception as e:
             logger.error(f"Inference failed for model {request.model}: {e}")
+            self._record_transport_error(backend, e)
             return InferenceResponse(
                 model=request.model,
                 response="",
@@ -91,168 +247,121 @@ class LocalRunner:
     
     async def run_streaming_inference(self, request: InferenceRequest) -> AsyncGenerator[str, None]:
         """Run streaming inference on a local model"""
+        backend = None
         try:
-            if not await self._check_model_availability(request.model):
+            backend, target = self._route(request)
+            error = await self._backend_error(backend, request.model, target.model)
+            if error:
                 yield json.dumps({
-                    "error": f"Model {request.model} not available",
+                    "error": error,
                     "success": False
                 })
                 return
             
-            if await self._is_ollama_model(request.model):
-                async for chunk in self._run_ollama_streaming(request):
+            await within_deadline(backend.prepare(target.model), "load")
+            async with self.slots.acquire(target.model):
+                check_deadline("inference")
+                logger.info(f"Running {backend.name} streaming inference for model: {target.model}")
+                async for chunk in self._stream_events(backend, request, target):
                     yield chunk
-            else:
-                # For non-Ollama models, simulate streaming
-                response = await self._run_generic_inference(request)
-                for word in response.split():
-                    yield json.dumps({
-                        "content": word + " ",
-                        "success": True
-                    })
-                    await asyncio.sleep(0.05)  # Simulate streaming delay
                     
+        except DeadlineExceeded as e:
+            yield json.dumps({
+                "error": str(e),
+                "deadline_exceeded": True,
+                "success": False
+            })
         except Exception as e:
             logger.error(f"Streaming inference failed: {e}")
+            self._record_transport_error(backend, e)
             yield json.dumps({
                 "error": str(e),
                 "success": False
             })
     
-    async def _check_model_availability(self, model_name: str) -> bool:
-        """Check if model is available for inference"""
+    async def _stream_events(self, backend: InferenceBackend, request: InferenceRequest, target: InferenceRequest) -> AsyncGenerator[str, None]:
+        """Stream a generation from its backend as JSON chunks, checking the deadline between tokens"""
+        start_time = datetime.now()
+        if backend.supports_streaming:
+            events = backend.generate(target)
+        else:
+            events = self._complete_as_events(backend, target)
+        
         try:
-            if await self._is_ollama_model(model_name):
-                result = await asyncio.create_subprocess_exec(
-                    "ollama", "list",
-                    stdout=asyncio.subprocess.PIPE,
-                    stderr=asyncio.subprocess.PIPE
-                )
-                stdout, _ = await result.communicate()
-                return model_name in stdout.decode()
-            else:
-                # Check other providers
-                return True  # Placeholder
-        except Exception as e:
-            logger.error(f"Failed to check model availability: {e}")
-            return False
+            async for event in events:
+                if event.get("done"):
+                    end_time = datetime.now()
+                    self._add_to_history(InferenceResponse(
+                        model=request.model,
+                        response="",
+                        inference_time=(end_time - start_time).total_seconds(),
+                        timestamp=end_time.isoformat(),
+                        success=True,
+                        **event["metrics"]
+                    ))
+                    if backend.provider:
+                        get_provider_health().record_success(backend.provider)
+                    yield json.dumps({"metrics": event["metrics"], "success": True})
+                else:
+                    check_deadline("inference")
+                    yield json.dumps({
+                        "content": event["content"],
+                        "success": True
+                    })
+        finally:
+            # Closing the backend stream aborts the generation
+            await events.aclose()
+    
+    async def _complete_as_events(self, backend: InferenceBackend, request: InferenceRequest) -> AsyncGenerator[Dict[str, Any], None]:
+        """Stream events for a backend that can only return whole responses"""
+        text, metrics = await within_deadline(backend.complete(request), "inference")
+        for word in text.split():
+            yield {"content": word + " "}
+        yield {"done": True, "metrics": metrics}
     
-    async def _is_ollama_model(self, model_name: str) -> bool:
-        """Check if model is an Ollama model"""
-        # Simple heuristic - could be improved with registry lookup
-        ollama_models = ["phi3-mini", "mistral", "llama3", "codellama", "gemma", "qwen", "tinyllama"]
-        return any(model_name.startswith(prefix) for prefix in ollama_models)
+    async def _backend_error(self, backend: Optional[InferenceBackend], model: str, target: str) -> Optional[str]:
+        """Why a request for `model` (`target` in the backend) cannot run now, if it cannot"""
+        if backend is None:
+            return f"No inference backend for model {model}"
+        # Fail fast while the backend is known to be down (cached probe or open circuit)
+        reason = await backend.unavailable_reason()
+        if reason:
+            return reason
+        if not await backend.is_model_available(target):
+            return f"Model {model} not available"
+        return None
     
-    async def _run_ollama_inference(self, request: InferenceRequest) -> str:
-        """Run inference using Ollama"""
+    def _record_transport_error(self, backend: Optional[InferenceBackend], error: Exception):
+        """Count connection failures against the backend's provider circuit breaker"""
+        if backend is not None and backend.provider and isinstance(error, httpx.TransportError):
+            get_provider_health().record_failure(backend.provider, str(error))
+    
+    async def is_model_available(self, model_name: str) -> bool:
+        """Whether a model resolves to a backend that can serve it"""
         try:
-            # Use Ollama API instead of command line
-            import requests
-            import json
-            
-            # Prepare the request payload
-            payload = {
-                "model": request.model,
-                "prompt": request.prompt,
-                "stream": False
-            }
-            
-            # Add optional parameters
-            if request.temperature is not None:
-                payload["options"] = {
-                    "temperature": request.temperature
-                }
-            if request.max_tokens is not None:
-                if "options" not in payload:
-                    payload["options"] = {}
-                payload["options"]["num_predict"] = request.max_tokens
-            
-            logger.info(f"Running Ollama inference for model: {request.model}")
-            
-            # Make API request to Ollama
-            response = requests.post(
-                "http://localhost:11434/api/generate",
-                json=payload,
-                timeout=60
-            )
-            
-            if response.status_code == 200:
-                result = response.json()
-                response_text = result.get("response", "").strip()
-                logger.info(f"Ollama inference completed successfully")
-                return response_text
-            else:
-                error_msg = f"Ollama API error: {response.status_code} - {response.text}"
-                logger.error(error_msg)
-                raise Exception(error_msg)
-                
+            route = get_model_registry().resolve(model_name)
+            backend = self.backends.get(route.backend) if route.backend else None
+            return backend is not None and await backend.is_model_available(route.target)
         except Exception as e:
-            logger.error(f"Ollama inference error: {e}")
-            raise
+            logger.error(f"Failed to check model availability: {e}")
+            return False
     
-    async def _run_ollama_streaming(self, request: InferenceRequest) -> AsyncGenerator[str, None]:
-        """Run streaming inference using Ollama"""
-        try:
-            cmd = ["ollama", "run", request.model]
-            
-            if request.temperature is not None:
-                cmd.extend(["--temperature", str(request.temperature)])
-            if request.max_tokens is not None:
-                cmd.extend(["--num-predict", str(request.max_tokens)])
-            
-            logger.info(f"Running Ollama streaming inference: {' '.join(cmd)}")
-            
-            process = await asyncio.create_subprocess_exec(
-                *cmd,
-                stdin=asyncio.subprocess.PIPE,
-                stdout=asyncio.subprocess.PIPE,
-                stderr=asyncio.subprocess.PIPE
+    def _get_http_client(self) -> httpx.AsyncClient:
+        """Get the shared HTTP client for backend APIs"""
+        if self._http_client is None or self._http_client.is_closed:
+            self._http_client = httpx.AsyncClient(
+                base_url=OLLAMA_BASE_URL,
+                timeout=httpx.Timeout(BACKEND_TIMEOUT)
             )
-            
-            # Send prompt
-            process.stdin.write(request.prompt.encode())
-            await process.stdin.drain()
-            process.stdin.close()
-            
-            # Stream response
-            while True:
-                line = await process.stdout.readline()
-                if not line:
-                    break
-                
-                try:
-                    # Try to parse as JSON (Ollama streaming format)
-                    data = json.loads(line.decode().strip())
-                    if "response" in data:
-                        yield json.dumps({
-                            "content": data["response"],
-                            "success": True
-                        })
-                except json.JSONDecodeError:
-                    # If not JSON, treat as plain text
-                    content = line.decode().strip()
-                    if content:
-                        yield json.dumps({
-                            "content": content,
-                            "success": True
-                        })
-            
-            # Wait for process to complete
-            await process.wait()
-            
-        except Exception as e:
-            logger.error(f"Ollama streaming error: {e}")
-            yield json.dumps({
-                "error": str(e),
-                "success": False
-            })
+        return self._http_client
     
-    async def _run_generic_inference(self, request: InferenceRequest) -> str:
-        """Run inference using generic method (placeholder)"""
-        # This would be implemented for other model providers
-        # For now, return a placeholder response
-        await asyncio.sleep(1)  # Simulate inference time
-        return f"Generic inference response for model {request.model}: {request.prompt[:50]}..."
+    async def close(self):
+        """Close the shared HTTP client and release backend resources"""
+        for backend in self.backends.values():
+            await backend.close()
+        if self._http_client is not None:
+            await self._http_client.aclose()
+            self._http_client = None
     
     def _add_to_history(self, response: InferenceResponse):
         """Add response to inference history"""
@@ -268,6 +377,40 @@ class LocalRunner:
             return self.inference_history[-limit:]
         return self.inference_history.copy()
     
+    def get_inference_stats(self, model: Optional[str] = None) -> Dict[str, Any]:
+        """Aggregate backend metrics over the recent inference history"""
+        responses = [r for r in self.inference_history if model is None or r.model == model]
+        history = [r for r in responses if r.success]
+        
+        def summarize(values: List[float]) -> Optional[Dict[str, float]]:
+            values = sorted(v for v in values if v is not None)
+            if not values:
+                return None
+            return {
+                "avg": sum(values) / len(values),
+                "p50": values[len(values) // 2],
+                "p95": values[min(len(values) - 1, int(len(values) * 0.95))],
+                "max": values[-1]
+            }
+        
+        return {
+            "requests": len(responses),
+            "successful": len(history),
+            "prompt_tokens_total": sum(r.prompt_tokens or 0 for r in history),
+            "completion_tokens_total": sum(r.tokens_used or 0 for r in history),
+            "tokens_saved_total": sum(r.tokens_saved or 0 for r in history),
+            "stopped_early": sum(1 for r in history if r.stopped_early),
+            "tokens_per_second": summarize([r.tokens_per_second for r in history]),
+            "time_to_first_token": summarize([r.time_to_first_token for r in history]),
+            "prompt_eval_time": summarize([r.prompt_eval_time for r in history]),
+            "load_time": summarize([r.load_time for r in history]),
+            "inference_time": summarize([r.inference_time for r in history])
+        }
+    
+    def get_history_models(self) -> List[str]:
+        """Models that appear in the recent inference history"""
+        return sorted({r.model for r in self.inference_history})
+    
     def clear_history(self):
         """Clear inference history"""
         self.inference_history.clear()
@@ -281,13 +424,15 @@ class LocalRunner:
             del self.active_processes[model]
             logger.info(f"Stopped inference for model {model}")
     
-    def get_model_info(self, model: str) -> Dict[str, Any]:
+    async def get_model_info(self, model: str) -> Dict[str, Any]:
         """Get information about a model"""
-        # This would typically query the model registry
+        route = get_model_registry().resolve(model)
         return {
             "name": model,
-            "provider": "ollama" if self._is_ollama_model(model) else "unknown",
-            "status": "available" if self._check_model_availability(model) else "not_available"
+            "resolved": route.name,
+            "target": route.target,
+            "backend": route.backend or "unknown",
+            "status": "available" if await self.is_model_available(model) else "not_available"
         }
     
     async def test_model(self, model: str) -> bool:
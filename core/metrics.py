@@ -0,0 +1,218 @@
+"""
+Metrics registry for Ask Rumi Backend
+Counters and histograms for the inference pipeline, exported in the
+Prometheus/OpenMetrics text format.
+
+Recording is lock-free: each label set maps to a plain list of floats that is
+updated in place. Updates happen on the event loop, so no synchronization is
+needed on the hot path; a rare lost increment from a worker thread is accepted.
+
+Metrics are per worker process: every sample carries a `worker` label with the
+process id, so a scrape of a multi-worker server is one worker's view and
+totals need `sum without (worker)` over scrapes of all workers.
+"""
+
+import math
+import os
+from bisect import bisect_left
+from typing import Dict, Iterable, List, Optional, Tuple
+
+DEFAULT_LATENCY_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0
+)
+
+def _escape(value: str) -> str:
+    """Escape a label value for the exposition format"""
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_labels(names: Iterable[str], values: Iterable[str], extra: str = "") -> str:
+    """Render a label set as {a="1",b="2"}"""
+    parts = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+class Metric:
+    """Base class for labelled metrics"""
+    type_name = "untyped"
+
+    def __init__(self, name: str, help_text: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def render(self, const: str = "") -> List[str]:
+        """Render the metric; `const` is a pre-formatted label added to every sample"""
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} {self.type_name}"]
+        lines.extend(self._render_samples(const))
+        return lines
+
+    def _render_samples(self, const: str) -> List[str]:
+        raise NotImplementedError
+
+class Counter(Metric):
+    """Monotonically increasing counter"""
+    type_name = "counter"
+
+    def __init__(self, name: str, help_text: str, labelnames: Tuple[str, ...] = ()):
+        super().__init__(name, help_text, labelnames)
+        self._values: Dict[Tuple[str, ...], List[float]] = {}
+
+    def inc(self, amount: float = 1.0, **labels: str):
+        """Increment the counter for a label set"""
+        key = self._key(labels)
+        cell = self._values.get(key)
+        if cell is None:
+            cell = self._values.setdefault(key, [0.0])
+        cell[0] += amount
+
+    def value(self, **labels: str) -> float:
+        cell = self._values.get(self._key(labels))
+        return cell[0] if cell else 0.0
+
+    def _render_samples(self, const: str) -> List[str]:
+        return [
+            f"{self.name}_total{_format_labels(self.labelnames, key, const)} {_format_value(cell[0])}"
+            for key, cell in list(self._values.items())
+        ]
+
+class Histogram(Metric):
+    """Cumulative histogram with fixed buckets"""
+    type_name = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help_text: str,
+        labelnames: Tuple[str, ...] = (),
+        buckets: Tuple[float, ...] = DEFAULT_LATENCY_BUCKETS
+    ):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        # Per label set: one count per bucket, then sum, then count
+        self._values: Dict[Tuple[str, ...], List[float]] = {}
+
+    def observe(self, value: float, **labels: str):
+        """Record one observation for a label set"""
+        key = self._key(labels)
+        cell = self._values.get(key)
+        if cell is None:
+            cell = self._values.setdefault(key, [0.0] * (len(self.buckets) + 2))
+        cell[bisect_left(self.buckets, value)] += 1
+        cell[-2] += value
+        cell[-1] += 1
+
+    def _render_samples(self, const: str) -> List[str]:
+        lines = []
+        for key, cell in list(self._values.items()):
+            cumulative = 0.0
+            for bound, count in zip(self.buckets, cell):
+                cumulative += count
+                le = ",".join(filter(None, (const, f'le="{_format_value(bound)}"')))
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {_format_value(cumulative)}")
+            labels = _format_labels(self.labelnames, key, const)
+            lines.append(f"{self.name}_sum{labels} {_format_value(cell[-2])}")
+            lines.append(f"{self.name}_count{labels} {_format_value(cell[-1])}")
+        return lines
+
+class MetricsRegistry:
+    """Holds all metrics and renders the exposition text"""
+
+    def __init__(self):
+        self.metrics: Dict[str, Metric] = {}
+
+    def counter(self, name: str, help_text: str, labelnames: Tuple[str, ...] = ()) -> Counter:
+        return self._register(Counter(name, help_text, labelnames))
+
+    def histogram(
+        self,
+        name: str,
+        help_text: str,
+        labelnames: Tuple[str, ...] = (),
+        buckets: Tuple[float, ...] = DEFAULT_LATENCY_BUCKETS
+    ) -> Histogram:
+        return self._register(Histogram(name, help_text, labelnames, buckets))
+
+    def get(self, name: str) -> Optional[Metric]:
+        return self.metrics.get(name)
+
+    def render(self) -> str:
+        """Render all metrics in the Prometheus text format, labelled with this worker's pid"""
+        const = f'worker="{os.getpid()}"'
+        lines = []
+        for metric in self.metrics.values():
+            lines.extend(metric.render(const))
+        return "\n".join(lines) + "\n"
+
+    def _register(self, metric: Metric) -> Metric:
+        existing = self.metrics.get(metric.name)
+        if existing is not None:
+            return existing
+        self.metrics[metric.name] = metric
+        return metric
+
+# Global instance
+metrics_registry = MetricsRegistry()
+
+def get_metrics_registry() -> MetricsRegistry:
+    """Get the global metrics registry"""
+    return metrics_registry
+
+# Inference pipeline metrics
+PIPELINE_LABELS = ("model", "mode")
+
+REQUEST_LATENCY = metrics_registry.histogram(
+    "rumi_request_latency_seconds", "End-to-end ask-rumi latency", PIPELINE_LABELS
+)
+TIME_TO_FIRST_TOKEN = metrics_registry.histogram(
+    "rumi_time_to_first_token_seconds", "Time until the first generated token", PIPELINE_LABELS
+)
+ANALYSIS_TIME = metrics_registry.histogram(
+    "rumi_analysis_seconds", "Query analysis time", PIPELINE_LABELS
+)
+RETRIEVAL_TIME = metrics_registry.histogram(
+    "rumi_retrieval_seconds", "Quote retrieval time", PIPELINE_LABELS
+)
+QUEUE_WAIT = metrics_registry.histogram(
+    "rumi_queue_wait_seconds", "Time tasks spend waiting in the queue", ("function",)
+)
+TOKENS = metrics_registry.counter(
+    "rumi_tokens", "Tokens processed by the backend", PIPELINE_LABELS + ("kind",)
+)
+REQUESTS = metrics_registry.counter(
+    "rumi_requests", "Ask-rumi requests served", PIPELINE_LABELS
+)
+CACHE_HITS = metrics_registry.counter(
+    "rumi_cache_hits", "Cache hits", ("cache",)
+)
+CACHE_MISSES = metrics_registry.counter(
+    "rumi_cache_misses", "Cache misses", ("cache",)
+)
+REJECTIONS = metrics_registry.counter(
+    "rumi_rejections", "Requests rejected or failed before a reply was produced", ("reason",)
+)
+ABANDONED = metrics_registry.counter(
+    "rumi_abandoned_requests", "Requests given up on after their deadline passed or the client left", ("reason", "stage")
+)
+ABANDONED_TOKENS = metrics_registry.counter(
+    "rumi_abandoned_tokens", "Tokens generated for requests that were then abandoned", ("reason",)
+)
+WARMUPS = metrics_registry.counter(
+    "rumi_model_warmups", "Model loads started while a request was still being prepared", ("model", "outcome")
+)
+MODEL_ROUTES = metrics_registry.counter(
+    "rumi_model_routes", "Ask-rumi replies by the model chosen and why", ("model", "reason")
+)
+BYPASSES = metrics_registry.counter(
+    "rumi_model_bypasses", "Ask-rumi messages answered without calling a model (bypass rate: against rumi_requests)", ("source", "category")
+)
@@ -7,13 +7,21 @@ import json
 import asyncio
 import subprocess
 import logging
+import time
+from collections import OrderedDict, deque
+from dataclasses import dataclass
 from pathlib import Path
-from typing import Dict, List, Optional, Any
+from typing import Deque, Dict, List, Optional, Any
 from pydantic import BaseModel
 import aiofiles
+import httpx
+import psutil
 import requests
 from datetime import datetime
 
+from core.config import get_config
+from core.persistence import get_persistence_manager
+
 logger = logging.getLogger(__name__)
 
 class ModelInfo(BaseModel):
@@ -28,15 +36,115 @@ class ModelInfo(BaseModel):
     last_updated: Optional[str] = None
     tags: List[str] = []
     capabilities: List[str] = []  # ["chat", "embedding", "transcription"]
+    backend: Optional[str] = None  # inference backend ("ollama", "llama_cpp"); default from provider
+    backend_model: Optional[str] = None  # name the backend knows the model by, e.g. "phi3:mini"; default name
+    aliases: List[str] = []  # other names that route to this model
+    model_path: Optional[str] = None  # GGUF file for in-process backends
+
+# Backend used for a provider when a model does not name one
+PROVIDER_BACKENDS = {
+    "ollama": "ollama",
+    "local": "llama_cpp",
+}
+
+# Backend for models that are not in the registry (Ollama serves any pulled model)
+DEFAULT_BACKEND = "ollama"
+
+# Requests for "tag:<tag>" go to a model with that tag, available models first
+TAG_PREFIX = "tag:"
+
+@dataclass(frozen=True)
+class ModelRoute:
+    """Where requests for a model name are sent"""
+    name: str  # registry name (the requested name if unregistered)
+    backend: Optional[str]  # None when no backend can generate with the model
+    target: str  # name the backend knows the model by
+
+class DownloadProgress(BaseModel):
+    """Live progress of a model download"""
+    model: str
+    status: str  # "queued", "downloading", "retrying", "completed", "failed"
+    phase: str = ""  # last status line from Ollama, e.g. "pulling manifest"
+    completed_bytes: int = 0
+    total_bytes: int = 0
+    percent: float = 0.0
+    attempts: int = 0
+    error: Optional[str] = None
+    updated_at: Optional[str] = None
+    
+    @property
+    def finished(self) -> bool:
+        return self.status in ("completed", "failed")
+
+def _ollama_client() -> httpx.AsyncClient:
+    """Shared Ollama HTTP client owned by the local runner"""
+    from core.local_runner import get_local_runner
+    return get_local_runner()._get_http_client()
 
 class ModelRegistry:
     """Manages model registry and downloads"""
     
-    def __init__(self, registry_path: str = "data/model_registry.json"):
+    # Seconds between checks for registry changes written by other workers
+    RELOAD_CHECK_INTERVAL = 1.0
+    
+    def __init__(
+        self,
+        registry_path: str = "data/model_registry.json",
+        max_concurrent_downloads: int = 2,
+        download_retries: int = 3
+    ):
         self.registry_path = Path(registry_path)
         self.models: Dict[str, ModelInfo] = {}
         self.download_tasks: Dict[str, asyncio.Task] = {}
+        self.download_progress: Dict[str, DownloadProgress] = {}
+        self.max_concurrent_downloads = max_concurrent_downloads
+        self.download_retries = download_retries
+        self._download_semaphore: Optional[asyncio.Semaphore] = None
+        # Replaced on every update; waiters hold the event that was current when they started
+        self._progress_event: Optional[asyncio.Event] = None
+        self._mtime: Optional[float] = None
+        self._last_reload_check = 0.0
+        # Dispatch table: every name, alias and tag a request may use -> route
+        self._routes: Dict[str, ModelRoute] = {}
+        self._tag_index: Dict[str, List[str]] = {}
         self._load_registry()
+        self._rebuild_routes()
+    
+    def _file_mtime(self) -> Optional[float]:
+        try:
+            return self.registry_path.stat().st_mtime
+        except OSError:
+            return None
+    
+    def reload_if_changed(self):
+        """Reload the registry if another worker process has rewritten it"""
+        now = time.monotonic()
+        if now - self._last_reload_check < self.RELOAD_CHECK_INTERVAL:
+            return
+        self._last_reload_check = now
+        
+        # Our own save has not reached the disk yet; the file is older than memory
+        if get_persistence_manager().is_pending(self.registry_path):
+            return
+        if self._file_mtime() == self._mtime:
+            return
+        try:
+            with open(self.registry_path, 'r') as f:
+                data = json.load(f)
+            models = {}
+            for model_data in data.get("models", []):
+                model = ModelInfo(**model_data)
+                models[model.name] = model
+            # Keep in-flight download state owned by this worker
+            for name in self.download_tasks:
+                if name in self.models:
+                    models[name] = self.models[name]
+            self.models = models
+            self._rebuild_routes()
+            self._mtime = self._file_mtime()
+            logger.info(f"Reloaded model registry ({len(self.models)} models)")
+        except Exception as e:
+            logger.error(f"Failed to reload model registry: {e}")
     
     def _load_registry(self):
         """Load model registry from JSON file"""
@@ -47,6 +155,7 @@ class ModelRegistry:
                     for model_data in data.get("models", []):
                         model = ModelInfo(**model_data)
                         self.models[model.name] = model
+                self._mtime = self._file_mtime()
                 logger.info(f"Loaded {len(self.models)} models from registry")
             except Exception as e:
                 logger.error(f"Failed to load model registry: {e}")
@@ -63,6 +172,8 @@ class ModelRegistry:
                 "description": "Microsoft's lightweight language model, perfect for local inference",
                 "size_gb": 2.3,
                 "provider": "ollama",
+                "backend_model": "phi3:mini",
+                "aliases": ["phi3"],
                 "status": "not_available",
                 "tags": ["chat", "lightweight", "fast"],
                 "capabilities": ["chat"]
@@ -116,19 +227,72 @@ class ModelRegistry:
         self._save_registry()
         logger.info("Created default model registry")
     
+    def _rebuild_routes(self):
+        """Precompute routing for every registry name, alias and tag"""
+        routes: Dict[str, ModelRoute] = {}
+        for model in self.models.values():
+            routes[model.name] = ModelRoute(
+                name=model.name,
+                backend=model.backend or PROVIDER_BACKENDS.get(model.provider),
+                target=model.backend_model or model.name
+            )
+        
+        # Aliases never shadow a registry name or an earlier alias
+        for model in self.models.values():
+            for alias in [model.backend_model, *model.aliases]:
+                if alias:
+                    routes.setdefault(alias, routes[model.name])
+        
+        tag_index: Dict[str, List[str]] = {}
+        for model in self.models.values():
+            for tag in model.tags:
+                tag_index.setdefault(tag, []).append(model.name)
+        for tag, names in tag_index.items():
+            names.sort(key=lambda name: self.models[name].status != "available")
+            routes[f"{TAG_PREFIX}{tag}"] = routes[names[0]]
+        
+        self._routes = routes
+        self._tag_index = tag_index
+    
+    def resolve(self, name: str) -> ModelRoute:
+        """Route for a requested model name, alias or `tag:<tag>`"""
+        route = self._routes.get(name)
+        if route is None:
+            return ModelRoute(name=name, backend=DEFAULT_BACKEND, target=name)
+        return route
+    
+    def registry_name(self, backend_name: str) -> str:
+        """Registry name for a model as the backend reports it (Ollama adds ":latest" to untagged names)"""
+        route = self._routes.get(backend_name)
+        if route is None and backend_name.endswith(":latest"):
+            route = self._routes.get(backend_name[:-len(":latest")])
+        return route.name if route is not None else backend_name
+    
+    def models_with_tag(self, tag: str) -> List[str]:
+        """Registry names carrying a tag, available models first"""
+        return list(self._tag_index.get(tag, []))
+    
     def _save_registry(self):
-        """Save model registry to JSON file"""
+        """Save model registry to JSON file (debounced, atomic)"""
+        self._rebuild_routes()
         try:
-            self.registry_path.parent.mkdir(parents=True, exist_ok=True)
-            data = {
-                "models": [model.dict() for model in self.models.values()],
-                "last_updated": datetime.now().isoformat()
-            }
-            with open(self.registry_path, 'w') as f:
-                json.dump(data, f, indent=2)
+            get_persistence_manager().save_json(
+                self.registry_path,
+                self._registry_data,
+                on_written=self._on_registry_written
+            )
         except Exception as e:
             logger.error(f"Failed to save model registry: {e}")
     
+    def _registry_data(self) -> Dict[str, Any]:
+        return {
+            "models": [model.dict() for model in self.models.values()],
+            "last_updated": datetime.now().isoformat()
+        }
+    
+    def _on_registry_written(self, path: Path):
+        self._mtime = self._file_mtime()
+    
     def get_model(self, name: str) -> Optional[ModelInfo]:
         """Get model information by name"""
         return self.models.get(name)
@@ -208,6 +372,8 @@ class ModelRegistry:
         # Update status
         model.status = "downloading"
         model.download_progress = 0.0
+        self.download_progress[name] = DownloadProgress(model=name, status="queued")
+        self._update_progress(name)
         self._save_registry()
         
         # Start download task
@@ -229,41 +395,82 @@ class ModelRegistry:
                 model.status = "available"
                 model.download_progress = 100.0
                 model.last_updated = datetime.now().isoformat()
+                self._update_progress(name, status="completed", percent=100.0, error=None)
             else:
                 model.status = "error"
+                if not self.download_progress[name].finished:
+                    self._update_progress(name, status="failed")
             return success
         except Exception as e:
             logger.error(f"Failed to download model {name}: {e}")
             model.status = "error"
+            self._update_progress(name, status="failed", error=str(e))
             return False
         finally:
             self.download_tasks.pop(name, None)
             self._save_registry()
     
     async def _download_ollama_model(self, name: str) -> bool:
-        """Download model using Ollama"""
-        try:
-            logger.info(f"Starting Ollama download for {name}")
-            
-            # Run ollama pull command
-            process = await asyncio.create_subprocess_exec(
-                "ollama", "pull", name,
-                stdout=asyncio.subprocess.PIPE,
-                stderr=asyncio.subprocess.PIPE
-            )
-            
-            stdout, stderr = await process.communicate()
-            
-            if process.returncode == 0:
-                logger.info(f"Successfully downloaded Ollama model {name}")
-                return True
-            else:
-                logger.error(f"Failed to download Ollama model {name}: {stderr.decode()}")
-                return False
+        """Pull a model through Ollama's streaming /api/pull, retrying interrupted pulls"""
+        progress = self.download_progress[name]
+        # Per-layer byte counts, kept across attempts since Ollama resumes layers
+        layers: Dict[str, Dict[str, int]] = {}
+        async with self._get_download_semaphore():
+            for attempt in range(1, self.download_retries + 2):
+                progress.attempts = attempt
+                self._update_progress(name, status="downloading")
+                try:
+                    if await self._pull_ollama_model(name, layers):
+                        self._update_progress(name, status="completed", percent=100.0, error=None)
+                        logger.info(f"Successfully downloaded Ollama model {name}")
+                        return True
+                    return False
+                except (httpx.HTTPError, ConnectionError) as e:
+                    if attempt > self.download_retries:
+                        self._update_progress(name, status="failed", error=str(e))
+                        logger.error(f"Giving up on Ollama model {name} after {attempt} attempts: {e}")
+                        return False
+                    # Ollama keeps partially downloaded layers, so the next pull resumes
+                    delay = 2 ** attempt
+                    self._update_progress(name, status="retrying", error=str(e))
+                    logger.warning(f"Pull of {name} interrupted ({e}), resuming in {delay}s")
+                    await asyncio.sleep(delay)
+        return False
+    
+    async def _pull_ollama_model(self, name: str, layers: Dict[str, Dict[str, int]]) -> bool:
+        """Run one /api/pull stream, recording byte progress per layer"""
+        client = _ollama_client()
+        async with client.stream(
+            "POST",
+            "/api/pull",
+            json={"model": self.resolve(name).target, "stream": True},
+            timeout=httpx.Timeout(30.0, read=None)
+        ) as response:
+            response.raise_for_status()
+            async for line in response.aiter_lines():
+                if not line.strip():
+                    continue
+                event = json.loads(line)
+                if "error" in event:
+                    self._update_progress(name, status="failed", error=event["error"])
+                    logger.error(f"Failed to download Ollama model {name}: {event['error']}")
+                    return False
                 
-        except Exception as e:
-            logger.error(f"Error downloading Ollama model {name}: {e}")
-            return False
+                digest = event.get("digest")
+                if digest and event.get("total"):
+                    layers[digest] = {"total": event["total"], "completed": event.get("completed", 0)}
+                total = sum(layer["total"] for layer in layers.values())
+                completed = sum(layer["completed"] for layer in layers.values())
+                self._update_progress(
+                    name,
+                    phase=event.get("status", ""),
+                    total_bytes=total,
+                    completed_bytes=completed,
+                    percent=round(completed / total * 100, 1) if total else 0.0
+                )
+                if event.get("status") == "success":
+                    return True
+        raise ConnectionError("pull stream ended before completion")
     
     async def _download_huggingface_model(self, name: str) -> bool:
         """Download model from HuggingFace"""
@@ -288,7 +495,43 @@ class ModelRegistry:
             return model.download_progress
         return None
     
-    def remove_model(self, name: str) -> bool:
+    def get_download_state(self, name: str) -> Optional[DownloadProgress]:
+        """Get byte-level progress of the current or last download of a model"""
+        return self.download_progress.get(name)
+    
+    def _get_download_semaphore(self) -> asyncio.Semaphore:
+        if self._download_semaphore is None:
+            self._download_semaphore = asyncio.Semaphore(self.max_concurrent_downloads)
+        return self._download_semaphore
+    
+    def _update_progress(self, name: str, **changes: Any):
+        """Update download progress and wake up progress subscribers"""
+        progress = self.download_progress.get(name)
+        if progress is None:
+            return
+        for key, value in changes.items():
+            setattr(progress, key, value)
+        progress.updated_at = datetime.now().isoformat()
+        
+        model = self.models.get(name)
+        if model is not None:
+            model.download_progress = progress.percent
+        
+        if self._progress_event is not None:
+            self._progress_event.set()
+            self._progress_event = None
+    
+    async def wait_for_progress(self, timeout: float) -> bool:
+        """Wait until any download reports progress, or the timeout passes"""
+        if self._progress_event is None:
+            self._progress_event = asyncio.Event()
+        try:
+            await asyncio.wait_for(self._progress_event.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+    
+    async def remove_model(self, name: str) -> bool:
         """Remove a model from registry and local storage"""
         model = self.models.get(name)
         if not model:
@@ -297,16 +540,19 @@ class ModelRegistry:
         try:
             if model.provider == "ollama":
                 # Remove from Ollama
-                subprocess.run(["ollama", "rm", name], check=True)
+                response = await _ollama_client().request("DELETE", "/api/delete", json={"model": self.resolve(name).target})
+                if response.status_code not in (200, 404):
+                    response.raise_for_status()
             elif model.provider == "huggingface":
                 # Remove local cache
                 import shutil
                 cache_dir = Path.home() / ".cache" / "huggingface" / "transformers"
                 if cache_dir.exists():
-                    shutil.rmtree(cache_dir / name, ignore_errors=True)
+                    await asyncio.to_thread(shutil.rmtree, cache_dir / name, ignore_errors=True)
             
             # Remove from registry
             del self.models[name]
+            self.download_progress.pop(name, None)
             self._save_registry()
             
             logger.info(f"Removed model {name}")
@@ -326,9 +572,264 @@ class ModelRegistry:
                 model.last_updated = datetime.now().isoformat()
             self._save_registry()
 
-# Global instance
-model_registry = ModelRegistry()
+class ResidentModel(BaseModel):
+    """A model currently loaded in Ollama"""
+    name: str  # registry name
+    backend_model: str  # name Ollama reports
+    size_gb: float
+    vram_gb: float = 0.0
+    pinned: bool = False
+    last_used: Optional[str] = None
+    expires_at: Optional[str] = None
+
+class ResidencyDecision(BaseModel):
+    """A load, pin or eviction decision made by the residency manager"""
+    timestamp: str
+    action: str  # "load", "evict", "pin", "unpin"
+    model: str
+    reason: str
+
+class ModelResidencyManager:
+    """
+    Keeps hot models loaded in Ollama and evicts cold ones under a memory budget
+
+    Resident models are read from Ollama's /api/ps. Pinned models are requested
+    with keep_alive=-1 so Ollama never unloads them; other models use the
+    configured keep_alive. Before a model is used, least recently used unpinned
+    models are unloaded (keep_alive=0) until the incoming model fits the budget.
+
+    Models are tracked by registry name; any name, alias or backend name passed
+    in is resolved through the registry, and only requests to Ollama use the
+    backend name (e.g. `phi3-mini` -> `phi3:mini`).
+
+    Each worker process keeps its own usage history; /api/ps is the shared
+    truth about what is loaded, so workers may disagree on which model is
+    least recently used but never on what is resident after a refresh.
+    """
+    
+    # Seconds a /api/ps snapshot is trusted before asking Ollama again
+    PS_TTL = 5.0
+    MAX_DECISIONS = 100
+    
+    def __init__(
+        self,
+        budget_gb: float,
+        pinned: Optional[List[str]] = None,
+        keep_alive: str = "30m"
+    ):
+        self.budget_gb = budget_gb
+        self.keep_alive = keep_alive
+        self.pinned = {self._key(model) for model in pinned or []}
+        self.resident: Dict[str, ResidentModel] = {}
+        # Least recently used first
+        self._usage: "OrderedDict[str, str]" = OrderedDict()
+        self.decisions: Deque[ResidencyDecision] = deque(maxlen=self.MAX_DECISIONS)
+        self._refreshed_at = 0.0
+        self._lock = asyncio.Lock()
+        # Loads started ahead of a request, which the request then waits for
+        self._warming: Dict[str, asyncio.Task] = {}
+    
+    @property
+    def used_gb(self) -> float:
+        return sum(model.size_gb for model in self.resident.values())
+    
+    @staticmethod
+    def _key(model: str) -> str:
+        """Registry name for a requested name, alias, tag or backend name"""
+        return get_model_registry().resolve(model).name
+    
+    @staticmethod
+    def _target(model: str) -> str:
+        """Name Ollama knows a model by"""
+        return get_model_registry().resolve(model).target
+    
+    def is_resident(self, model: str) -> bool:
+        """Whether a model was loaded at the last refresh"""
+        return self._key(model) in self.resident
+    
+    def keep_alive_for(self, model: str):
+        """keep_alive to send with requests for a model"""
+        return -1 if self._key(model) in self.pinned else self.keep_alive
+    
+    def _record(self, action: str, model: str, reason: str):
+        self.decisions.append(ResidencyDecision(
+            timestamp=datetime.now().isoformat(),
+            action=action,
+            model=model,
+            reason=reason
+        ))
+        logger.info(f"Residency {action} {model}: {reason}")
+    
+    async def refresh(self, force: bool = False):
+        """Update resident models from Ollama's /api/ps"""
+        if not force and time.monotonic() - self._refreshed_at < self.PS_TTL:
+            return
+        try:
+            response = await _ollama_client().get("/api/ps")
+            response.raise_for_status()
+            models = response.json().get("models", [])
+        except Exception as e:
+            logger.warning(f"Failed to read loaded models from Ollama: {e}")
+            return
+        
+        registry = get_model_registry()
+        resident = {}
+        for data in models:
+            backend_name = data.get("name") or data.get("model")
+            name = registry.registry_name(backend_name)
+            resident[name] = ResidentModel(
+                name=name,
+                backend_model=backend_name,
+                size_gb=data.get("size", 0) / (1024**3),
+                vram_gb=data.get("size_vram", 0) / (1024**3),
+                pinned=name in self.pinned,
+                last_used=self._usage.get(name),
+                expires_at=data.get("expires_at")
+            )
+        self.resident = resident
+        self._refreshed_at = time.monotonic()
+    
+    def _estimate_size_gb(self, model: str) -> float:
+        """Memory a model will need once loaded"""
+        if model in self.resident:
+            return self.resident[model].size_gb
+        info = get_model_registry().get_model(model)
+        return info.size_gb if info else 0.0
+    
+    async def prepare(self, model: str):
+        """Mark a model as used and make room for it if it is not loaded yet"""
+        model = self._key(model)
+        warming = self._warming.get(model)
+        if warming is not None and warming is not asyncio.current_task():
+            # Already being loaded by a warm-up; wait for it rather than loading twice
+            await asyncio.shield(warming)
+        self._usage[model] = datetime.now().isoformat()
+        self._usage.move_to_end(model)
+        
+        async with self._lock:
+            await self.refresh()
+            if model in self.resident:
+                self.resident[model].last_used = self._usage[model]
+                return
+            
+            needed = self._estimate_size_gb(model)
+            for candidate in self._eviction_order(exclude=model):
+                if self.used_gb + needed <= self.budget_gb:
+                    break
+                await self._unload(
+                    candidate,
+                    f"least recently used; {self.used_gb:.2f} GB resident + {needed:.2f} GB for {model} "
+                    f"exceeds budget {self.budget_gb:.2f} GB"
+                )
+            self._record("load", model, f"first use, estimated {needed:.2f} GB")
+    
+    def _eviction_order(self, exclude: str) -> List[str]:
+        """Unpinned resident models, least recently used first"""
+        candidates = [name for name in self.resident if name != exclude and name not in self.pinned]
+        # Models never used through this backend are the coldest
+        return sorted(candidates, key=lambda name: (name in self._usage, self._usage.get(name, "")))
+    
+    async def _unload(self, model: str, reason: str) -> bool:
+        """Ask Ollama to unload a model now"""
+        try:
+            response = await _ollama_client().post("/api/generate", json={"model": self._target(model), "keep_alive": 0})
+            response.raise_for_status()
+        except Exception as e:
+            logger.warning(f"Failed to unload model {model}: {e}")
+            return False
+        self.resident.pop(model, None)
+        self._record("evict", model, reason)
+        return True
+    
+    async def load(self, model: str) -> bool:
+        """Load a model without generating, so its first request is warm"""
+        model = self._key(model)
+        await self.prepare(model)
+        payload = {"model": self._target(model), "keep_alive": self.keep_alive_for(model)}
+        try:
+            response = await _ollama_client().post("/api/generate", json=payload, timeout=None)
+            response.raise_for_status()
+        except Exception as e:
+            logger.warning(f"Failed to preload model {model}: {e}")
+            return False
+        # Pick up the real size on the next refresh
+        self._refreshed_at = 0.0
+        return True
+    
+    async def warm(self, model: str) -> bool:
+        """Load a model ahead of its request unless it is resident; returns whether a load was needed
+        
+        Concurrent warm-ups of the same model share one load.
+        """
+        model = self._key(model)
+        task = self._warming.get(model)
+        if task is None:
+            task = asyncio.create_task(self._warm(model))
+            self._warming[model] = task
+            task.add_done_callback(lambda _: self._warming.pop(model, None))
+        return await asyncio.shield(task)
+    
+    async def _warm(self, model: str) -> bool:
+        await self.refresh()
+        if model in self.resident:
+            return False
+        await self.load(model)
+        return True
+    
+    async def pin(self, model: str) -> bool:
+        """Keep a model loaded indefinitely"""
+        model = self._key(model)
+        self.pinned.add(model)
+        self._record("pin", model, "pinned")
+        return await self.load(model)
+    
+    async def unpin(self, model: str) -> bool:
+        """Let a model expire after the normal keep_alive"""
+        model = self._key(model)
+        if model not in self.pinned:
+            return False
+        self.pinned.discard(model)
+        self._record("unpin", model, f"keep_alive back to {self.keep_alive}")
+        if model in self.resident:
+            await _ollama_client().post("/api/generate", json={"model": self._target(model), "keep_alive": self.keep_alive})
+        return True
+    
+    async def get_status(self) -> Dict[str, Any]:
+        """Resident models, budget and recent decisions"""
+        await self.refresh()
+        return {
+            "budget_gb": self.budget_gb,
+            "used_gb": self.used_gb,
+            "keep_alive": self.keep_alive,
+            "pinned": sorted(self.pinned),
+            "resident": [model.dict() for model in self.resident.values()],
+            "decisions": [decision.dict() for decision in reversed(self.decisions)]
+        }
+
+# Global instances
+model_registry = ModelRegistry(
+    max_concurrent_downloads=get_config().max_concurrent_downloads,
+    download_retries=get_config().download_retries
+)
+_residency_manager: Optional[ModelResidencyManager] = None
 
 def get_model_registry() -> ModelRegistry:
     """Get the global model registry instance"""
-    return model_registry
\ No newline at end of file
+    model_registry.reload_if_changed()
+    return model_registry
+
+def get_residency_manager() -> ModelResidencyManager:
+    """Get the global residency manager, configured from AppConfig"""
+    global _residency_manager
+    if _residency_manager is None:
+        config = get_config()
+        budget_gb = config.max_gpu_memory
+        if budget_gb is None:
+            budget_gb = psutil.virtual_memory().total / (1024**3) * config.model_memory_fraction
+        pinned = config.pinned_models if config.pinned_models is not None else config.default_models
+        _residency_manager = ModelResidencyManager(
+            budget_gb=budget_gb,
+            pinned=pinned,
+            keep_alive=config.keep_alive
+        )
+    return _residency_manager
\ No newline at end of file
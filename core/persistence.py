@@ -0,0 +1,224 @@
+"""
+Persistence for Ask Rumi Backend
+Atomic, debounced JSON writes for registry and config files, with versioned
+snapshots of previous contents.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import shutil
+import tempfile
+import threading
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_DIR = "snapshots"
+
+def _fsync_dir(directory: Path):
+    """Persist a rename by syncing its directory (no-op where unsupported)"""
+    try:
+        fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+def list_snapshots(path: Path) -> List[Path]:
+    """Snapshots of a file, oldest first"""
+    path = Path(path)
+    snapshot_dir = path.parent / SNAPSHOT_DIR
+    if not snapshot_dir.exists():
+        return []
+    return sorted(snapshot_dir.glob(f"{path.stem}.*{path.suffix}"))
+
+def _snapshot(path: Path, keep: int):
+    """Copy the current file into the snapshot directory and prune old copies"""
+    snapshot_dir = path.parent / SNAPSHOT_DIR
+    snapshot_dir.mkdir(parents=True, exist_ok=True)
+    stamp = datetime.now().strftime("%Y%m%dT%H%M%S%f")
+    shutil.copy2(path, snapshot_dir / f"{path.stem}.{stamp}{path.suffix}")
+    for old in list_snapshots(path)[:-keep]:
+        old.unlink(missing_ok=True)
+
+def atomic_write_text(path: Path, text: str, snapshots: int = 0):
+    """Write a file so readers see either the old or the new contents, never a mix"""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    if snapshots and path.exists():
+        _snapshot(path, snapshots)
+
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(text)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+    _fsync_dir(path.parent)
+
+def atomic_write_json(path: Path, data: Any, indent: int = 2, ensure_ascii: bool = True, snapshots: int = 0):
+    """Serialize and atomically write JSON"""
+    atomic_write_text(path, json.dumps(data, indent=indent, ensure_ascii=ensure_ascii), snapshots)
+
+@dataclass
+class PendingWrite:
+    """A scheduled write; only the latest producer is used when it fires"""
+    producer: Callable[[], Any]
+    indent: int
+    ensure_ascii: bool
+    first_scheduled: float
+    on_written: Optional[Callable[[Path], None]] = None
+    handle: Optional[asyncio.TimerHandle] = None
+
+class PersistenceManager:
+    """
+    Coalesces bursts of saves into one atomic write per file
+
+    `save_json` records a producer for the file's latest contents. The write
+    happens `debounce` seconds after the last call (at most `max_delay` after
+    the first); the producer runs on the event loop for a consistent view, and
+    the disk I/O runs in a worker thread. Without a running loop, writes happen
+    immediately.
+    """
+
+    def __init__(self, debounce: float = 0.5, max_delay: float = 2.0, snapshots: int = 5):
+        self.debounce = debounce
+        self.max_delay = max_delay
+        self.snapshots = snapshots
+        self._pending: Dict[Path, PendingWrite] = {}
+        self._inflight: Set[asyncio.Future] = set()
+        self._locks: Dict[Path, threading.Lock] = {}
+        # Writes are numbered per file so a slow older write never lands after a newer one
+        self._sequence: Dict[Path, int] = {}
+        self._written: Dict[Path, int] = {}
+        # Serialized contents handed to a worker thread but not yet on disk
+        self._unwritten: Dict[Path, str] = {}
+
+    def save_json(
+        self,
+        path: Path,
+        producer: Callable[[], Any],
+        indent: int = 2,
+        ensure_ascii: bool = True,
+        on_written: Optional[Callable[[Path], None]] = None
+    ):
+        """Schedule `producer()` to be written to `path`"""
+        path = Path(path)
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self._write(path, json.dumps(producer(), indent=indent, ensure_ascii=ensure_ascii))
+            if on_written:
+                on_written(path)
+            return
+
+        now = loop.time()
+        pending = self._pending.get(path)
+        if pending is None:
+            pending = PendingWrite(producer, indent, ensure_ascii, now, on_written)
+            self._pending[path] = pending
+        else:
+            pending.handle.cancel()
+            pending.producer = producer
+            pending.indent = indent
+            pending.ensure_ascii = ensure_ascii
+            pending.on_written = on_written
+
+        delay = min(self.debounce, max(0.0, pending.first_scheduled + self.max_delay - now))
+        pending.handle = loop.call_later(delay, self._fire, path)
+
+    def is_pending(self, path: Path) -> bool:
+        """Whether a write to `path` is scheduled or in flight but not yet on disk"""
+        path = Path(path)
+        return path in self._pending or path in self._unwritten
+
+    def read_json(self, path: Path, default: Any = None) -> Any:
+        """Read a file, seeing writes that are scheduled but not yet on disk"""
+        path = Path(path)
+        pending = self._pending.get(path)
+        if pending is not None:
+            return json.loads(json.dumps(pending.producer()))
+        if path in self._unwritten:
+            return json.loads(self._unwritten[path])
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return default
+
+    async def flush(self):
+        """Write everything scheduled now and wait for in-flight writes"""
+        for path in list(self._pending):
+            self._pending[path].handle.cancel()
+            self._fire(path)
+        if self._inflight:
+            await asyncio.gather(*self._inflight, return_exceptions=True)
+
+    def _fire(self, path: Path):
+        pending = self._pending.pop(path, None)
+        if pending is None:
+            return
+        try:
+            text = json.dumps(pending.producer(), indent=pending.indent, ensure_ascii=pending.ensure_ascii)
+        except Exception as e:
+            logger.error(f"Failed to serialize {path}: {e}")
+            return
+
+        sequence = self._sequence.get(path, 0) + 1
+        self._sequence[path] = sequence
+        self._unwritten[path] = text
+        future = asyncio.get_running_loop().run_in_executor(None, self._write, path, text, sequence)
+        self._inflight.add(future)
+
+        def done(f: asyncio.Future):
+            self._inflight.discard(f)
+            if self._sequence.get(path) == sequence:
+                self._unwritten.pop(path, None)
+            if f.cancelled():
+                return
+            if f.exception() is not None:
+                logger.error(f"Failed to write {path}: {f.exception()}")
+            elif pending.on_written:
+                pending.on_written(path)
+        future.add_done_callback(done)
+
+    def _write(self, path: Path, text: str, sequence: Optional[int] = None):
+        lock = self._locks.setdefault(path, threading.Lock())
+        with lock:
+            if sequence is not None:
+                if sequence <= self._written.get(path, 0):
+                    return
+                self._written[path] = sequence
+            atomic_write_text(path, text, self.snapshots)
+
+# Global instance
+_persistence_manager: Optional[PersistenceManager] = None
+
+def get_persistence_manager() -> PersistenceManager:
+    """Get the global persistence manager"""
+    global _persistence_manager
+    if _persistence_manager is None:
+        from core.config import get_config
+
+        config = get_config()
+        _persistence_manager = PersistenceManager(
+            debounce=config.persistence_debounce,
+            snapshots=config.persistence_snapshots
+        )
+    return _persistence_manager
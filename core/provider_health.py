@@ -0,0 +1,241 @@
+"""
+Provider Health for Ask Rumi Backend
+Async, cached health probes for model providers with a per-provider circuit
+breaker, so requests fail fast instead of waiting on a provider that is down.
+"""
+
+import asyncio
+import logging
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+import httpx
+from pydantic import BaseModel
+
+logger = logging.getLogger(__name__)
+
+HUGGINGFACE_HEALTH_URL = "https://huggingface.co/api/models?limit=1"
+
+class ProviderHealth(BaseModel):
+    """Result of the latest health probe for a provider"""
+    provider: str
+    healthy: bool
+    message: str
+    circuit: str = "closed"  # "closed", "open", "half_open"
+    latency_ms: Optional[float] = None
+    checked_at: str
+    consecutive_failures: int = 0
+    models: Optional[List[str]] = None
+
+@dataclass
+class CircuitBreaker:
+    """
+    Opens after `failure_threshold` consecutive failures
+
+    While open, callers are told the provider is down without trying it. After
+    `reset_timeout` seconds one trial is let through (half-open); its outcome
+    closes the circuit again or re-opens it.
+    """
+    failure_threshold: int = 3
+    reset_timeout: float = 30.0
+    failures: int = 0
+    opened_at: Optional[float] = None
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half_open"
+        return "open"
+
+    def allow(self) -> bool:
+        """Whether a call may be attempted"""
+        return self.state != "open"
+
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = None
+
+    def record_failure(self):
+        self.failures += 1
+        if self.failures >= self.failure_threshold or self.opened_at is not None:
+            # A failed half-open trial restarts the timeout
+            self.opened_at = time.monotonic()
+
+ProbeResult = Tuple[bool, str, Optional[List[str]]]
+
+class ProviderHealthMonitor:
+    """
+    Probes providers concurrently and caches the results for `ttl` seconds
+
+    Concurrent checks of the same provider share one probe. Real traffic feeds
+    the same circuit breakers through `record_success`/`record_failure`, so
+    inference stops trying a provider as soon as it is seen failing.
+    """
+
+    def __init__(
+        self,
+        ttl: float = 10.0,
+        probe_timeout: float = 5.0,
+        failure_threshold: int = 3,
+        reset_timeout: float = 30.0
+    ):
+        self.ttl = ttl
+        self.probe_timeout = probe_timeout
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.breakers: Dict[str, CircuitBreaker] = {}
+        self._results: Dict[str, Tuple[float, ProviderHealth]] = {}
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self._client: Optional[httpx.AsyncClient] = None
+        self.probes: Dict[str, Callable[[Any], Awaitable[ProbeResult]]] = {
+            "ollama": self._probe_ollama,
+            "huggingface": self._probe_huggingface,
+            "openai": self._probe_openai,
+        }
+
+    def breaker(self, provider: str) -> CircuitBreaker:
+        if provider not in self.breakers:
+            self.breakers[provider] = CircuitBreaker(self.failure_threshold, self.reset_timeout)
+        return self.breakers[provider]
+
+    def is_available(self, provider: str) -> bool:
+        """Whether the provider may be used, without probing it"""
+        return self.breaker(provider).allow()
+
+    def record_success(self, provider: str):
+        self.breaker(provider).record_success()
+
+    def record_failure(self, provider: str, error: str = ""):
+        breaker = self.breaker(provider)
+        was_open = breaker.opened_at is not None
+        breaker.record_failure()
+        if breaker.opened_at is not None and not was_open:
+            logger.warning(f"Circuit opened for provider {provider}: {error}")
+
+    def cached(self, provider: str) -> Optional[ProviderHealth]:
+        """The last probe result, however old"""
+        entry = self._results.get(provider)
+        return entry[1] if entry else None
+
+    def invalidate(self, provider: Optional[str] = None):
+        """Drop cached results (all providers by default), e.g. after a config change"""
+        if provider is None:
+            self._results.clear()
+        else:
+            self._results.pop(provider, None)
+
+    async def check(self, provider: str, config: Any = None, force: bool = False) -> ProviderHealth:
+        """Health of one provider, probing only if the cached result is stale"""
+        entry = self._results.get(provider)
+        if not force and entry is not None and time.monotonic() - entry[0] < self.ttl:
+            return entry[1]
+
+        breaker = self.breaker(provider)
+        if not force and not breaker.allow():
+            return self._result(provider, False, "Circuit open, provider recently failing", None, None)
+
+        task = self._inflight.get(provider)
+        if task is None:
+            task = asyncio.create_task(self._run_probe(provider, config))
+            self._inflight[provider] = task
+            task.add_done_callback(lambda _: self._inflight.pop(provider, None))
+        return await asyncio.shield(task)
+
+    async def check_all(self, configs: Dict[str, Any], force: bool = False) -> Dict[str, ProviderHealth]:
+        """Check several providers concurrently"""
+        results = await asyncio.gather(*(self.check(name, config, force) for name, config in configs.items()))
+        return dict(zip(configs.keys(), results))
+
+    async def _run_probe(self, provider: str, config: Any) -> ProviderHealth:
+        if config is not None and not getattr(config, "enabled", True):
+            return self._store(provider, self._result(provider, False, "Provider is disabled", None, None))
+
+        probe = self.probes.get(provider)
+        if probe is None:
+            return self._store(provider, self._result(provider, False, f"Unknown provider: {provider}", None, None))
+
+        start = time.perf_counter()
+        try:
+            healthy, message, models = await asyncio.wait_for(probe(config), self.probe_timeout)
+        except asyncio.TimeoutError:
+            healthy, message, models = False, f"Health probe timed out after {self.probe_timeout}s", None
+        except Exception as e:
+            healthy, message, models = False, f"{provider} health probe failed: {e}", None
+        latency_ms = (time.perf_counter() - start) * 1000
+
+        if healthy:
+            self.record_success(provider)
+        else:
+            self.record_failure(provider, message)
+        return self._store(provider, self._result(provider, healthy, message, latency_ms, models))
+
+    def _result(self, provider: str, healthy: bool, message: str, latency_ms: Optional[float], models: Optional[List[str]]) -> ProviderHealth:
+        breaker = self.breaker(provider)
+        return ProviderHealth(
+            provider=provider,
+            healthy=healthy,
+            message=message,
+            circuit=breaker.state,
+            latency_ms=round(latency_ms, 1) if latency_ms is not None else None,
+            checked_at=datetime.now().isoformat(),
+            consecutive_failures=breaker.failures,
+            models=models
+        )
+
+    def _store(self, provider: str, result: ProviderHealth) -> ProviderHealth:
+        self._results[provider] = (time.monotonic(), result)
+        return result
+
+    def _get_client(self) -> httpx.AsyncClient:
+        """Shared client for probing remote providers"""
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(timeout=httpx.Timeout(self.probe_timeout))
+        return self._client
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def _probe_ollama(self, config: Any) -> ProbeResult:
+        """Ollama is up if it lists its installed models"""
+        from core.local_runner import get_local_runner
+
+        response = await get_local_runner()._get_http_client().get("/api/tags", timeout=self.probe_timeout)
+        if response.status_code != 200:
+            return False, f"Ollama returned HTTP {response.status_code}", None
+        models = [m.get("name", "") for m in response.json().get("models", [])]
+        return True, "Ollama is working correctly", models
+
+    async def _probe_huggingface(self, config: Any) -> ProbeResult:
+        response = await self._get_client().get(HUGGINGFACE_HEALTH_URL)
+        if response.status_code != 200:
+            return False, "HuggingFace API not accessible", None
+        return True, "HuggingFace API is accessible", None
+
+    async def _probe_openai(self, config: Any) -> ProbeResult:
+        # Only checks configuration; a real call would spend API quota
+        if getattr(config, "api_key", None):
+            return True, "OpenAI API key configured", None
+        return False, "OpenAI API key not configured", None
+
+# Global instance
+_provider_health: Optional[ProviderHealthMonitor] = None
+
+def get_provider_health() -> ProviderHealthMonitor:
+    """Get the global provider health monitor"""
+    global _provider_health
+    if _provider_health is None:
+        from core.config import get_config
+
+        config = get_config()
+        _provider_health = ProviderHealthMonitor(
+            ttl=config.provider_health_ttl,
+            failure_threshold=config.provider_failure_threshold,
+            reset_timeout=config.provider_reset_timeout
+        )
+    return _provider_health
@@ -11,6 +11,9 @@ from datetime import datetime, timedelta
 from enum import Enum
 import uuid
 
+from core.deadline import use_deadline
+from core.metrics import QUEUE_WAIT
+
 logger = logging.getLogger(__name__)
 
 class TaskStatus(str, Enum):
@@ -252,6 +255,7 @@ class QueueManager:
         """Execute a single task"""
         task.status = TaskStatus.RUNNING
         task.started_at = datetime.now()
+        QUEUE_WAIT.observe((task.started_at - task.created_at).total_seconds(), function=task.function)
         
         logger.info(f"Worker {worker_name} executing task {task.id}: {task.name}")
         
@@ -261,14 +265,17 @@ class QueueManager:
             if not func:
                 raise ValueError(f"Function {task.function} not registered")
             
-            # Execute with timeout if specified
-            if task.timeout:
-                result = await asyncio.wait_for(
-                    func(**task.args, **task.kwargs),
-                    timeout=task.timeout
-                )
-            else:
-                result = await func(**task.args, **task.kwargs)
+            # Execute with timeout if specified. Tasks are background work: they never run
+            # under the deadline of the request whose enqueue happened to start the workers
+            timeout = task.timeout
+            with use_deadline(None):
+                if timeout is not None:
+                    result = await asyncio.wait_for(
+                        func(**task.args, **task.kwargs),
+                        timeout=timeout
+                    )
+                else:
+                    result = await func(**task.args, **task.kwargs)
             
             # Task completed successfully
             task.status = TaskStatus.COMPLETED
@@ -277,9 +284,10 @@ class QueueManager:
             
             logger.info(f"Task {task.id} completed successfully")
             
-        except asyncio.TimeoutError:
+        except asyncio.TimeoutError as e:
             task.status = TaskStatus.FAILED
-            task.error = f"Task timed out after {task.timeout} seconds"
+            # Also raised from inside the task (an inner wait_for) when there is no timeout
+            task.error = f"Task timed out after {timeout:.1f} seconds" if timeout is not None else str(e) or "Task timed out"
             task.completed_at = datetime.now()
             logger.error(f"Task {task.id} timed out")
             
@@ -0,0 +1,121 @@
+"""
+Startup warm-up for Ask Rumi Backend
+Builds service singletons and indexes in parallel, opens the Ollama HTTP pool
+and preloads default models, tracking progress for the readiness probe.
+"""
+
+import asyncio
+import logging
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+from core.config import get_config
+from core.gpu_manager import get_gpu_manager
+from core.local_runner import get_local_runner
+from core.model_manager import get_model_registry, get_residency_manager
+from services.behavior_config import get_behavior_config
+from services.knowledge_loader import get_knowledge_base
+from services.query_analyzer import get_query_analyzer
+from services.quote_retriever import get_quote_retriever
+from services.rumi_responder import get_rumi_responder
+
+logger = logging.getLogger(__name__)
+
+def _build_responder():
+    """Build the responder and compile its prompt templates"""
+    responder = get_rumi_responder()
+    responder._compiled()
+    return responder
+
+# Singletons built in dependency order; each stage is built in parallel
+WARMUP_STAGES: List[Dict[str, Callable[[], Any]]] = [
+    {
+        "behavior_config": get_behavior_config,
+        "knowledge_base": get_knowledge_base,
+        "query_analyzer": get_query_analyzer,
+        "model_registry": get_model_registry,
+        "gpu_manager": get_gpu_manager,
+    },
+    {
+        "quote_retriever": get_quote_retriever,
+        "rumi_responder": _build_responder,
+    },
+]
+
+class StartupState:
+    """Tracks warm-up progress for readiness reporting"""
+
+    def __init__(self):
+        self.status = "starting"
+        self.started_at: Optional[str] = None
+        self.ready_at: Optional[str] = None
+        self.components: Dict[str, Dict[str, Any]] = {}
+        self.models: Dict[str, Dict[str, Any]] = {}
+
+    @property
+    def is_ready(self) -> bool:
+        return self.status == "ready"
+
+    async def warm_up(self):
+        """Build singletons, open the HTTP pool and preload default models"""
+        self.status = "starting"
+        self.started_at = datetime.now().isoformat()
+        start = time.perf_counter()
+
+        for stage in WARMUP_STAGES:
+            await asyncio.gather(*(self._build(name, factory) for name, factory in stage.items()))
+
+        failed = [name for name, info in self.components.items() if info["status"] != "ready"]
+        if failed:
+            self.status = "failed"
+            logger.error(f"Warm-up failed for: {', '.join(failed)}")
+            return
+
+        get_local_runner()._get_http_client()
+        self.components["http_pool"] = {"status": "ready", "seconds": 0.0}
+
+        await asyncio.gather(*(self._preload(model) for model in get_config().default_models))
+
+        self.status = "ready"
+        self.ready_at = datetime.now().isoformat()
+        logger.info(f"Warm-up complete in {time.perf_counter() - start:.2f}s")
+
+    async def _build(self, name: str, factory: Callable[[], Any]):
+        """Build one singleton off the event loop"""
+        start = time.perf_counter()
+        try:
+            await asyncio.to_thread(factory)
+            self.components[name] = {"status": "ready", "seconds": round(time.perf_counter() - start, 3)}
+        except Exception as e:
+            logger.error(f"Failed to initialize {name}: {e}")
+            self.components[name] = {"status": "failed", "error": str(e)}
+
+    async def _preload(self, model: str):
+        """Load a model into Ollama so the first request does not pay the load time"""
+        start = time.perf_counter()
+        self.models[model] = {"status": "loading"}
+        residency = get_residency_manager()
+        loaded = await residency.load(model)
+        self.models[model] = {
+            "status": "loaded" if loaded else "failed",
+            "seconds": round(time.perf_counter() - start, 3),
+            "keep_alive": residency.keep_alive_for(model)
+        }
+
+    def report(self) -> Dict[str, Any]:
+        """Readiness details for the /ready endpoint"""
+        return {
+            "status": self.status,
+            "started_at": self.started_at,
+            "ready_at": self.ready_at,
+            "components": self.components,
+            "models": self.models
+        }
+
+# Global instance
+startup_state = StartupState()
+
+def get_startup_state() -> StartupState:
+    """Get the global startup state"""
+    return startup_state
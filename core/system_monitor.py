@@ -0,0 +1,143 @@
+"""
+System Monitor for Ask Rumi Backend
+Samples CPU, memory, load, disk and inference stats in the background so
+health and stats endpoints can answer from the latest snapshot.
+"""
+
+import asyncio
+import logging
+from collections import deque
+from datetime import datetime
+from typing import Any, Deque, Dict, List, Optional
+
+import psutil
+from pydantic import BaseModel
+
+from core.config import get_config
+from core.gpu_manager import get_gpu_manager
+from core.local_runner import get_local_runner
+
+logger = logging.getLogger(__name__)
+
+class SystemSnapshot(BaseModel):
+    """Point-in-time system metrics"""
+    timestamp: str
+    cpu_count: int
+    cpu_percent: float
+    memory_total_gb: float
+    memory_available_gb: float
+    memory_used_percent: float
+    load_average: List[float]
+    disk_total_gb: float
+    disk_available_gb: float
+    disk_used_percent: float
+    device_memory: Dict[str, Dict[str, Any]] = {}
+    inference: Dict[str, Any] = {}
+    models: Dict[str, Dict[str, Any]] = {}
+
+class SystemMonitor:
+    """Collects system snapshots into a ring buffer at a fixed interval"""
+
+    def __init__(self, interval: float = 5.0, history_size: int = 120):
+        self.interval = interval
+        self.history: Deque[SystemSnapshot] = deque(maxlen=history_size)
+        self._task: Optional[asyncio.Task] = None
+        # Prime cpu_percent so the first non-blocking reading is meaningful
+        psutil.cpu_percent(interval=None)
+
+    @property
+    def is_running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    async def start(self):
+        """Start the background sampler"""
+        if self.is_running:
+            return
+        await self.refresh()
+        self._task = asyncio.create_task(self._run())
+        logger.info(f"System monitor started (interval {self.interval}s)")
+
+    async def stop(self):
+        """Stop the background sampler"""
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        logger.info("System monitor stopped")
+
+    async def refresh(self) -> SystemSnapshot:
+        """Take a snapshot off the event loop and store it"""
+        snapshot = await asyncio.to_thread(self.sample)
+        self.history.append(snapshot)
+        return snapshot
+
+    def sample(self) -> SystemSnapshot:
+        """Collect one snapshot without blocking on CPU measurement"""
+        memory = psutil.virtual_memory()
+        disk = psutil.disk_usage('/')
+        load_average = list(psutil.getloadavg()) if hasattr(psutil, 'getloadavg') else [0.0, 0.0, 0.0]
+
+        # Also refreshes the GPU manager's memory cache for request handlers
+        device_memory = get_gpu_manager().refresh_memory()
+
+        local_runner = get_local_runner()
+        models = {
+            model: local_runner.get_inference_stats(model)
+            for model in local_runner.get_history_models()
+        }
+
+        return SystemSnapshot(
+            timestamp=datetime.now().isoformat(),
+            cpu_count=psutil.cpu_count(),
+            cpu_percent=psutil.cpu_percent(interval=None),
+            memory_total_gb=memory.total / (1024**3),
+            memory_available_gb=memory.available / (1024**3),
+            memory_used_percent=memory.percent,
+            load_average=load_average,
+            disk_total_gb=disk.total / (1024**3),
+            disk_available_gb=disk.free / (1024**3),
+            disk_used_percent=(disk.used / disk.total) * 100,
+            device_memory=device_memory,
+            inference=local_runner.get_inference_stats(),
+            models=models
+        )
+
+    def latest(self) -> SystemSnapshot:
+        """Get the most recent snapshot, sampling once if none exists yet"""
+        if not self.history:
+            self.history.append(self.sample())
+        return self.history[-1]
+
+    def get_history(self, limit: Optional[int] = None) -> List[SystemSnapshot]:
+        """Get recent snapshots, oldest first"""
+        snapshots = list(self.history)
+        if limit:
+            return snapshots[-limit:]
+        return snapshots
+
+    async def _run(self):
+        """Sampling loop"""
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.refresh()
+            except Exception as e:
+                logger.error(f"System monitor sample failed: {e}")
+
+# Global instance
+_system_monitor: Optional[SystemMonitor] = None
+
+def get_system_monitor() -> SystemMonitor:
+    """Get the global system monitor instance"""
+    global _system_monitor
+    if _system_monitor is None:
+        config = get_config()
+        _system_monitor = SystemMonitor(
+            interval=config.metrics_sample_interval,
+            history_size=config.metrics_history_size
+        )
+    return _system_monitor
@@ -0,0 +1,260 @@
+"""
+Tracing for Ask Rumi Backend
+Lightweight nested spans for the request pipeline, exported as OTLP-compatible
+JSON to a local file or an OTLP/HTTP collector, and summarized in a
+Server-Timing response header.
+"""
+
+import asyncio
+import functools
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+STATUS_UNSET = 0
+STATUS_OK = 1
+STATUS_ERROR = 2
+
+_current_span: ContextVar[Optional["Span"]] = ContextVar("current_span", default=None)
+
+def _otlp_value(value: Any) -> Dict[str, Any]:
+    """Encode an attribute value as an OTLP AnyValue"""
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+def _otlp_attributes(attributes: Dict[str, Any]) -> List[Dict[str, Any]]:
+    return [{"key": key, "value": _otlp_value(value)} for key, value in attributes.items()]
+
+class Trace:
+    """Spans sharing one trace ID"""
+
+    def __init__(self):
+        self.trace_id = os.urandom(16).hex()
+        self.spans: List["Span"] = []
+        self.exported = False
+
+class Span:
+    """A timed operation within a trace"""
+
+    def __init__(self, name: str, trace: Trace, parent: Optional["Span"], attributes: Dict[str, Any]):
+        self.name = name
+        self.trace = trace
+        self.parent = parent
+        self.span_id = os.urandom(8).hex()
+        self.attributes = dict(attributes)
+        self.status = STATUS_UNSET
+        self.status_message = ""
+        self.start_time_ns = time.time_ns()
+        self._start = time.perf_counter()
+        self.end_time_ns: Optional[int] = None
+        self.duration: Optional[float] = None  # seconds
+
+    @property
+    def elapsed(self) -> float:
+        """Seconds since the span started, or its duration once ended"""
+        if self.duration is not None:
+            return self.duration
+        return time.perf_counter() - self._start
+
+    def set_attribute(self, key: str, value: Any):
+        self.attributes[key] = value
+
+    def record_error(self, error: BaseException):
+        self.status = STATUS_ERROR
+        self.status_message = f"{type(error).__name__}: {error}"
+
+    def end(self):
+        if self.duration is None:
+            self.duration = time.perf_counter() - self._start
+            self.end_time_ns = self.start_time_ns + int(self.duration * 1e9)
+            if self.status == STATUS_UNSET:
+                self.status = STATUS_OK
+
+    def to_otlp(self) -> Dict[str, Any]:
+        """Encode the span as an OTLP JSON span"""
+        span = {
+            "traceId": self.trace.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": 2 if self.parent is None else 1,  # SERVER for roots, INTERNAL otherwise
+            "startTimeUnixNano": str(self.start_time_ns),
+            "endTimeUnixNano": str(self.end_time_ns or time.time_ns()),
+            "attributes": _otlp_attributes(self.attributes),
+            "status": {"code": self.status}
+        }
+        if self.parent is not None:
+            span["parentSpanId"] = self.parent.span_id
+        if self.status_message:
+            span["status"]["message"] = self.status_message
+        return span
+
+class SpanExporter:
+    """Base class for span exporters"""
+
+    def export(self, payload: Dict[str, Any]):
+        raise NotImplementedError
+
+class FileSpanExporter(SpanExporter):
+    """Append OTLP JSON payloads, one per line, to a local file"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def export(self, payload: Dict[str, Any]):
+        line = json.dumps(payload) + "\n"
+        try:
+            asyncio.get_running_loop().run_in_executor(None, self._write, line)
+        except RuntimeError:
+            self._write(line)
+
+    def _write(self, line: str):
+        try:
+            with self._lock:
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.write(line)
+        except Exception as e:
+            logger.error(f"Failed to write traces to {self.path}: {e}")
+
+class OTLPHttpSpanExporter(SpanExporter):
+    """Send OTLP JSON payloads to an OTLP/HTTP collector"""
+
+    def __init__(self, endpoint: str, timeout: float = 5.0):
+        self.endpoint = endpoint.rstrip("/")
+        if not self.endpoint.endswith("/v1/traces"):
+            self.endpoint += "/v1/traces"
+        self.timeout = timeout
+        self._client: Optional[httpx.AsyncClient] = None
+
+    def export(self, payload: Dict[str, Any]):
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        loop.create_task(self._send(payload))
+
+    async def _send(self, payload: Dict[str, Any]):
+        try:
+            if self._client is None or self._client.is_closed:
+                self._client = httpx.AsyncClient(timeout=self.timeout)
+            await self._client.post(self.endpoint, json=payload)
+        except Exception as e:
+            logger.warning(f"Failed to export traces to {self.endpoint}: {e}")
+
+class Tracer:
+    """Creates nested spans and hands finished traces to exporters"""
+
+    def __init__(self, service_name: str = "ask-rumi-backend", exporters: Optional[List[SpanExporter]] = None):
+        self.service_name = service_name
+        self.exporters = exporters or []
+
+    @contextmanager
+    def span(self, name: str, **attributes: Any) -> Iterator[Span]:
+        """Open a span as a child of the current span (or a new trace)"""
+        parent = _current_span.get()
+        trace = parent.trace if parent is not None else Trace()
+        span = Span(name, trace, parent, attributes)
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.record_error(e)
+            raise
+        finally:
+            span.end()
+            _current_span.reset(token)
+            self._finish(span)
+
+    def current_span(self) -> Optional[Span]:
+        return _current_span.get()
+
+    def server_timing(self, root: Span) -> str:
+        """Summarize stage durations of a trace as a Server-Timing header value"""
+        totals: Dict[str, float] = {}
+        for span in root.trace.spans:
+            if span is root or span.duration is None:
+                continue
+            totals[span.name] = totals.get(span.name, 0.0) + span.duration
+        entries = [f"{name};dur={duration * 1000:.2f}" for name, duration in totals.items()]
+        entries.append(f"total;dur={root.elapsed * 1000:.2f}")
+        return ", ".join(entries)
+
+    def _finish(self, span: Span):
+        trace = span.trace
+        if trace.exported:
+            # Finished after its trace was exported (e.g. while streaming a body)
+            self._export([span])
+            return
+        trace.spans.append(span)
+        if span.parent is None:
+            trace.exported = True
+            self._export(trace.spans)
+
+    def _export(self, spans: List[Span]):
+        if not self.exporters:
+            return
+        payload = {
+            "resourceSpans": [{
+                "resource": {"attributes": _otlp_attributes({"service.name": self.service_name})},
+                "scopeSpans": [{
+                    "scope": {"name": "ask-rumi.tracing"},
+                    "spans": [span.to_otlp() for span in spans]
+                }]
+            }]
+        }
+        for exporter in self.exporters:
+            try:
+                exporter.export(payload)
+            except Exception as e:
+                logger.error(f"Trace export failed: {e}")
+
+def traced(name: Optional[str] = None) -> Callable:
+    """Decorator wrapping a sync or async function in a span"""
+    def decorator(func: Callable) -> Callable:
+        span_name = name or func.__qualname__
+
+        if asyncio.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with get_tracer().span(span_name):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with get_tracer().span(span_name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+# Global instance
+_tracer: Optional[Tracer] = None
+
+def get_tracer() -> Tracer:
+    """Get the global tracer, configured from AppConfig on first use"""
+    global _tracer
+    if _tracer is None:
+        from core.config import get_config
+
+        config = get_config()
+        exporters: List[SpanExporter] = []
+        if config.tracing_export_path:
+            exporters.append(FileSpanExporter(config.tracing_export_path))
+        if config.tracing_collector_url:
+            exporters.append(OTLPHttpSpanExporter(config.tracing_collector_url))
+        _tracer = Tracer(exporters=exporters)
+    return _tracer
@@ -5,14 +5,46 @@ Local, offline-first AI mentor app inspired by Rumi's wisdom.
 
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse
 from fastapi.staticfiles import StaticFiles
+from starlette.datastructures import Headers, MutableHeaders
 import uvicorn
+import argparse
+import asyncio
 import os
+from contextlib import asynccontextmanager
+from datetime import datetime
 from pathlib import Path
 
 # Import routers
 from routes import chat, models, providers, system
+from core.system_monitor import get_system_monitor
+from core.metrics import get_metrics_registry
+from core.tracing import get_tracer
+from core.local_runner import get_local_runner
+from core.startup import get_startup_state
+from core.config import get_config, recommended_workers
+from core.deadline import deadline_scope
+from core.persistence import get_persistence_manager
+from core.provider_health import get_provider_health
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Start background services and warm up, then clean up on shutdown"""
+    monitor = get_system_monitor()
+    await monitor.start()
+    # Warm up in the background so liveness is served while /ready reports progress
+    warm_up = asyncio.create_task(get_startup_state().warm_up())
+    try:
+        yield
+    finally:
+        if not warm_up.done():
+            warm_up.cancel()
+        await monitor.stop()
+        # Write out any debounced registry/config saves before exiting
+        await get_persistence_manager().flush()
+        await get_provider_health().close()
+        await get_local_runner().close()
 
 # Create FastAPI app
 app = FastAPI(
@@ -20,7 +52,8 @@ app = FastAPI(
     description="Local, offline-first AI mentor app inspired by Rumi's wisdom",
     version="1.0.0",
     docs_url="/docs",
-    redoc_url="/redoc"
+    redoc_url="/redoc",
+    lifespan=lifespan
 )
 
 # Add CORS middleware for React Native frontend
@@ -32,6 +65,59 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+class TracingMiddleware:
+    """Trace each request and summarize stage durations in Server-Timing
+    
+    A plain ASGI middleware rather than @app.middleware("http"), which wraps
+    `receive` in a way that hides client disconnects from the endpoints.
+    """
+    
+    def __init__(self, app):
+        self.app = app
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        
+        tracer = get_tracer()
+        method, path = scope["method"], scope["path"]
+        with tracer.span(f"{method} {path}", **{"http.method": method, "http.target": path}) as span:
+            async def send_with_timing(message):
+                if message["type"] == "http.response.start":
+                    span.set_attribute("http.status_code", message["status"])
+                    MutableHeaders(scope=message).append("Server-Timing", tracer.server_timing(span))
+                await send(message)
+            
+            await self.app(scope, receive, send_with_timing)
+
+# Clients may ask for a shorter deadline than the configured model_timeout
+DEADLINE_HEADER = "X-Request-Timeout"
+
+class RequestDeadlineMiddleware:
+    """Give each request a deadline that queueing, retrieval and inference honour"""
+    
+    def __init__(self, app):
+        self.app = app
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        
+        budget = float(get_config().model_timeout)
+        requested = Headers(scope=scope).get(DEADLINE_HEADER)
+        if requested:
+            try:
+                budget = min(budget, float(requested))
+            except ValueError:
+                pass
+        with deadline_scope(budget):
+            await self.app(scope, receive, send)
+
+app.add_middleware(RequestDeadlineMiddleware)
+app.add_middleware(TracingMiddleware)
+
 # Include routers
 app.include_router(chat.router, prefix="/api/chat", tags=["chat"])
 app.include_router(models.router, prefix="/api/models", tags=["models"])
@@ -53,28 +139,75 @@ async def root():
             "chat": "/api/chat",
             "models": "/api/models", 
             "providers": "/api/providers",
-            "system": "/api/system"
+            "system": "/api/system",
+            "metrics": "/metrics",
+            "ready": "/ready"
         }
     })
 
+@app.get("/metrics")
+async def metrics():
+    """Prometheus metrics for the inference pipeline"""
+    return PlainTextResponse(
+        get_metrics_registry().render(),
+        media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
+
 @app.get("/health")
 async def health_check():
-    """Health check endpoint"""
+    """Liveness check - the process is up and serving requests"""
     return JSONResponse({
         "status": "healthy",
-        "timestamp": "2024-01-01T00:00:00Z"  # Will be updated with actual timestamp
+        "timestamp": datetime.now().isoformat()
     })
 
+@app.get("/ready")
+async def readiness_check():
+    """Readiness check - services are built and default models are loaded"""
+    state = get_startup_state()
+    return JSONResponse(state.report(), status_code=200 if state.is_ready else 503)
+
+def parse_args():
+    """Command line options for running the server"""
+    parser = argparse.ArgumentParser(description="Run the Ask Rumi Backend")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument(
+        "--production",
+        action="store_true",
+        help="Run multiple worker processes without auto-reload"
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=None,
+        help="Worker processes in production mode (default: AppConfig.workers, or one per CPU core)"
+    )
+    return parser.parse_args()
+
 if __name__ == "__main__":
+    args = parse_args()
+    
     # Ensure data directory exists
     data_dir = Path("data")
     data_dir.mkdir(exist_ok=True)
     
-    # Run the application
-    uvicorn.run(
-        "main:app",
-        host="127.0.0.1",
-        port=8000,
-        reload=True,
-        log_level="info"
-    )
+    if args.production:
+        # Workers share conversations through SQLite (AppConfig.state_db_path)
+        workers = args.workers or get_config().workers or recommended_workers()
+        uvicorn.run(
+            "main:app",
+            host=args.host,
+            port=args.port,
+            workers=workers,
+            log_level="info"
+        )
+    else:
+        # Run the application
+        uvicorn.run(
+            "main:app",
+            host=args.host,
+            port=args.port,
+            reload=True,
+            log_level="info"
+        )
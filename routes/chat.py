@@ -3,25 +3,35 @@ Chat API routes for Ask Rumi Backend
 Handles chat endpoints and conversation management.
 """
 
-from fastapi import APIRouter, HTTPException, BackgroundTasks
+from fastapi import APIRouter, HTTPException, BackgroundTasks, Request
 from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Iterable, Mapping, Tuple
+from dataclasses import dataclass
 import asyncio
 import json
 import logging
+import time
 from datetime import datetime
 
-from core.local_runner import get_local_runner, InferenceRequest
+from core.local_runner import get_local_runner, InferenceRequest, InferenceResponse
+from core.backends import GenerationBudget
 from core.queue_manager import get_queue_manager, TaskPriority
 from core.model_manager import get_model_registry
+from core.conversation_store import get_conversation_store
+from core.config_store import get_emotion_keywords_store
+from core.deadline import ClientDisconnected, DeadlineExceeded, abandon, check_deadline, guard, guard_stream
+from core import metrics
 
 # Import Rumi services
-from services.query_analyzer import get_query_analyzer
+from services.query_analyzer import QueryIntent, get_query_analyzer
 from services.quote_retriever import get_quote_retriever
 from services.rumi_responder import get_rumi_responder
 from services.conversation_layer import ConversationLayer
-from services.behavior_config import get_behavior_config
+from services.model_router import RoutingDecision, get_model_router
+from services.instant_replies import get_instant_responder
+from services.answer_store import get_answer_store
+from services.behavior_config import BehaviorSnapshot, get_behavior_config
 
 logger = logging.getLogger(__name__)
 
@@ -60,8 +70,18 @@ class Conversation(BaseModel):
     updated_at: str
     model: str
 
-# In-memory conversation storage (replace with database in production)
-conversations: Dict[str, Conversation] = {}
+# Conversations live in SQLite so every worker process sees the same state
+def _load_conversation(conversation_id: str) -> Optional[Conversation]:
+    """Load a conversation from the shared store"""
+    data = get_conversation_store().get(conversation_id)
+    return Conversation(**data) if data else None
+
+def _append_messages(conversation_id: Optional[str], model: str, messages: List[ChatMessage]) -> Conversation:
+    """Append messages to a conversation in one transaction, starting it with a store-wide unique ID if needed"""
+    store = get_conversation_store()
+    if not conversation_id:
+        conversation_id = f"conv_{store.next_id()}"
+    return Conversation(**store.append(conversation_id, model, [msg.dict() for msg in messages]))
 
 @router.post("/send", response_model=ChatResponse)
 async def send_message(request: ChatRequest):
@@ -76,26 +96,14 @@ async def send_message(request: ChatRequest):
         if model_info.status != "available":
             raise HTTPException(status_code=400, detail=f"Model {request.model} is not available")
         
-        # Get or create conversation
-        conversation_id = request.conversation_id or f"conv_{len(conversations) + 1}"
-        if conversation_id not in conversations:
-            conversations[conversation_id] = Conversation(
-                id=conversation_id,
-                messages=[],
-                created_at=datetime.now().isoformat(),
-                updated_at=datetime.now().isoformat(),
-                model=request.model
-            )
-        
-        conversation = conversations[conversation_id]
-        
-        # Add user message
+        # Add user message, starting the conversation if needed
         user_message = ChatMessage(
             role="user",
             content=request.message,
             timestamp=datetime.now().isoformat()
         )
-        conversation.messages.append(user_message)
+        conversation = await asyncio.to_thread(_append_messages, request.conversation_id, request.model, [user_message])
+        conversation_id = conversation.id
         
         # Prepare context from conversation history
         context_messages = conversation.messages[-10:]  # Last 10 messages
@@ -123,8 +131,7 @@ async def send_message(request: ChatRequest):
             content=response.response,
             timestamp=response.timestamp
         )
-        conversation.messages.append(assistant_message)
-        conversation.updated_at = datetime.now().isoformat()
+        await asyncio.to_thread(_append_messages, conversation_id, request.model, [assistant_message])
         
         return ChatResponse(
             response=response.response,
@@ -137,6 +144,8 @@ async def send_message(request: ChatRequest):
         
     except HTTPException:
         raise
+    except DeadlineExceeded as e:
+        raise HTTPException(status_code=504, detail=str(e))
     except Exception as e:
         logger.error(f"Chat error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -154,26 +163,14 @@ async def stream_message(request: ChatRequest):
         if model_info.status != "available":
             raise HTTPException(status_code=400, detail=f"Model {request.model} is not available")
         
-        # Get or create conversation
-        conversation_id = request.conversation_id or f"conv_{len(conversations) + 1}"
-        if conversation_id not in conversations:
-            conversations[conversation_id] = Conversation(
-                id=conversation_id,
-                messages=[],
-                created_at=datetime.now().isoformat(),
-                updated_at=datetime.now().isoformat(),
-                model=request.model
-            )
-        
-        conversation = conversations[conversation_id]
-        
-        # Add user message
+        # Add user message, starting the conversation if needed
         user_message = ChatMessage(
             role="user",
             content=request.message,
             timestamp=datetime.now().isoformat()
         )
-        conversation.messages.append(user_message)
+        conversation = await asyncio.to_thread(_append_messages, request.conversation_id, request.model, [user_message])
+        conversation_id = conversation.id
         
         # Prepare context
         context_messages = conversation.messages[-10:]
@@ -186,34 +183,45 @@ async def stream_message(request: ChatRequest):
             temperature=request.temperature,
             max_tokens=request.max_tokens,
             stream=True,
-            context=context
+            context=context,
+            max_words=get_rumi_responder().max_response_words
         )
         
         async def generate_stream():
             """Generate streaming response"""
             local_runner = get_local_runner()
-            full_response = ""
+            processor = get_rumi_responder().create_post_processor()
             
             try:
                 async for chunk in local_runner.run_streaming_inference(inference_request):
-                    yield f"data: {chunk}\n\n"
-                    
                     # Parse chunk to get content
                     try:
                         chunk_data = json.loads(chunk)
-                        if chunk_data.get("success") and "content" in chunk_data:
-                            full_response += chunk_data["content"]
                     except json.JSONDecodeError:
-                        pass
+                        continue
+                    
+                    if not (chunk_data.get("success") and "content" in chunk_data):
+                        yield f"data: {chunk}\n\n"
+                        continue
+                    
+                    # Clean the stream on the fly
+                    cleaned = processor.feed(chunk_data["content"])
+                    if cleaned:
+                        yield f"data: {json.dumps({'content': cleaned, 'success': True})}\n\n"
+                    if processor.done:
+                        break
+                
+                cleaned = processor.finish()
+                if cleaned:
+                    yield f"data: {json.dumps({'content': cleaned, 'success': True})}\n\n"
                 
                 # Add final message to conversation
                 assistant_message = ChatMessage(
                     role="assistant",
-                    content=full_response.strip(),
+                    content=processor.text,
                     timestamp=datetime.now().isoformat()
                 )
-                conversation.messages.append(assistant_message)
-                conversation.updated_at = datetime.now().isoformat()
+                await asyncio.to_thread(_append_messages, conversation_id, request.model, [assistant_message])
                 
                 # Send completion signal
                 yield f"data: {json.dumps({'done': True, 'conversation_id': conversation_id})}\n\n"
@@ -240,239 +248,671 @@ async def get_conversations():
     return {
         "conversations": [
             {
-                "id": conv.id,
-                "message_count": len(conv.messages),
-                "created_at": conv.created_at,
-                "updated_at": conv.updated_at,
-                "model": conv.model
+                "id": conv["id"],
+                "message_count": conv["message_count"],
+                "created_at": conv["created_at"],
+                "updated_at": conv["updated_at"],
+                "model": conv["model"]
             }
-            for conv in conversations.values()
+            for conv in await asyncio.to_thread(get_conversation_store().list)
         ]
     }
 
 @router.get("/conversations/{conversation_id}")
 async def get_conversation(conversation_id: str):
     """Get a specific conversation"""
-    if conversation_id not in conversations:
+    conversation = await asyncio.to_thread(_load_conversation, conversation_id)
+    if conversation is None:
         raise HTTPException(status_code=404, detail="Conversation not found")
     
-    return conversations[conversation_id]
+    return conversation
 
 @router.delete("/conversations/{conversation_id}")
 async def delete_conversation(conversation_id: str):
     """Delete a conversation"""
-    if conversation_id not in conversations:
+    if not await asyncio.to_thread(get_conversation_store().delete, conversation_id):
         raise HTTPException(status_code=404, detail="Conversation not found")
     
-    del conversations[conversation_id]
     return {"message": "Conversation deleted"}
 
 @router.post("/conversations/{conversation_id}/clear")
 async def clear_conversation(conversation_id: str):
     """Clear messages from a conversation"""
-    if conversation_id not in conversations:
+    if not await asyncio.to_thread(get_conversation_store().clear, conversation_id):
         raise HTTPException(status_code=404, detail="Conversation not found")
     
-    conversations[conversation_id].messages.clear()
-    conversations[conversation_id].updated_at = datetime.now().isoformat()
-    
     return {"message": "Conversation cleared"}
 
-@router.post("/ask-rumi")
-async def ask_rumi(request: ChatRequest):
-    """Special endpoint for asking Rumi-style questions with intelligent retrieval"""
-    try:
-        # Initialize services
-        analyzer = get_query_analyzer()
-        retriever = get_quote_retriever()
-        responder = get_rumi_responder()
-        layer = ConversationLayer()
-        
-        # Get conversation ID first
-        conversation_id = request.conversation_id or f"conv_{len(conversations) + 1}"
-        
-        # Store message BEFORE processing (so context is available)
-        if conversation_id not in conversations:
-            conversations[conversation_id] = Conversation(
-                id=conversation_id,
-                messages=[],
-                created_at=datetime.now().isoformat(),
-                updated_at=datetime.now().isoformat(),
-                model=request.model
+@dataclass
+class RumiTurn:
+    """Everything needed to generate one ask-rumi reply"""
+    conversation_id: str
+    conversation: Conversation
+    needs_empathy: bool
+    use_rumi_wisdom: bool
+    quotes: List[Dict[str, Any]]
+    prompt: str
+    history_length: int
+    max_tokens: int
+    temperature: float
+    model: str
+    route: Optional[RoutingDecision] = None
+    behavior: Optional[BehaviorSnapshot] = None
+    analysis_time: float = 0.0
+    retrieval_time: float = 0.0
+    
+    @property
+    def response_type(self) -> str:
+        return RESPONSE_TYPES[self.mode]
+    
+    @property
+    def mode(self) -> str:
+        return _reply_mode(self.needs_empathy, self.use_rumi_wisdom)
+
+RESPONSE_TYPES = {
+    "empathetic": "❤️ Empathetic Support",
+    "wisdom": "🔮 Rumi Wisdom",
+    "casual": "💬 Casual Chat",
+    "instant": "⚡ Instant Reply"
+}
+
+def _reply_mode(needs_empathy: bool, use_rumi_wisdom: bool) -> str:
+    if needs_empathy:
+        return "empathetic"
+    if use_rumi_wisdom:
+        return "wisdom"
+    return "casual"
+
+def _store_user_message(request: ChatRequest) -> Conversation:
+    """Store the user message for context, starting the conversation if needed"""
+    return _append_messages(request.conversation_id, request.model, [ChatMessage(
+        role="user",
+        content=request.message,
+        timestamp=datetime.now().isoformat()
+    )])
+
+@dataclass
+class CannedReply:
+    """A reply served without calling a model: an instant reply or a pre-generated answer"""
+    text: str
+    model: str
+    mode: str
+    sources: List[str]
+    specs: Dict[str, Any]
+    lookup_time: float = 0.0
+    
+    @property
+    def response_type(self) -> str:
+        return RESPONSE_TYPES[self.mode]
+
+async def _canned_reply(request: ChatRequest) -> Optional[CannedReply]:
+    """An instant reply for a trivial message, or a stored answer to a common question
+    
+    Stored answers ignore history, so they are only served to open a
+    conversation; a follow-up such as "what do you mean by that?" goes to
+    the model.
+    """
+    start = time.perf_counter()
+    behavior = get_behavior_config().snapshot()
+    
+    if behavior.instant_replies:
+        instant = get_instant_responder().reply(request.message)
+        if instant is not None:
+            lookup_time = time.perf_counter() - start
+            metrics.BYPASSES.inc(source="instant", category=instant.category)
+            return CannedReply(
+                text=instant.text,
+                model="instant",
+                mode="instant",
+                sources=[],
+                specs={"route": "instant", "category": instant.category},
+                lookup_time=lookup_time
             )
-        
-        conversation = conversations[conversation_id]
-        
-        # Store user message immediately for context
-        user_message = ChatMessage(
-            role="user",
-            content=request.message,
-            timestamp=datetime.now().isoformat()
+    
+    if not behavior.precomputed_answers.enabled:
+        return None
+    layer = ConversationLayer()
+    mode = _reply_mode(layer.needs_empathetic_support(request.message), layer.should_use_rumi_wisdom(request.message))
+    match = get_answer_store().lookup(request.message, mode, behavior.precomputed_answers)
+    if match is None:
+        return None
+    if request.conversation_id and await asyncio.to_thread(_has_assistant_turn, request.conversation_id):
+        return None
+    lookup_time = time.perf_counter() - start
+    metrics.BYPASSES.inc(source="precomputed", category=mode)
+    entry = match.entry
+    logger.info(f"Serving pre-generated answer to \"{entry['question']}\" (similarity {match.similarity:.2f})")
+    return CannedReply(
+        text=entry["answer"],
+        model=entry.get("model", "precomputed"),
+        mode=mode,
+        sources=_format_sources(entry.get("quotes", ())) if mode != "casual" else [],
+        specs={
+            "route": "precomputed",
+            "question": entry["question"],
+            "similarity": round(match.similarity, 3),
+            "generated_at": entry.get("generated_at"),
+            "quotes_used": len(entry.get("quotes", ()))
+        },
+        lookup_time=lookup_time
+    )
+
+def _has_assistant_turn(conversation_id: str) -> bool:
+    conversation = _load_conversation(conversation_id)
+    return conversation is not None and any(msg.role == "assistant" for msg in conversation.messages)
+
+def _canned_specs(reply: CannedReply) -> Dict[str, Any]:
+    """Tech specs for a canned reply, in the shape of a generated reply's"""
+    return {
+        "mode": reply.response_type,
+        "model": reply.model,
+        **reply.specs,
+        "lookup_time_ms": round(reply.lookup_time * 1000, 3),
+        "tokens_generated": 0
+    }
+
+def _store_canned_exchange(request: ChatRequest, reply: CannedReply, timestamp: str) -> Conversation:
+    """Store the user message and its canned reply in one write"""
+    return _append_messages(request.conversation_id, request.model, [
+        ChatMessage(role="user", content=request.message, timestamp=timestamp),
+        ChatMessage(role="assistant", content=_with_sources(reply.text, reply.sources), timestamp=timestamp)
+    ])
+
+def _analyze_and_retrieve(message: str, max_quotes: int) -> Tuple[QueryIntent, List[Dict[str, Any]], float, float]:
+    """Analyze the query and retrieve up to `max_quotes` quotes for it, timing both"""
+    check_deadline("analysis")
+    logger.info(f"Analyzing query: {message}")
+    analysis_start = time.perf_counter()
+    intent = get_query_analyzer().analyze(message)
+    analysis_time = time.perf_counter() - analysis_start
+    logger.info(f"Detected intent: {intent.intent_type}, emotions: {intent.emotions}, themes: {intent.themes}")
+    
+    if not max_quotes:
+        return intent, [], analysis_time, 0.0
+    check_deadline("retrieval")
+    retrieval_start = time.perf_counter()
+    quotes = get_quote_retriever().retrieve(intent, max_quotes=max_quotes)
+    return intent, quotes, analysis_time, time.perf_counter() - retrieval_start
+
+async def _prepare_rumi_turn(request: ChatRequest) -> RumiTurn:
+    """Analyze the message, retrieve quotes and build the prompt for ask-rumi
+    
+    The model is chosen first, from the reply mode and the routing policy, and
+    warmed up while storing the message and analysis plus retrieval run
+    concurrently in worker threads.
+    """
+    responder = get_rumi_responder()
+    layer = ConversationLayer()
+    
+    # DECIDE: Empathetic support OR Casual chat OR Rumi wisdom
+    # These are keyword checks, so the mode is known before the heavier work starts
+    needs_empathy = layer.needs_empathetic_support(request.message)
+    use_rumi_wisdom = layer.should_use_rumi_wisdom(request.message)
+    
+    logger.info(f"{'❤️ EMPATHETIC SUPPORT' if needs_empathy else '🔮 RUMI WISDOM' if use_rumi_wisdom else '💬 Casual CHAT (simple response)'}")
+    
+    # One config snapshot for the whole request, so every setting comes from the same version
+    behavior = get_behavior_config().snapshot()
+    history_depth = behavior.conversation_history_depth
+    if needs_empathy:
+        max_quotes = behavior.max_quotes_for_empathetic
+    elif use_rumi_wisdom:
+        max_quotes = behavior.max_quotes_retrieved
+    else:
+        max_quotes = 0  # No quotes for casual
+    
+    # Casual and simple replies go to the fast model, as does everything when the main model is backed up
+    route = await get_model_router().choose(
+        request.model,
+        _reply_mode(needs_empathy, use_rumi_wisdom),
+        behavior.model_routing,
+        is_simple=get_query_analyzer().is_simple(request.message),
+        message=request.message
+    )
+    # Load the model while the message is analyzed and quotes are retrieved
+    get_local_runner().start_warm_up(route.model)
+    
+    conversation, (intent, quotes, analysis_time, retrieval_time) = await asyncio.gather(
+        asyncio.to_thread(_store_user_message, request),
+        asyncio.to_thread(_analyze_and_retrieve, request.message, max_quotes)
+    )
+    conversation_id = conversation.id
+    
+    # Get conversation history - LIMIT to avoid confusion
+    conversation_history = []
+    if len(conversation.messages) > 1:
+        # Get last N messages based on config
+        context_messages = conversation.messages[-(history_depth+1):-1]
+        conversation_history = [
+            f"{msg.role}: {msg.content}" for msg in context_messages
+        ]
+        logger.info(f"📝 Conversation history: {len(conversation_history)} previous messages")
+    
+    # Generate appropriate prompt
+    if needs_empathy:
+        # Empathetic support with optional wisdom
+        logger.info(f"❤️ Empathetic response with {len(quotes)} supportive quotes")
+        enhanced_prompt = responder.generate_empathetic_prompt(
+            request.message,
+            quotes if quotes else None,
+            conversation_history=conversation_history,
+            behavior=behavior
         )
-        conversation.messages.append(user_message)
-        
-        # Analyze query
-        logger.info(f"Analyzing query: {request.message}")
-        intent = analyzer.analyze(request.message)
-        logger.info(f"Detected intent: {intent.intent_type}, emotions: {intent.emotions}, themes: {intent.themes}")
-        
-        # DECIDE: Empathetic support OR Casual chat OR Rumi wisdom
-        needs_empathy = layer.needs_empathetic_support(request.message)
-        use_rumi_wisdom = layer.should_use_rumi_wisdom(request.message)
-        
-        logger.info(f"{'❤️ EMPATHETIC SUPPORT' if needs_empathy else '🔮 RUMI WISDOM' if use_rumi_wisdom else '💬 Casual CHAT (simple response)'}")
-        
-        # Load behavior config
-        behavior_config = get_behavior_config()
-        history_depth = behavior_config.get('conversation_history_depth', 2)
-        
-        # Get conversation history - LIMIT to avoid confusion
-        conversation_history = []
-        if len(conversation.messages) > 1:
-            # Get last N messages based on config
-            context_messages = conversation.messages[-(history_depth+1):-1]
-            conversation_history = [
-                f"{msg.role}: {msg.content}" for msg in context_messages
-            ]
-            logger.info(f"📝 Conversation history: {len(conversation_history)} previous messages")
+    elif use_rumi_wisdom:
+        # Use knowledge base quotes
+        logger.info(f"✅ Using {len(quotes)} quotes from rumi_knowledge_base.json")
+        enhanced_prompt = responder.generate_wisdom_prompt(
+            request.message, 
+            quotes, 
+            intent,
+            conversation_history=conversation_history,
+            behavior=behavior
+        )
+    else:
+        # Casual chat, no quotes
+        logger.info("💬 Casual response - no quotes")
+        enhanced_prompt = responder.generate_casual_prompt(
+            request.message,
+            conversation_history=conversation_history,
+            behavior=behavior
+        )
+    
+    logger.info(f"Generated prompt length: {len(enhanced_prompt)}")
+    logger.info(f"Prompt preview: {enhanced_prompt[:500]}")
+    
+    # Adjust tokens based on layer type
+    if needs_empathy:
+        max_tokens = behavior.max_tokens_empathetic
+    elif use_rumi_wisdom:
+        max_tokens = behavior.max_tokens_wisdom
+    else:
+        max_tokens = behavior.max_tokens_casual
+    
+    return RumiTurn(
+        conversation_id=conversation_id,
+        conversation=conversation,
+        needs_empathy=needs_empathy,
+        use_rumi_wisdom=use_rumi_wisdom,
+        quotes=quotes or [],
+        prompt=enhanced_prompt,
+        history_length=len(conversation_history),
+        max_tokens=max_tokens,
+        temperature=behavior.temperature,
+        model=route.model,
+        route=route,
+        behavior=behavior,
+        analysis_time=analysis_time,
+        retrieval_time=retrieval_time
+    )
+
+def _quote_sources(turn: RumiTurn) -> List[str]:
+    """Source references for the quotes used in a wisdom or empathetic reply"""
+    if not (turn.use_rumi_wisdom or turn.needs_empathy):
+        return []
+    return _format_sources(turn.quotes)
+
+def _format_sources(quotes: Iterable[Mapping[str, Any]]) -> List[str]:
+    """Format quotes as "ID (source)" references"""
+    sources = []
+    for q in quotes:
+        quote_id = q.get('id', 'N/A')
+        source_ref = q.get('source_ref', '')
+        primary_theme = q.get('primary_theme', '')
         
-        # Generate appropriate prompt
-        if needs_empathy:
-            # Empathetic support with optional wisdom
-            max_quotes_empathy = behavior_config.get('max_quotes_for_empathetic', 2)
-            quotes = retriever.retrieve(intent, max_quotes=max_quotes_empathy)
-            logger.info(f"❤️ Empathetic response with {len(quotes)} supportive quotes")
-            enhanced_prompt = responder.generate_empathetic_prompt(
-                request.message,
-                quotes if quotes else None,
-                conversation_history=conversation_history
-            )
-        elif use_rumi_wisdom:
-            # Use knowledge base quotes
-            max_quotes = behavior_config.get('max_quotes_retrieved', 3)
-            quotes = retriever.retrieve(intent, max_quotes=max_quotes)
-            logger.info(f"✅ Using {len(quotes)} quotes from rumi_knowledge_base.json")
-            enhanced_prompt = responder.generate_wisdom_prompt(
-                request.message, 
-                quotes, 
-                intent,
-                conversation_history=conversation_history
-            )
+        # Format: ID (Source)
+        if source_ref:
+            sources.append(f"{quote_id} ({source_ref})")
+        elif primary_theme:
+            sources.append(f"{quote_id} ({primary_theme})")
         else:
-            # Casual chat, no quotes
-            logger.info("💬 Casual response - no quotes")
-            quotes = []  # No quotes for casual
-            enhanced_prompt = responder.generate_casual_prompt(
-                request.message,
-                conversation_history=conversation_history
+            sources.append(quote_id)
+    return sources
+
+def _tech_specs(
+    turn: RumiTurn,
+    model: str,
+    final_response: str,
+    response: InferenceResponse
+) -> Dict[str, Any]:
+    """Collect technical specs for monitoring from backend metrics"""
+    tokens_used = response.tokens_used
+    tokens_estimated = not tokens_used
+    
+    # Fall back to a word count only when the backend reported nothing
+    if tokens_estimated:
+        tokens_used = len(final_response.split())
+    
+    estimated_cost_usd = (tokens_used / 1000) * 0.0001  # Rough estimate: $0.0001 per 1k tokens
+    
+    return {
+        "mode": turn.response_type,
+        "model": model,
+        "route": turn.route.reason if turn.route else "requested",
+        "quotes_used": len(turn.quotes),
+        "inference_time": response.inference_time or 0,
+        "tokens_generated": tokens_used,
+        "tokens_estimated": tokens_estimated,
+        "prompt_tokens": response.prompt_tokens,
+        "tokens_per_second": response.tokens_per_second,
+        "time_to_first_token": response.time_to_first_token,
+        "prompt_eval_time": response.prompt_eval_time,
+        "load_time": response.load_time,
+        "prompt_length": len(turn.prompt),
+        "history_length": turn.history_length,
+        "max_tokens": turn.max_tokens,
+        "temperature": turn.temperature,
+        "stopped_early": response.stopped_early,
+        "tokens_saved": response.tokens_saved or 0,
+        "estimated_cost_usd": estimated_cost_usd
+    }
+
+def _format_tech_specs(specs: Dict[str, Any]) -> str:
+    """Render tech specs as the footer appended to ask-rumi replies"""
+    def seconds(value: Optional[float]) -> str:
+        return f"{value:.2f}s" if value is not None else "n/a"
+    
+    tokens = f"{specs['tokens_generated']}{' (estimated)' if specs['tokens_estimated'] else ''}"
+    prompt_tokens = specs['prompt_tokens'] if specs['prompt_tokens'] is not None else "n/a"
+    tokens_per_second = f"{specs['tokens_per_second']:.1f}" if specs['tokens_per_second'] else "n/a"
+    early_stop = ""
+    if specs['stopped_early']:
+        early_stop = f"\nEarly stop: yes (~{specs['tokens_saved']} tokens saved)"
+    return f"""
+--- TECH SPECS ---
+Mode: {specs['mode']}
+Model: {specs['model']} ({specs['route']})
+Quotes used: {specs['quotes_used']}
+Inference time: {specs['inference_time']:.2f}s
+Time to first token: {seconds(specs['time_to_first_token'])}
+Prompt processing: {seconds(specs['prompt_eval_time'])} ({prompt_tokens} tokens)
+Model load: {seconds(specs['load_time'])}
+Tokens generated: {tokens}
+Tokens/sec: {tokens_per_second}
+Prompt length: {specs['prompt_length']} chars (includes {specs['history_length']} previous messages)
+Max tokens: {specs['max_tokens']}
+Temperature: {specs['temperature']}
+Estimated cost: ${specs['estimated_cost_usd']:.6f}{early_stop}"""
+
+def _record_rumi_metrics(turn: RumiTurn, model: str, response: InferenceResponse, latency: float):
+    """Record pipeline metrics for a completed ask-rumi reply"""
+    labels = {"model": model, "mode": turn.mode}
+    metrics.REQUESTS.inc(**labels)
+    metrics.REQUEST_LATENCY.observe(latency, **labels)
+    metrics.ANALYSIS_TIME.observe(turn.analysis_time, **labels)
+    metrics.RETRIEVAL_TIME.observe(turn.retrieval_time, **labels)
+    if response.time_to_first_token is not None:
+        metrics.TIME_TO_FIRST_TOKEN.observe(response.time_to_first_token, **labels)
+    if response.prompt_tokens:
+        metrics.TOKENS.inc(response.prompt_tokens, kind="prompt", **labels)
+    if response.tokens_used:
+        metrics.TOKENS.inc(response.tokens_used, kind="completion", **labels)
+
+def _finalize_rumi_reply(turn: RumiTurn, final_response: str, specs: Dict[str, Any], timestamp: str) -> str:
+    """Append tech specs and sources, and store the reply in the conversation"""
+    final_response += _format_tech_specs(specs)
+    
+    # If using Rumi wisdom OR empathetic support with quotes, append sources
+    final_response = _with_sources(final_response, _quote_sources(turn))
+    
+    # Add assistant response (user message already stored above)
+    turn.conversation = _append_messages(turn.conversation_id, turn.conversation.model, [ChatMessage(
+        role="assistant",
+        content=final_response,
+        timestamp=timestamp
+    )])
+    return final_response
+
+def _with_sources(response: str, sources: List[str]) -> str:
+    """Append the quote sources line at the end of a reply"""
+    if sources:
+        return response + f"\n📜 Sources: {', '.join(sources)}"
+    return response
+
+@router.post("/ask-rumi")
+async def ask_rumi(request: ChatRequest, http_request: Request):
+    """Special endpoint for asking Rumi-style questions with intelligent retrieval
+    
+    The reply is abandoned, and its generation aborted, when the request
+    deadline passes (504) or the client disconnects.
+    """
+    try:
+        return await guard(_answer_rumi(request), "ask_rumi", disconnected=http_request.is_disconnected)
+    except DeadlineExceeded as e:
+        metrics.REJECTIONS.inc(reason="deadline")
+        raise HTTPException(status_code=504, detail=str(e))
+    except ClientDisconnected as e:
+        metrics.REJECTIONS.inc(reason="disconnected")
+        raise HTTPException(status_code=499, detail=str(e))
+
+async def _answer_rumi(request: ChatRequest) -> ChatResponse:
+    """Generate a complete ask-rumi reply"""
+    request_start = time.perf_counter()
+    try:
+        canned = await _canned_reply(request)
+        if canned is not None:
+            timestamp = datetime.now().isoformat()
+            conversation = await asyncio.to_thread(_store_canned_exchange, request, canned, timestamp)
+            return ChatResponse(
+                response=_with_sources(canned.text, canned.sources),
+                model=canned.model,
+                conversation_id=conversation.id,
+                timestamp=timestamp,
+                tokens_used=0,
+                inference_time=canned.lookup_time
             )
         
-        logger.info(f"Generated prompt length: {len(enhanced_prompt)}")
-        logger.info(f"Prompt preview: {enhanced_prompt[:500]}")
-        
-        # Load config and adjust tokens based on layer type
-        behavior_config = get_behavior_config()
-        if needs_empathy:
-            max_tokens = behavior_config.get('max_tokens_empathetic', 220)
-        elif use_rumi_wisdom:
-            max_tokens = behavior_config.get('max_tokens_wisdom', 200)
-        else:
-            max_tokens = behavior_config.get('max_tokens_casual', 80)
-        
-        temperature = behavior_config.get('temperature', 0.8)
+        turn = await _prepare_rumi_turn(request)
+        responder = get_rumi_responder()
         
         # Create inference request with enhanced prompt
         inference_request = InferenceRequest(
-            model=request.model,
-            prompt=enhanced_prompt,
-            temperature=temperature,
-            max_tokens=request.max_tokens or max_tokens,
-            context=None
+            model=turn.model,
+            prompt=turn.prompt,
+            temperature=turn.temperature,
+            max_tokens=request.max_tokens or turn.max_tokens,
+            context=None,
+            max_words=responder.response_word_limit(turn.behavior)
         )
         
         # Run inference
-        local_runner = get_local_runner()
-        response = await local_runner.run_inference(inference_request)
+        response = await get_local_runner().run_inference(inference_request)
         
         if not response.success:
+            metrics.REJECTIONS.inc(reason="inference_failed")
             raise HTTPException(status_code=500, detail=f"Inference failed: {response.error}")
         
         # Post-process response
-        final_response = responder.post_process_response(response.response)
-        
-        # Collect technical specs for monitoring
-        response_type = "❤️ Empathetic Support" if needs_empathy else "🔮 Rumi Wisdom" if use_rumi_wisdom else "💬 Casual Chat"
-        quotes_used = len(quotes) if quotes else 0
-        tokens_used = getattr(response, 'tokens_used', 0) or 0
-        prompt_length = len(enhanced_prompt)
-        inference_time = response.inference_time if hasattr(response, 'inference_time') else 0
-        history_length = len(conversation_history) if conversation_history else 0
-        
-        # Estimate tokens from response if not provided
-        if tokens_used == 0:
-            tokens_used = len(final_response.split())  # Rough estimate: word count
-        
-        # Calculate estimated GPU usage (rough estimate based on tokens)
-        # Typical: ~500 MB for small models like gemma3:270m
-        estimated_gpu_mb = max(100, tokens_used * 2)  # Rough estimate: 2 MB per token
-        estimated_cost_usd = (tokens_used / 1000) * 0.0001  # Rough estimate: $0.0001 per 1k tokens
-        
-        # Add comprehensive technical specs
-        tech_specs = f"""
---- TECH SPECS ---
-Mode: {response_type}
-Model: {request.model}
-Quotes used: {quotes_used}
-Inference time: {inference_time:.2f}s
-Tokens generated: {tokens_used}
-Prompt length: {prompt_length} chars (includes {history_length} previous messages)
-Max tokens: {max_tokens}
-Temperature: {temperature}
-Estimated GPU usage: {estimated_gpu_mb} MB
-Estimated cost: ${estimated_cost_usd:.6f}"""
-        final_response += tech_specs
-        
-        # If using Rumi wisdom OR empathetic support with quotes, append sources
-        if (use_rumi_wisdom or needs_empathy) and quotes:
-            sources = []
-            for q in quotes:
-                quote_id = q.get('id', 'N/A')
-                source_ref = q.get('source_ref', '')
-                primary_theme = q.get('primary_theme', '')
-                
-                # Format: ID (Source)
-                if source_ref:
-                    sources.append(f"{quote_id} ({source_ref})")
-                elif primary_theme:
-                    sources.append(f"{quote_id} ({primary_theme})")
-                else:
-                    sources.append(quote_id)
-            
-            if sources:
-                # Append sources at the end
-                final_response += f"\n📜 Sources: {', '.join(sources)}"
-        
-        # Add assistant response (user message already stored above)
-        conversation.messages.append(ChatMessage(
-            role="assistant",
-            content=final_response,
-            timestamp=response.timestamp
-        ))
-        conversation.updated_at = datetime.now().isoformat()
+        final_response = responder.post_process_response(response.response, turn.behavior)
+        specs = _tech_specs(turn, turn.model, final_response, response)
+        final_response = await asyncio.to_thread(_finalize_rumi_reply, turn, final_response, specs, response.timestamp)
+        _record_rumi_metrics(turn, turn.model, response, time.perf_counter() - request_start)
         
         return ChatResponse(
             response=final_response,
-            model=request.model,
-            conversation_id=conversation_id,
+            model=turn.model,
+            conversation_id=turn.conversation_id,
             timestamp=response.timestamp,
             tokens_used=response.tokens_used,
             inference_time=response.inference_time
         )
         
+    except DeadlineExceeded:
+        raise
     except Exception as e:
         logger.error(f"Ask Rumi error: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail=str(e))
 
+def _sse_event(data: Dict[str, Any], event: Optional[str] = None) -> str:
+    """Format a server-sent event"""
+    prefix = f"event: {event}\n" if event else ""
+    return f"{prefix}data: {json.dumps(data)}\n\n"
+
+async def _canned_events(reply: CannedReply, conversation_id: str):
+    """The SSE stream for a canned reply: the same events as a generated one, with a single content event"""
+    yield _sse_event({
+        "conversation_id": conversation_id,
+        "mode": reply.mode,
+        "response_type": reply.response_type,
+        "model": reply.model,
+        "sources": reply.sources
+    }, event="meta")
+    yield _sse_event({"content": reply.text, "success": True})
+    yield _sse_event(_canned_specs(reply), event="tech_specs")
+    yield _sse_event({"done": True, "conversation_id": conversation_id}, event="done")
+
+@router.post("/ask-rumi/stream")
+async def ask_rumi_stream(request: ChatRequest, http_request: Request):
+    """Stream an ask-rumi reply as server-sent events
+    
+    Emits a `meta` event with the response mode and quote sources, then token
+    `data` events as they are generated, then a `tech_specs` event and `done`.
+    Generation is cancelled when the client disconnects or the request
+    deadline passes.
+    """
+    request_start = time.perf_counter()
+    try:
+        canned = await _canned_reply(request)
+        if canned is not None:
+            timestamp = datetime.now().isoformat()
+            conversation = await asyncio.to_thread(_store_canned_exchange, request, canned, timestamp)
+            return StreamingResponse(
+                _canned_events(canned, conversation.id),
+                media_type="text/event-stream",
+                headers={"Cache-Control": "no-cache", "Connection": "keep-alive"}
+            )
+        
+        turn = await _prepare_rumi_turn(request)
+    except DeadlineExceeded as e:
+        metrics.REJECTIONS.inc(reason="deadline")
+        raise HTTPException(status_code=504, detail=str(e))
+    except Exception as e:
+        metrics.REJECTIONS.inc(reason="preparation_failed")
+        logger.error(f"Ask Rumi stream error: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail=str(e))
+    
+    responder = get_rumi_responder()
+    inference_request = InferenceRequest(
+        model=turn.model,
+        prompt=turn.prompt,
+        temperature=turn.temperature,
+        max_tokens=request.max_tokens or turn.max_tokens,
+        stream=True,
+        context=None,
+        max_words=responder.response_word_limit(turn.behavior)
+    )
+    
+    async def generate_events():
+        """Generate the SSE stream"""
+        local_runner = get_local_runner()
+        processor = responder.create_post_processor(turn.behavior)
+        start_time = datetime.now()
+        first_token_time = None
+        tokens_generated = 0
+        stopped_early = False
+        backend_metrics: Dict[str, Any] = {}
+        
+        yield _sse_event({
+            "conversation_id": turn.conversation_id,
+            "mode": turn.mode,
+            "response_type": turn.response_type,
+            "model": turn.model,
+            "sources": _quote_sources(turn)
+        }, event="meta")
+        
+        # Read in a separate task so a stalled read (e.g. a model load) is interrupted too
+        stream = guard_stream(
+            local_runner.run_streaming_inference(inference_request),
+            "inference",
+            disconnected=http_request.is_disconnected
+        )
+        try:
+            async for chunk in stream:
+                try:
+                    chunk_data = json.loads(chunk)
+                except json.JSONDecodeError:
+                    continue
+                
+                if not chunk_data.get("success"):
+                    if chunk_data.get("deadline_exceeded"):
+                        metrics.REJECTIONS.inc(reason="deadline")
+                        abandon("deadline", "inference", tokens_generated)
+                    else:
+                        metrics.REJECTIONS.inc(reason="inference_failed")
+                    yield _sse_event({"error": chunk_data.get("error"), "success": False}, event="error")
+                    return
+                
+                if "metrics" in chunk_data:
+                    backend_metrics = chunk_data["metrics"]
+                    continue
+                
+                tokens_generated += 1
+                if first_token_time is None:
+                    first_token_time = datetime.now()
+                cleaned = processor.feed(chunk_data.get("content", ""))
+                if cleaned:
+                    yield _sse_event({"content": cleaned, "success": True})
+                if processor.done:
+                    # Word budget reached - stop generating
+                    stopped_early = True
+                    break
+            
+            cleaned = processor.finish()
+            if cleaned:
+                yield _sse_event({"content": cleaned, "success": True})
+        except ClientDisconnected:
+            logger.info(f"Client disconnected, cancelled generation for {turn.conversation_id}")
+            abandon("disconnect", "inference", tokens_generated)
+            return
+        except asyncio.CancelledError:
+            # The server cancels the response when it sees the client go away
+            abandon("disconnect", "inference", tokens_generated)
+            raise
+        except DeadlineExceeded as e:
+            metrics.REJECTIONS.inc(reason="deadline")
+            abandon("deadline", "inference", tokens_generated)
+            yield _sse_event({"error": str(e), "success": False}, event="error")
+            return
+        except Exception as e:
+            logger.error(f"Ask Rumi stream error: {e}", exc_info=True)
+            yield _sse_event({"error": str(e), "success": False}, event="error")
+            return
+        finally:
+            # Closing the stream cancels its reader task and aborts the backend generation
+            await stream.aclose()
+        
+        end_time = datetime.now()
+        if stopped_early:
+            # We stopped reading before the backend reported its counters
+            backend_metrics.update(
+                tokens_used=tokens_generated,
+                stopped_early=True,
+                tokens_saved=GenerationBudget(inference_request.max_words).tokens_saved(
+                    tokens_generated, inference_request.max_tokens
+                )
+            )
+        if first_token_time is not None:
+            backend_metrics["time_to_first_token"] = (first_token_time - start_time).total_seconds()
+        response = InferenceResponse(
+            model=turn.model,
+            response=processor.text,
+            inference_time=(end_time - start_time).total_seconds(),
+            timestamp=end_time.isoformat(),
+            success=True,
+            **backend_metrics
+        )
+        specs = _tech_specs(turn, turn.model, processor.text, response)
+        await asyncio.to_thread(_finalize_rumi_reply, turn, processor.text, specs, end_time.isoformat())
+        _record_rumi_metrics(turn, turn.model, response, time.perf_counter() - request_start)
+        
+        yield _sse_event(specs, event="tech_specs")
+        yield _sse_event({"done": True, "conversation_id": turn.conversation_id}, event="done")
+    
+    return StreamingResponse(
+        generate_events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "Connection": "keep-alive"}
+    )
+
 @router.get("/settings")
 async def get_rumi_settings():
     """Get Rumi conversation settings"""
@@ -565,7 +1005,7 @@ async def chat_health():
     """Health check for chat service"""
     return {
         "status": "healthy",
-        "active_conversations": len(conversations),
+        "active_conversations": await asyncio.to_thread(get_conversation_store().count),
         "available_models": len([m for m in get_model_registry().get_available_models().values()])
     }
 
@@ -573,31 +1013,13 @@ async def chat_health():
 async def get_emotion_keywords():
     """Get emotion and keyword tags configuration"""
     try:
-        import os
-        import json
-        
-        # Load from JSON file
-        config_path = "data/emotion_keywords_config.json"
-        if os.path.exists(config_path):
-            with open(config_path, 'r', encoding='utf-8') as f:
-                config = json.load(f)
-            return {
-                    "status": "success",
-                    "config": config
-                }
-        else:
-            # Return default config
-            return {
-                    "status": "success",
-                    "config": {
-                        "emotion_keywords": {},
-                        "theme_keywords": {},
-                        "empathy_triggers": {
-                            "distress_patterns": [],
-                            "emoticons": []
-                        }
-                    }
-                }
+        # Served from memory; the file is only re-read when it changes
+        snapshot = get_emotion_keywords_store().snapshot()
+        return {
+                "status": "success",
+                "config": snapshot.to_dict(),
+                "version": snapshot.version
+            }
     except Exception as e:
         logger.error(f"Error loading emotion keywords: {e}")
         return {
@@ -609,18 +1031,11 @@ async def get_emotion_keywords():
 async def save_emotion_keywords(request: Dict[str, Any]):
     """Save emotion and keyword tags configuration"""
     try:
-        import os
-        import json
-        
-        config = request
-        config_path = "data/emotion_keywords_config.json"
-        
-        # Save to JSON file
-        with open(config_path, 'w', encoding='utf-8') as f:
-            json.dump(config, f, indent=4, ensure_ascii=False)
+        # Takes effect immediately; written to disk debounced and atomically
+        snapshot = get_emotion_keywords_store().update(request)
         
-        logger.info("Emotion keywords configuration saved")
-        return {"status": "success", "message": "Configuration saved"}
+        logger.info(f"Emotion keywords configuration saved (version {snapshot.version})")
+        return {"status": "success", "message": "Configuration saved", "version": snapshot.version}
     except Exception as e:
         logger.error(f"Error saving emotion keywords: {e}")
         raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
@@ -3,7 +3,7 @@ Models API routes for Ask Rumi Backend
 Handles model management, downloads, and inference.
 """
 
-from fastapi import APIRouter, HTTPException, BackgroundTasks
+from fastapi import APIRouter, HTTPException, BackgroundTasks, Request
 from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from typing import Optional, List, Dict, Any
@@ -12,7 +12,7 @@ import json
 import logging
 from datetime import datetime
 
-from core.model_manager import get_model_registry, ModelInfo
+from core.model_manager import get_model_registry, get_residency_manager, ModelInfo
 from core.local_runner import get_local_runner, InferenceRequest
 from core.queue_manager import get_queue_manager, TaskPriority
 
@@ -56,6 +56,8 @@ async def list_models():
     try:
         registry = get_model_registry()
         models = registry.get_all_models()
+        residency = await get_residency_manager().get_status()
+        resident = {model["name"] for model in residency["resident"]}
         
         return {
             "models": [
@@ -68,11 +70,14 @@ async def list_models():
                     "status": model.status,
                     "tags": model.tags,
                     "capabilities": model.capabilities,
-                    "last_updated": model.last_updated
+                    "last_updated": model.last_updated,
+                    "resident": model.name in resident,
+                    "pinned": model.name in residency["pinned"]
                 }
                 for model in models.values()
             ],
-            "total": len(models)
+            "total": len(models),
+            "residency": residency
         }
     except Exception as e:
         logger.error(f"Error listing models: {e}")
@@ -104,6 +109,38 @@ async def list_available_models():
         logger.error(f"Error listing available models: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.get("/residency")
+async def get_residency():
+    """Models loaded in Ollama, the memory budget and recent load/evict decisions"""
+    try:
+        return await get_residency_manager().get_status()
+    except Exception as e:
+        logger.error(f"Error getting model residency: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/{model_name}/pin")
+async def pin_model(model_name: str):
+    """Keep a model loaded in Ollama indefinitely"""
+    try:
+        loaded = await get_residency_manager().pin(model_name)
+        return {"model": model_name, "pinned": True, "loaded": loaded}
+    except Exception as e:
+        logger.error(f"Error pinning model: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.delete("/{model_name}/pin")
+async def unpin_model(model_name: str):
+    """Let a pinned model expire after the normal keep_alive"""
+    try:
+        if not await get_residency_manager().unpin(model_name):
+            raise HTTPException(status_code=404, detail=f"Model {model_name} is not pinned")
+        return {"model": model_name, "pinned": False}
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error unpinning model: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
 @router.get("/{model_name}")
 async def get_model_info(model_name: str):
     """Get detailed information about a specific model"""
@@ -301,11 +338,13 @@ async def get_download_status(model_name: str):
             raise HTTPException(status_code=404, detail=f"Model {model_name} not found")
         
         progress = registry.get_download_progress(model_name)
+        state = registry.get_download_state(model_name)
         
         return {
             "model": model_name,
             "status": model.status,
             "progress": progress,
+            "download": state.dict() if state else None,
             "last_updated": model.last_updated
         }
     except HTTPException:
@@ -314,12 +353,46 @@ async def get_download_status(model_name: str):
         logger.error(f"Error getting download status: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.get("/download/{model_name}/events")
+async def stream_download_progress(model_name: str, request: Request):
+    """Push download progress for a model as server-sent events"""
+    registry = get_model_registry()
+    model = registry.get_model(model_name)
+    if not model:
+        raise HTTPException(status_code=404, detail=f"Model {model_name} not found")
+    
+    async def event_stream():
+        last_sent = None
+        while not await request.is_disconnected():
+            state = registry.get_download_state(model_name)
+            if state is None:
+                # Nothing downloading; report the registry status once
+                yield f"event: done\ndata: {json.dumps({'model': model_name, 'status': model.status})}\n\n"
+                return
+            
+            data = state.dict()
+            if data != last_sent:
+                yield f"event: progress\ndata: {json.dumps(data)}\n\n"
+                last_sent = data
+            if state.finished:
+                yield f"event: done\ndata: {json.dumps(data)}\n\n"
+                return
+            
+            if not await registry.wait_for_progress(timeout=15.0):
+                yield ": keep-alive\n\n"
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @router.delete("/{model_name}")
 async def remove_model(model_name: str):
     """Remove a model"""
     try:
         registry = get_model_registry()
-        success = registry.remove_model(model_name)
+        success = await registry.remove_model(model_name)
         
         if not success:
             raise HTTPException(status_code=404, detail=f"Model {model_name} not found")
@@ -4,13 +4,17 @@ Handles model providers and external service integration.
 """
 
 from fastapi import APIRouter, HTTPException
-from pydantic import BaseModel
-from typing import Optional, List, Dict, Any
-import json
+from pydantic import BaseModel, ConfigDict
+from typing import Optional, List, Dict, Any, Mapping
+from types import MappingProxyType
 import logging
 from datetime import datetime
 
 from core.model_manager import get_model_registry
+from core.config_store import ConfigStore, thaw
+from core.provider_health import get_provider_health
+
+PROVIDERS_CONFIG_PATH = "data/providers.config.json"
 
 logger = logging.getLogger(__name__)
 
@@ -28,7 +32,9 @@ class ProviderInfo(BaseModel):
     config: Dict[str, Any]
 
 class ProviderConfig(BaseModel):
-    """Provider configuration model"""
+    """Provider configuration model (immutable; use .copy(update=...) to change)"""
+    model_config = ConfigDict(frozen=True)
+    
     name: str
     enabled: bool
     api_key: Optional[str] = None
@@ -37,46 +43,60 @@ class ProviderConfig(BaseModel):
     timeout: Optional[int] = None
     fallback_enabled: bool = True
 
-# Load providers configuration
-def load_providers_config() -> Dict[str, ProviderConfig]:
-    """Load providers configuration from file"""
-    try:
-        with open("data/providers.config.json", "r") as f:
-            data = json.load(f)
-            return {
-                name: ProviderConfig(**config) 
-                for name, config in data.get("providers", {}).items()
-            }
-    except FileNotFoundError:
-        # Return default configuration
-        return {
+def default_providers_config() -> Dict[str, Any]:
+    """Configuration used when no providers file exists"""
+    return {
+        "providers": {
             "ollama": ProviderConfig(
                 name="ollama",
                 enabled=True,
                 base_url="http://localhost:11434",
                 timeout=300,
                 fallback_enabled=True
-            ),
+            ).dict(),
             "openai": ProviderConfig(
                 name="openai",
                 enabled=False,
                 timeout=30,
                 max_requests_per_minute=60,
                 fallback_enabled=True
-            ),
+            ).dict(),
             "huggingface": ProviderConfig(
                 name="huggingface",
                 enabled=True,
                 timeout=60,
                 fallback_enabled=True
-            )
+            ).dict()
         }
-    except Exception as e:
-        logger.error(f"Error loading providers config: {e}")
-        return {}
+    }
+
+def _parse_providers(raw: Mapping[str, Any]) -> Mapping[str, ProviderConfig]:
+    """Validate a providers file once per version"""
+    return MappingProxyType({
+        name: ProviderConfig(**thaw(config))
+        for name, config in raw.get("providers", {}).items()
+    })
+
+# Global instance
+providers_store: ConfigStore[Mapping[str, ProviderConfig]] = ConfigStore(
+    PROVIDERS_CONFIG_PATH,
+    parse=_parse_providers,
+    default=default_providers_config
+)
+
+# Cached probe results may describe the old settings
+providers_store.subscribe(lambda snapshot: get_provider_health().invalidate())
+
+def get_providers_store() -> ConfigStore[Mapping[str, ProviderConfig]]:
+    """Get the providers config store"""
+    return providers_store
+
+def load_providers_config() -> Mapping[str, ProviderConfig]:
+    """Current providers configuration (read-only; use save_providers_config to change it)"""
+    return providers_store.snapshot().data
 
-def save_providers_config(config: Dict[str, ProviderConfig]):
-    """Save providers configuration to file"""
+def save_providers_config(config: Mapping[str, ProviderConfig]):
+    """Save providers configuration"""
     try:
         data = {
             "providers": {
@@ -85,8 +105,7 @@ def save_providers_config(config: Dict[str, ProviderConfig]):
             },
             "last_updated": datetime.now().isoformat()
         }
-        with open("data/providers.config.json", "w") as f:
-            json.dump(data, f, indent=2)
+        providers_store.update(data)
     except Exception as e:
         logger.error(f"Error saving providers config: {e}")
 
@@ -96,6 +115,8 @@ async def list_providers():
     try:
         registry = get_model_registry()
         providers_config = load_providers_config()
+        # Known-down providers (open circuit) are reported unavailable without probing
+        health = get_provider_health()
         
         providers = []
         
@@ -108,7 +129,7 @@ async def list_providers():
             display_name="Ollama",
             description="Local model inference using Ollama",
             type="local",
-            status="available" if ollama_config.enabled else "unavailable",
+            status="available" if ollama_config.enabled and health.is_available("ollama") else "unavailable",
             models_count=len(ollama_models),
             capabilities=["chat", "streaming", "local"],
             config=ollama_config.dict()
@@ -123,7 +144,7 @@ async def list_providers():
             display_name="HuggingFace",
             description="Open-source models from HuggingFace Hub",
             type="hybrid",
-            status="available" if hf_config.enabled else "unavailable",
+            status="available" if hf_config.enabled and health.is_available("huggingface") else "unavailable",
             models_count=len(hf_models),
             capabilities=["chat", "embedding", "transcription"],
             config=hf_config.dict()
@@ -137,7 +158,7 @@ async def list_providers():
                 display_name="OpenAI",
                 description="Premium AI models from OpenAI",
                 type="online",
-                status="available" if openai_config.api_key else "unavailable",
+                status="available" if openai_config.api_key and health.is_available("openai") else "unavailable",
                 models_count=0,  # Would be dynamic in real implementation
                 capabilities=["chat", "embedding", "transcription"],
                 config=openai_config.dict()
@@ -151,12 +172,33 @@ async def list_providers():
         logger.error(f"Error listing providers: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.get("/health")
+async def providers_health():
+    """Health check for providers service, probing enabled providers concurrently"""
+    try:
+        providers_config = load_providers_config()
+        enabled = {name: config for name, config in providers_config.items() if config.enabled}
+        health = await get_provider_health().check_all(enabled)
+        
+        return {
+            "status": "healthy" if all(h.healthy for h in health.values()) else "degraded",
+            "total_providers": len(providers_config),
+            "enabled_providers": len(enabled),
+            "providers": list(providers_config.keys()),
+            "health": {name: h.dict() for name, h in health.items()}
+        }
+    except Exception as e:
+        logger.error(f"Providers health check error: {e}")
+        return {"status": "unhealthy", "error": str(e)}
+
 @router.get("/{provider_name}")
 async def get_provider_info(provider_name: str):
     """Get detailed information about a specific provider"""
     try:
         registry = get_model_registry()
         providers_config = load_providers_config()
+        # Known-down providers (open circuit) are reported unavailable without probing
+        health = get_provider_health()
         
         if provider_name == "ollama":
             models = [m for m in registry.get_all_models().values() if m.provider == "ollama"]
@@ -167,7 +209,7 @@ async def get_provider_info(provider_name: str):
                 display_name="Ollama",
                 description="Local model inference using Ollama",
                 type="local",
-                status="available" if config.enabled else "unavailable",
+                status="available" if config.enabled and health.is_available("ollama") else "unavailable",
                 models_count=len(models),
                 capabilities=["chat", "streaming", "local"],
                 config=config.dict()
@@ -182,7 +224,7 @@ async def get_provider_info(provider_name: str):
                 display_name="HuggingFace",
                 description="Open-source models from HuggingFace Hub",
                 type="hybrid",
-                status="available" if config.enabled else "unavailable",
+                status="available" if config.enabled and health.is_available("huggingface") else "unavailable",
                 models_count=len(models),
                 capabilities=["chat", "embedding", "transcription"],
                 config=config.dict()
@@ -198,7 +240,7 @@ async def get_provider_info(provider_name: str):
                 display_name="OpenAI",
                 description="Premium AI models from OpenAI",
                 type="online",
-                status="available" if config.api_key else "unavailable",
+                status="available" if config.api_key and health.is_available("openai") else "unavailable",
                 models_count=0,
                 capabilities=["chat", "embedding", "transcription"],
                 config=config.dict()
@@ -249,7 +291,7 @@ async def get_provider_models(provider_name: str):
 async def configure_provider(provider_name: str, config: ProviderConfig):
     """Configure a provider"""
     try:
-        providers_config = load_providers_config()
+        providers_config = dict(load_providers_config())
         providers_config[provider_name] = config
         save_providers_config(providers_config)
         
@@ -265,12 +307,12 @@ async def configure_provider(provider_name: str, config: ProviderConfig):
 async def enable_provider(provider_name: str):
     """Enable a provider"""
     try:
-        providers_config = load_providers_config()
+        providers_config = dict(load_providers_config())
         
         if provider_name not in providers_config:
             raise HTTPException(status_code=404, detail=f"Provider {provider_name} not found")
         
-        providers_config[provider_name].enabled = True
+        providers_config[provider_name] = providers_config[provider_name].copy(update={"enabled": True})
         save_providers_config(providers_config)
         
         return {"message": f"Provider {provider_name} enabled"}
@@ -284,12 +326,12 @@ async def enable_provider(provider_name: str):
 async def disable_provider(provider_name: str):
     """Disable a provider"""
     try:
-        providers_config = load_providers_config()
+        providers_config = dict(load_providers_config())
         
         if provider_name not in providers_config:
             raise HTTPException(status_code=404, detail=f"Provider {provider_name} not found")
         
-        providers_config[provider_name].enabled = False
+        providers_config[provider_name] = providers_config[provider_name].copy(update={"enabled": False})
         save_providers_config(providers_config)
         
         return {"message": f"Provider {provider_name} disabled"}
@@ -309,60 +351,14 @@ async def test_provider(provider_name: str):
         if not config:
             raise HTTPException(status_code=404, detail=f"Provider {provider_name} not found")
         
-        if not config.enabled:
-            return {
-                "provider": provider_name,
-                "test_passed": False,
-                "message": "Provider is disabled"
-            }
-        
-        # Test based on provider type
-        if provider_name == "ollama":
-            # Test Ollama connection
-            import subprocess
-            try:
-                result = subprocess.run(
-                    ["ollama", "list"],
-                    capture_output=True,
-                    text=True,
-                    timeout=10
-                )
-                success = result.returncode == 0
-                message = "Ollama is working correctly" if success else "Ollama connection failed"
-            except Exception as e:
-                success = False
-                message = f"Ollama test failed: {e}"
-        
-        elif provider_name == "huggingface":
-            # Test HuggingFace connection
-            try:
-                import requests
-                response = requests.get("https://huggingface.co/api/models", timeout=10)
-                success = response.status_code == 200
-                message = "HuggingFace API is accessible" if success else "HuggingFace API not accessible"
-            except Exception as e:
-                success = False
-                message = f"HuggingFace test failed: {e}"
-        
-        elif provider_name == "openai":
-            # Test OpenAI connection
-            try:
-                import openai
-                # This would require actual API key testing
-                success = bool(config.api_key)
-                message = "OpenAI API key configured" if success else "OpenAI API key not configured"
-            except Exception as e:
-                success = False
-                message = f"OpenAI test failed: {e}"
-        
-        else:
-            success = False
-            message = f"Unknown provider: {provider_name}"
+        # Always probes, bypassing the cache and an open circuit
+        health = await get_provider_health().check(provider_name, config, force=True)
         
         return {
             "provider": provider_name,
-            "test_passed": success,
-            "message": message
+            "test_passed": health.healthy,
+            "message": health.message,
+            "health": health.dict()
         }
     
     except HTTPException:
@@ -370,20 +366,3 @@ async def test_provider(provider_name: str):
     except Exception as e:
         logger.error(f"Provider test error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
-
-@router.get("/health")
-async def providers_health():
-    """Health check for providers service"""
-    try:
-        providers_config = load_providers_config()
-        enabled_providers = [name for name, config in providers_config.items() if config.enabled]
-        
-        return {
-            "status": "healthy",
-            "total_providers": len(providers_config),
-            "enabled_providers": len(enabled_providers),
-            "providers": list(providers_config.keys())
-        }
-    except Exception as e:
-        logger.error(f"Providers health check error: {e}")
-        return {"status": "unhealthy", "error": str(e)}
\ No newline at end of file
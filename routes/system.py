@@ -9,13 +9,14 @@ from typing import Optional, Dict, Any, List
 import logging
 import psutil
 import platform
-import torch
 from datetime import datetime
 
 from core.gpu_manager import get_gpu_manager, DeviceInfo
+from core import device_probe
 from core.model_manager import get_model_registry
 from core.queue_manager import get_queue_manager
 from core.local_runner import get_local_runner
+from core.system_monitor import get_system_monitor
 
 logger = logging.getLogger(__name__)
 
@@ -25,7 +26,7 @@ class SystemInfo(BaseModel):
     """System information model"""
     platform: str
     python_version: str
-    torch_version: str
+    torch_version: Optional[str]
     cpu_count: int
     memory_total: float  # GB
     memory_available: float  # GB
@@ -60,7 +61,7 @@ async def get_system_info():
         system_info = SystemInfo(
             platform=f"{platform.system()} {platform.release()}",
             python_version=platform.python_version(),
-            torch_version=torch.__version__,
+            torch_version=device_probe.torch_version(),
             cpu_count=psutil.cpu_count(),
             memory_total=memory.total / (1024**3),
             memory_available=memory.available / (1024**3),
@@ -125,24 +126,22 @@ async def get_memory_usage(device: Optional[str] = Query(None, description="Spec
     """Get memory usage for a specific device or all devices"""
     try:
         gpu_manager = get_gpu_manager()
+        snapshot = get_system_monitor().latest()
         
         if device:
-            memory_info = gpu_manager.get_memory_usage(device)
+            memory_info = snapshot.device_memory.get(device)
+            if memory_info is None:
+                memory_info = gpu_manager.get_memory_usage(device)
             return {
                 "device": device,
-                "memory": memory_info
+                "memory": memory_info,
+                "sampled_at": snapshot.timestamp
             }
         else:
-            # Get memory info for all devices
-            all_devices = gpu_manager.get_all_devices()
-            memory_info = {}
-            
-            for device_name in all_devices.keys():
-                memory_info[device_name] = gpu_manager.get_memory_usage(device_name)
-            
             return {
-                "devices": memory_info,
-                "current_device": gpu_manager.get_current_device()
+                "devices": snapshot.device_memory,
+                "current_device": gpu_manager.get_current_device(),
+                "sampled_at": snapshot.timestamp
             }
     except Exception as e:
         logger.error(f"Error getting memory usage: {e}")
@@ -167,9 +166,8 @@ async def clear_memory_cache(device: Optional[str] = Query(None, description="De
 async def get_health_status():
     """Get comprehensive health status"""
     try:
-        # Check system load
-        cpu_percent = psutil.cpu_percent(interval=1)
-        memory = psutil.virtual_memory()
+        # System load from the background sampler
+        snapshot = get_system_monitor().latest()
         
         # Check services
         services = {}
@@ -211,14 +209,15 @@ async def get_health_status():
             timestamp=datetime.now().isoformat(),
             services=services,
             system_load={
-                "cpu_percent": cpu_percent,
-                "memory_percent": memory.percent,
-                "load_average": psutil.getloadavg()[0] if hasattr(psutil, 'getloadavg') else 0.0
+                "cpu_percent": snapshot.cpu_percent,
+                "memory_percent": snapshot.memory_used_percent,
+                "load_average": snapshot.load_average[0]
             },
             memory_usage={
-                "total": memory.total / (1024**3),
-                "available": memory.available / (1024**3),
-                "used_percent": memory.percent
+                "total": snapshot.memory_total_gb,
+                "available": snapshot.memory_available_gb,
+                "used_percent": snapshot.memory_used_percent,
+                "sampled_at": snapshot.timestamp
             }
         )
         
@@ -231,9 +230,8 @@ async def get_health_status():
 async def get_system_stats():
     """Get system statistics and metrics"""
     try:
-        # System stats
-        memory = psutil.virtual_memory()
-        disk = psutil.disk_usage('/')
+        # System stats from the background sampler
+        snapshot = get_system_monitor().latest()
         
         # Model stats
         model_registry = get_model_registry()
@@ -250,13 +248,16 @@ async def get_system_stats():
         
         return {
             "system": {
-                "cpu_count": psutil.cpu_count(),
-                "memory_total_gb": memory.total / (1024**3),
-                "memory_available_gb": memory.available / (1024**3),
-                "memory_used_percent": memory.percent,
-                "disk_total_gb": disk.total / (1024**3),
-                "disk_available_gb": disk.free / (1024**3),
-                "disk_used_percent": (disk.used / disk.total) * 100
+                "cpu_count": snapshot.cpu_count,
+                "cpu_percent": snapshot.cpu_percent,
+                "memory_total_gb": snapshot.memory_total_gb,
+                "memory_available_gb": snapshot.memory_available_gb,
+                "memory_used_percent": snapshot.memory_used_percent,
+                "load_average": snapshot.load_average,
+                "disk_total_gb": snapshot.disk_total_gb,
+                "disk_available_gb": snapshot.disk_available_gb,
+                "disk_used_percent": snapshot.disk_used_percent,
+                "sampled_at": snapshot.timestamp
             },
             "models": {
                 "total_models": len(all_models),
@@ -267,13 +268,27 @@ async def get_system_stats():
             "queue": queue_stats,
             "inference": {
                 "recent_inferences": len(inference_history),
-                "last_inference": inference_history[-1].timestamp if inference_history else None
+                "last_inference": inference_history[-1].timestamp if inference_history else None,
+                **snapshot.inference,
+                "models": snapshot.models
             }
         }
     except Exception as e:
         logger.error(f"Error getting system stats: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.get("/metrics/history")
+async def get_metrics_history(limit: Optional[int] = Query(None, description="Number of recent snapshots to return")):
+    """Get recent system snapshots collected by the background sampler"""
+    monitor = get_system_monitor()
+    snapshots = monitor.get_history(limit)
+    return {
+        "interval": monitor.interval,
+        "is_running": monitor.is_running,
+        "snapshots": [snapshot.dict() for snapshot in snapshots],
+        "total": len(snapshots)
+    }
+
 @router.get("/version")
 async def get_version_info():
     """Get version information"""
@@ -287,7 +302,7 @@ async def get_version_info():
             "python_version": sys.version,
             "fastapi_version": fastapi.__version__,
             "uvicorn_version": uvicorn.__version__,
-            "torch_version": torch.__version__,
+            "torch_version": device_probe.torch_version(),
             "platform": platform.platform(),
             "architecture": platform.architecture()[0]
         }
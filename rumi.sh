@@ -18,6 +18,15 @@ case "$1" in
         uvicorn main:app --host 127.0.0.1 --port 8001 --reload
         ;;
     
+    prod)
+        echo -e "${GREEN}🚀 Starting Ask Rumi Backend (production, multi-worker)...${NC}"
+        lsof -ti:8001 | xargs kill -9 2>/dev/null
+        sleep 1
+        cd /Users/abdulbasit/Documents/AppsAI/askrumi/RumiBackend
+        source venv/bin/activate
+        python main.py --production --host 127.0.0.1 --port 8001 ${2:+--workers $2}
+        ;;
+    
     stop)
         echo -e "${RED}🛑 Stopping Ask Rumi Backend...${NC}"
         pkill -9 uvicorn
@@ -56,6 +65,7 @@ case "$1" in
         echo ""
         echo "Commands:"
         echo "  start     - Start the server"
+        echo "  prod [N]  - Start in production mode with N workers (default: one per core)"
         echo "  stop      - Stop the server"
         echo "  restart   - Restart the server (kill + start)"
         echo "  kill      - Kill all uvicorn processes"
@@ -63,6 +73,7 @@ case "$1" in
         echo ""
         echo "Examples:"
         echo "  ./rumi.sh start"
+        echo "  ./rumi.sh prod 4"
         echo "  ./rumi.sh stop"
         echo "  ./rumi.sh restart"
         ;;
@@ -0,0 +1,68 @@
+"""
+Measure backend startup cost.
+Imports the FastAPI app in a fresh interpreter and reports import time and
+resident memory, alongside a bare `import torch` for comparison.
+"""
+
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+PROBE = """
+import json, resource, sys, time
+start = time.perf_counter()
+{statement}
+elapsed = time.perf_counter() - start
+rss_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+if sys.platform == "darwin":
+    rss_kb //= 1024  # macOS reports bytes
+print(json.dumps({{"seconds": elapsed, "rss_mb": rss_kb / 1024, "torch_loaded": "torch" in sys.modules}}))
+"""
+
+TARGETS = {
+    "app": "import main",
+    "torch": "import torch",
+}
+
+def run_once(statement: str) -> dict:
+    """Run one import in a fresh interpreter"""
+    result = subprocess.run(
+        [sys.executable, "-c", PROBE.format(statement=statement)],
+        cwd=ROOT,
+        capture_output=True,
+        text=True
+    )
+    if result.returncode != 0:
+        error = result.stderr.strip().splitlines()[-1] if result.stderr.strip() else "unknown error"
+        return {"error": error}
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+def benchmark(name: str, statement: str, runs: int):
+    """Repeat an import and print median time and memory"""
+    samples = [run_once(statement) for _ in range(runs)]
+    errors = [s["error"] for s in samples if "error" in s]
+    if errors:
+        print(f"{name:<8} failed: {errors[0]}")
+        return
+
+    seconds = statistics.median(s["seconds"] for s in samples)
+    rss_mb = statistics.median(s["rss_mb"] for s in samples)
+    torch_loaded = any(s["torch_loaded"] for s in samples)
+    print(f"{name:<8} import {seconds * 1000:8.1f} ms   rss {rss_mb:7.1f} MB   torch loaded: {torch_loaded}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark backend import time and memory")
+    parser.add_argument("--runs", type=int, default=5, help="Fresh interpreters per target")
+    args = parser.parse_args()
+
+    print(f"Startup benchmark ({args.runs} runs, median)")
+    for name, statement in TARGETS.items():
+        benchmark(name, statement, args.runs)
+
+if __name__ == "__main__":
+    main()
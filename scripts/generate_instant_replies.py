@@ -0,0 +1,96 @@
+"""
+Generate the instant reply pool.
+Asks the local model for several casual replies to each trivial message
+category (greetings, thanks, goodbyes) and stores them in
+data/instant_replies.json, which the server reloads on change.
+
+Examples:
+    python scripts/generate_instant_replies.py --model gemma3:270m
+    python scripts/generate_instant_replies.py --samples 20 --keep 8 --category thanks
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+from datetime import datetime
+from pathlib import Path
+from typing import List
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+os.chdir(ROOT)
+
+from core.local_runner import InferenceRequest, get_local_runner
+from core.persistence import atomic_write_json
+from services.behavior_config import get_behavior_config
+from services.instant_replies import INSTANT_REPLIES_PATH, normalize
+from services.rumi_responder import get_rumi_responder
+
+async def generate_category(phrases: List[str], model: str, samples: int, keep: int, max_words: int, concurrency: asyncio.Semaphore) -> List[str]:
+    """Sample replies to the category's trigger phrases and keep distinct, short ones"""
+    runner = get_local_runner()
+    responder = get_rumi_responder()
+    behavior = get_behavior_config().snapshot()
+
+    async def sample(i: int) -> str:
+        # The live casual prompt, so pre-generated replies sound like generated ones
+        prompt = responder.generate_casual_prompt(phrases[i % len(phrases)], behavior=behavior)
+        async with concurrency:
+            response = await runner.run_inference(InferenceRequest(
+                model=model,
+                prompt=prompt,
+                temperature=0.9,
+                max_tokens=behavior.max_tokens_casual,
+                max_words=max_words
+            ))
+        if not response.success:
+            print(f"  sample failed: {response.error}")
+            return ""
+        return responder.post_process_response(response.response, behavior)
+
+    replies, seen = [], set()
+    for reply in await asyncio.gather(*(sample(i) for i in range(samples))):
+        key = normalize(reply)
+        if not reply or key in seen or len(reply.split()) > max_words:
+            continue
+        seen.add(key)
+        replies.append(reply)
+    return replies[:keep]
+
+async def main():
+    parser = argparse.ArgumentParser(description="Generate the instant reply pool with the local model")
+    parser.add_argument("--model", default="gemma3:270m")
+    parser.add_argument("--samples", type=int, default=12, help="Generations per category")
+    parser.add_argument("--keep", type=int, default=6, help="Replies kept per category")
+    parser.add_argument("--max-words", type=int, default=30, help="Drop replies longer than this")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--category", action="append", help="Only regenerate these categories")
+    parser.add_argument("--output", default=INSTANT_REPLIES_PATH)
+    args = parser.parse_args()
+
+    path = Path(args.output)
+    pool = json.loads(path.read_text(encoding="utf-8"))
+    concurrency = asyncio.Semaphore(args.concurrency)
+    try:
+        for category, entry in pool["categories"].items():
+            if args.category and category not in args.category:
+                continue
+            print(f"Generating {category} replies with {args.model}...")
+            replies = await generate_category(entry["phrases"], args.model, args.samples, args.keep, args.max_words, concurrency)
+            if replies:
+                entry["replies"] = replies
+                print(f"  kept {len(replies)} replies")
+            else:
+                print("  no usable replies, keeping the existing ones")
+    finally:
+        await get_local_runner().close()
+
+    pool["model"] = args.model
+    pool["generated_at"] = datetime.now().isoformat()
+    atomic_write_json(path, pool, indent=4, ensure_ascii=False)
+    print(f"Wrote {path}")
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,167 @@
+"""
+Load test for Ask Rumi Backend.
+Starts the server in production mode with different worker counts and
+measures throughput and latency, or targets an already running server.
+
+With --shared-conversation every client continues the same conversation, so
+requests landing on different workers contend for the same SQLite row and the
+same model slots; afterwards the stored replies are counted to catch lost turns.
+
+Examples:
+    python scripts/load_test.py --workers 1 2 4
+    python scripts/load_test.py --workers 1 4 --shared-conversation --concurrency 8
+    python scripts/load_test.py --url http://127.0.0.1:8001 --path /api/chat/ask-rumi
+"""
+
+import argparse
+import asyncio
+import statistics
+import subprocess
+import sys
+import time
+import uuid
+from pathlib import Path
+from typing import List, Optional
+
+import httpx
+
+ROOT = Path(__file__).resolve().parent.parent
+
+MESSAGES = [
+    "what is love",
+    "I feel lost and lonely",
+    "how do I find peace",
+    "why do we suffer",
+    "tell me about patience",
+    "hello there",
+]
+
+async def wait_until_ready(base_url: str, timeout: float = 60.0):
+    """Poll /ready until the server has warmed up"""
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient(base_url=base_url) as client:
+        while time.monotonic() < deadline:
+            try:
+                if (await client.get("/ready")).status_code == 200:
+                    return
+            except httpx.HTTPError:
+                pass
+            await asyncio.sleep(0.5)
+    raise TimeoutError(f"Server at {base_url} did not become ready")
+
+async def run_load(
+    base_url: str,
+    path: str,
+    model: str,
+    concurrency: int,
+    duration: float,
+    conversation_id: Optional[str] = None
+) -> dict:
+    """Send requests from `concurrency` clients for `duration` seconds, optionally all in one conversation"""
+    latencies: List[float] = []
+    errors = 0
+    stop_at = time.monotonic() + duration
+
+    async def client_loop(client: httpx.AsyncClient, worker_id: int):
+        nonlocal errors
+        i = worker_id
+        while time.monotonic() < stop_at:
+            payload = {"message": MESSAGES[i % len(MESSAGES)], "model": model, "conversation_id": conversation_id}
+            i += 1
+            start = time.perf_counter()
+            try:
+                response = await client.post(path, json=payload)
+                if response.status_code == 200:
+                    latencies.append(time.perf_counter() - start)
+                else:
+                    errors += 1
+            except httpx.HTTPError:
+                errors += 1
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, timeout=120.0, limits=limits) as client:
+        started = time.monotonic()
+        await asyncio.gather(*(client_loop(client, n) for n in range(concurrency)))
+        elapsed = time.monotonic() - started
+        stored = await count_replies(client, conversation_id) if conversation_id else None
+
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "rps": len(latencies) / elapsed if elapsed else 0.0,
+        "p50_ms": statistics.median(latencies) * 1000 if latencies else 0.0,
+        "p95_ms": latencies[int(len(latencies) * 0.95) - 1] * 1000 if latencies else 0.0,
+        "lost_turns": len(latencies) - stored if stored is not None else None,
+    }
+
+async def count_replies(client: httpx.AsyncClient, conversation_id: str) -> int:
+    """Assistant messages stored in a conversation; one per successful request if no turn was lost"""
+    response = await client.get(f"/api/chat/conversations/{conversation_id}")
+    response.raise_for_status()
+    return sum(1 for message in response.json()["messages"] if message["role"] == "assistant")
+
+def start_server(workers: int, port: int) -> subprocess.Popen:
+    """Start the backend in production mode"""
+    return subprocess.Popen(
+        [sys.executable, "main.py", "--production", "--workers", str(workers), "--port", str(port)],
+        cwd=ROOT,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL
+    )
+
+def print_result(label: str, result: dict, baseline: Optional[float] = None):
+    scaling = f"   x{result['rps'] / baseline:.2f}" if baseline else ""
+    lost = f"   {result['lost_turns']} lost turns" if result["lost_turns"] is not None else ""
+    print(
+        f"{label:<12} {result['rps']:8.1f} req/s   p50 {result['p50_ms']:7.1f} ms   "
+        f"p95 {result['p95_ms']:7.1f} ms   {result['requests']} ok / {result['errors']} errors{scaling}{lost}"
+    )
+
+async def main():
+    parser = argparse.ArgumentParser(description="Load test the Ask Rumi Backend")
+    parser.add_argument("--url", help="Test an already running server instead of starting one")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4], help="Worker counts to compare")
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument(
+        "--path",
+        help="Endpoint to hit (default /api/chat/ask-rumi/debug, which exercises analysis and retrieval "
+             "without the LLM, or /api/chat/ask-rumi with --shared-conversation)"
+    )
+    parser.add_argument(
+        "--shared-conversation",
+        action="store_true",
+        help="Send every request in one conversation to exercise cross-worker contention"
+    )
+    parser.add_argument("--model", default="gemma3:270m")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds per run")
+    args = parser.parse_args()
+    path = args.path or ("/api/chat/ask-rumi" if args.shared_conversation else "/api/chat/ask-rumi/debug")
+
+    def conversation_id() -> Optional[str]:
+        return f"load_{uuid.uuid4().hex[:12]}" if args.shared_conversation else None
+
+    print(f"Load test: POST {path}, {args.concurrency} concurrent clients, {args.duration}s per run")
+
+    if args.url:
+        await wait_until_ready(args.url)
+        result = await run_load(args.url, path, args.model, args.concurrency, args.duration, conversation_id())
+        print_result("server", result)
+        return
+
+    baseline = None
+    for workers in args.workers:
+        server = start_server(workers, args.port)
+        base_url = f"http://127.0.0.1:{args.port}"
+        try:
+            await wait_until_ready(base_url)
+            result = await run_load(base_url, path, args.model, args.concurrency, args.duration, conversation_id())
+        finally:
+            server.terminate()
+            server.wait(timeout=30)
+        baseline = baseline or result["rps"]
+        print_result(f"{workers} worker(s)", result, baseline)
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,168 @@
+"""
+Pre-generate answers to common questions.
+Answers the questions listed in the knowledge base (`user_questions`,
+`query_intent`) with the local model through the same analysis, retrieval and
+prompts as ask-rumi, and stores them in data/precomputed_answers.json, which
+the server reloads on change and serves for close matches.
+
+Each answer is saved as soon as it is generated, so an interrupted or failed
+run picks up where it stopped; already answered questions are skipped unless
+--force is given. Meant to run off-peak, e.g. from cron with --window.
+
+Examples:
+    python scripts/pregenerate_answers.py --model phi3-mini
+    python scripts/pregenerate_answers.py --concurrency 2 --window 01:00-06:00
+    python scripts/pregenerate_answers.py --force --question "What is wisdom?"
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+from datetime import datetime, time as clock
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+os.chdir(ROOT)
+
+from core.local_runner import InferenceRequest, get_local_runner
+from core.persistence import atomic_write_json
+from services.answer_store import ANSWER_STORE_PATH, common_questions, tokens
+from services.behavior_config import get_behavior_config
+from services.conversation_layer import ConversationLayer
+from services.knowledge_loader import get_knowledge_base
+from services.query_analyzer import get_query_analyzer
+from services.quote_retriever import get_quote_retriever
+from services.rumi_responder import get_rumi_responder
+
+def parse_window(value: str) -> Tuple[clock, clock]:
+    start, end = value.split("-")
+    return clock.fromisoformat(start), clock.fromisoformat(end)
+
+def in_window(window: Optional[Tuple[clock, clock]]) -> bool:
+    """Whether now is inside the off-peak window (which may wrap past midnight)"""
+    if window is None:
+        return True
+    now, (start, end) = datetime.now().time(), window
+    return start <= now < end if start <= end else now >= start or now < end
+
+class AnswerFile:
+    """The answer store file, rewritten atomically after every new answer"""
+
+    def __init__(self, path: Path):
+        self.path = path
+        data = json.loads(path.read_text(encoding="utf-8")) if path.exists() else {}
+        self.answers: Dict[frozenset, Dict[str, Any]] = {
+            tokens(entry["question"]): entry for entry in data.get("answers", []) if entry.get("answer")
+        }
+
+    def has(self, question: str) -> bool:
+        return tokens(question) in self.answers
+
+    def add(self, entry: Dict[str, Any]):
+        self.answers[tokens(entry["question"])] = entry
+        atomic_write_json(self.path, {"answers": list(self.answers.values())}, indent=4, ensure_ascii=False)
+
+async def generate_answer(question: str, model: str) -> Dict[str, Any]:
+    """Answer one question the way ask-rumi would, without conversation history"""
+    behavior = get_behavior_config().snapshot()
+    responder = get_rumi_responder()
+    layer = ConversationLayer()
+    needs_empathy = layer.needs_empathetic_support(question)
+    use_rumi_wisdom = layer.should_use_rumi_wisdom(question)
+
+    intent = get_query_analyzer().analyze(question)
+    if needs_empathy:
+        mode, max_tokens = "empathetic", behavior.max_tokens_empathetic
+        quotes = get_quote_retriever().retrieve(intent, max_quotes=behavior.max_quotes_for_empathetic)
+        prompt = responder.generate_empathetic_prompt(question, quotes or None, behavior=behavior)
+    elif use_rumi_wisdom:
+        mode, max_tokens = "wisdom", behavior.max_tokens_wisdom
+        quotes = get_quote_retriever().retrieve(intent, max_quotes=behavior.max_quotes_retrieved)
+        prompt = responder.generate_wisdom_prompt(question, quotes, intent, behavior=behavior)
+    else:
+        mode, max_tokens, quotes = "casual", behavior.max_tokens_casual, []
+        prompt = responder.generate_casual_prompt(question, behavior=behavior)
+
+    response = await get_local_runner().run_inference(InferenceRequest(
+        model=model,
+        prompt=prompt,
+        temperature=behavior.temperature,
+        max_tokens=max_tokens,
+        max_words=responder.response_word_limit(behavior)
+    ))
+    if not response.success:
+        raise RuntimeError(response.error or "inference failed")
+    answer = responder.post_process_response(response.response, behavior)
+    if not answer:
+        raise RuntimeError("empty answer")
+
+    return {
+        "question": question,
+        "answer": answer,
+        "mode": mode,
+        "model": model,
+        "quotes": [
+            {key: quote.get(key, "") for key in ("id", "source_ref", "primary_theme")}
+            for quote in quotes
+        ],
+        "generated_at": datetime.now().isoformat()
+    }
+
+async def main():
+    parser = argparse.ArgumentParser(description="Pre-generate answers to the knowledge base's common questions")
+    parser.add_argument("--model", default="phi3-mini")
+    parser.add_argument("--concurrency", type=int, default=2)
+    parser.add_argument("--retries", type=int, default=2, help="Extra attempts per question")
+    parser.add_argument("--window", type=parse_window, help="Only start questions between HH:MM-HH:MM")
+    parser.add_argument("--force", action="store_true", help="Regenerate questions that already have answers")
+    parser.add_argument("--question", action="append", help="Answer these questions instead of the knowledge base's")
+    parser.add_argument("--output", default=ANSWER_STORE_PATH)
+    args = parser.parse_args()
+
+    if not in_window(args.window):
+        print("Outside the off-peak window, nothing to do")
+        return
+
+    store = AnswerFile(Path(args.output))
+    questions = args.question or common_questions(get_knowledge_base().get_all_quotes())
+    pending = [q for q in questions if args.force or not store.has(q)]
+    print(f"{len(questions)} questions, {len(questions) - len(pending)} already answered, {len(pending)} to generate with {args.model}")
+
+    queue: asyncio.Queue = asyncio.Queue()
+    for question in pending:
+        queue.put_nowait(question)
+    failed: List[str] = []
+
+    async def worker():
+        while not queue.empty() and in_window(args.window):
+            question = queue.get_nowait()
+            for attempt in range(args.retries + 1):
+                try:
+                    entry = await generate_answer(question, args.model)
+                    store.add(entry)
+                    print(f"  [{entry['mode']}] {question}")
+                    break
+                except Exception as e:
+                    print(f"  attempt {attempt + 1} failed for {question!r}: {e}")
+                    await asyncio.sleep(2 ** attempt)
+            else:
+                failed.append(question)
+
+    try:
+        await asyncio.gather(*(worker() for _ in range(max(1, args.concurrency))))
+    finally:
+        await get_local_runner().close()
+
+    if not queue.empty():
+        print(f"Off-peak window closed, {queue.qsize()} questions left for the next run")
+    if failed:
+        print(f"{len(failed)} questions failed and will be retried on the next run")
+        sys.exit(1)
+    print(f"Wrote {store.path} ({len(store.answers)} answers)")
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,145 @@
+"""
+Answer Store - Serve pre-generated answers to common questions
+The knowledge base lists the questions people are likely to ask
+(`user_questions`, `query_intent`). scripts/pregenerate_answers.py answers them
+offline with the local model and stores the results in
+data/precomputed_answers.json; ask-rumi serves a stored answer directly when a
+query is close enough to its question.
+"""
+
+import logging
+import re
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Mapping, Optional, Tuple
+
+from core.config_store import ConfigStore
+from services.instant_replies import normalize
+
+logger = logging.getLogger(__name__)
+
+ANSWER_STORE_PATH = "data/precomputed_answers.json"
+
+CONTRACTIONS = {
+    "what's": "what is", "whats": "what is", "i'm": "i am", "im": "i am",
+    "don't": "do not", "can't": "can not", "how's": "how is", "who's": "who is"
+}
+
+# Words that carry no meaning for matching; question words stay, they separate "why" from "how"
+STOPWORDS = frozenset({
+    "a", "an", "the", "do", "does", "did", "i", "me", "my", "is", "am", "are",
+    "about", "rumi", "rumi's", "say", "says", "tell", "of", "to", "please", "you"
+})
+
+_TARGETING = re.compile(r"\s*\(.*?\)")
+_NO_TOPIC = re.compile(r"\babout\s*\?$", re.IGNORECASE)
+
+def tokens(text: str) -> frozenset:
+    """Content words of a question: "What's Rumi's view of love?" -> {what, view, love}"""
+    words = []
+    for word in normalize(text).split():
+        words.extend(CONTRACTIONS.get(word, word).split())
+    return frozenset(word for word in words if word not in STOPWORDS)
+
+def clean_question(question: str) -> Optional[str]:
+    """A knowledge base question without its "(Targeting ...)" note, or None if it has no topic"""
+    question = _TARGETING.sub("", question).replace(".?", "?").strip()
+    if not question or _NO_TOPIC.search(question):
+        return None
+    return question
+
+def common_questions(quotes: List[Dict[str, Any]]) -> List[str]:
+    """The distinct questions the knowledge base expects, most frequent first"""
+    counts: Dict[str, int] = defaultdict(int)
+    spelling: Dict[frozenset, str] = {}
+    for quote in quotes:
+        for raw in quote.get("user_questions", []) + quote.get("query_intent", []):
+            question = clean_question(raw)
+            if question is None:
+                continue
+            key = tokens(question)
+            spelling.setdefault(key, question)
+            counts[key] += 1
+    return [spelling[key] for key in sorted(counts, key=counts.get, reverse=True)]
+
+@dataclass(frozen=True)
+class AnswerPolicy:
+    """The `precomputed_answers` section of the behavior config"""
+    enabled: bool = True
+    # Jaccard similarity of content words needed to serve a stored answer
+    min_similarity: float = 0.75
+
+    @classmethod
+    def from_config(cls, raw: Optional[Mapping[str, Any]]) -> "AnswerPolicy":
+        raw = raw or {}
+        return cls(
+            enabled=bool(raw.get("enabled", cls.enabled)),
+            min_similarity=float(raw.get("min_similarity", cls.min_similarity))
+        )
+
+@dataclass(frozen=True)
+class AnswerMatch:
+    """A stored answer and how closely its question matched the query"""
+    entry: Mapping[str, Any]
+    similarity: float
+
+@dataclass(frozen=True)
+class AnswerIndex:
+    """Stored answers with an inverted index from content word to entries"""
+    entries: Tuple[Mapping[str, Any], ...] = ()
+    keys: Tuple[frozenset, ...] = ()
+    postings: Dict[str, Tuple[int, ...]] = field(default_factory=dict)
+
+    @classmethod
+    def parse(cls, raw: Mapping[str, Any]) -> "AnswerIndex":
+        entries = tuple(entry for entry in raw.get("answers", ()) if entry.get("answer"))
+        keys = tuple(tokens(entry["question"]) for entry in entries)
+        postings: Dict[str, List[int]] = defaultdict(list)
+        for i, key in enumerate(keys):
+            for word in key:
+                postings[word].append(i)
+        return cls(entries, keys, {word: tuple(ids) for word, ids in postings.items()})
+
+    def lookup(self, query: str, mode: str, min_similarity: float) -> Optional[AnswerMatch]:
+        """The stored answer in `mode` whose question is most similar to `query`"""
+        query_key = tokens(query)
+        candidates = {i for word in query_key for i in self.postings.get(word, ())}
+        best: Optional[AnswerMatch] = None
+        for i in candidates:
+            if self.entries[i].get("mode") != mode:
+                continue
+            key = self.keys[i]
+            similarity = len(query_key & key) / len(query_key | key)
+            if similarity >= min_similarity and (best is None or similarity > best.similarity):
+                best = AnswerMatch(self.entries[i], similarity)
+        return best
+
+class AnswerStore:
+    """Pre-generated answers, reloaded when the batch job rewrites the file"""
+
+    def __init__(self, path: str = ANSWER_STORE_PATH):
+        self.store: ConfigStore[AnswerIndex] = ConfigStore(
+            path,
+            parse=AnswerIndex.parse,
+            default=lambda: {"answers": []},
+            indent=4,
+            ensure_ascii=False
+        )
+
+    def lookup(self, query: str, mode: str, policy: AnswerPolicy) -> Optional[AnswerMatch]:
+        if not policy.enabled:
+            return None
+        return self.store.snapshot().data.lookup(query, mode, policy.min_similarity)
+
+    def count(self) -> int:
+        return len(self.store.snapshot().data.entries)
+
+# Global instance
+_store_instance = None
+
+def get_answer_store() -> AnswerStore:
+    """Get global answer store instance"""
+    global _store_instance
+    if _store_instance is None:
+        _store_instance = AnswerStore()
+    return _store_instance
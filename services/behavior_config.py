@@ -4,18 +4,128 @@ Loads and saves settings from JSON
 """
 
 import json
-from typing import Dict, Any
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Dict, Any, Mapping
 from pathlib import Path
 import logging
 
+from core.config_store import freeze, thaw
+from core.persistence import get_persistence_manager
+from services.model_router import RoutingPolicy
+from services.answer_store import AnswerPolicy
+
 logger = logging.getLogger(__name__)
 
+_MISSING = object()
+
+@dataclass(frozen=True)
+class BehaviorSnapshot:
+    """One immutable version of the behavior config with the hot settings precomputed"""
+    version: int
+    raw: Mapping[str, Any]
+    conversation_history_depth: int
+    max_tokens_wisdom: int
+    max_tokens_empathetic: int
+    max_tokens_casual: int
+    temperature: float
+    max_quotes_retrieved: int
+    max_quotes_for_empathetic: int
+    model_routing: RoutingPolicy
+    instant_replies: bool
+    precomputed_answers: AnswerPolicy
+    _lookups: Dict[str, Any] = field(default_factory=dict, repr=False, compare=False)
+    
+    @classmethod
+    def build(cls, config: Dict[str, Any], version: int) -> "BehaviorSnapshot":
+        """Freeze a config dict and resolve its typed fields"""
+        raw = freeze(config)
+        return cls(
+            version=version,
+            raw=raw,
+            conversation_history_depth=int(raw.get('conversation_history_depth', 2)),
+            max_tokens_wisdom=int(raw.get('max_tokens_wisdom', 200)),
+            max_tokens_empathetic=int(raw.get('max_tokens_empathetic', 220)),
+            max_tokens_casual=int(raw.get('max_tokens_casual', 80)),
+            temperature=float(raw.get('temperature', 0.8)),
+            max_quotes_retrieved=int(raw.get('max_quotes_retrieved', 3)),
+            max_quotes_for_empathetic=int(raw.get('max_quotes_for_empathetic', 2)),
+            model_routing=RoutingPolicy.from_config(raw.get('model_routing')),
+            instant_replies=bool((raw.get('instant_replies') or {}).get('enabled', True)),
+            precomputed_answers=AnswerPolicy.from_config(raw.get('precomputed_answers'))
+        )
+    
+    def get(self, key: str, default=None):
+        """Get a (read-only) value by dotted key; each key is resolved once per version"""
+        value = self._lookups.get(key, _MISSING)
+        if value is _MISSING:
+            value = self.raw
+            for k in key.split('.'):
+                if isinstance(value, Mapping) and k in value:
+                    value = value[k]
+                else:
+                    value = _MISSING
+                    break
+            self._lookups[key] = value
+        return default if value is _MISSING else value
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """Return the config as a mutable deep copy"""
+        return thaw(self.raw)
+
 class BehaviorConfig:
     """Manage LLM behavior configuration from JSON"""
     
+    # Seconds between checks for changes written by other workers
+    RELOAD_CHECK_INTERVAL = 1.0
+    
     def __init__(self, config_path: str = "data/llm_behavior_config.json"):
         self.config_path = Path(config_path)
+        self._mtime = self._file_mtime()
+        self._last_reload_check = time.monotonic()
         self.config = self.load()
+        self._lock = threading.Lock()
+        self._snapshot = BehaviorSnapshot.build(self.config, version=1)
+    
+    def _file_mtime(self):
+        try:
+            return self.config_path.stat().st_mtime
+        except OSError:
+            return None
+    
+    def reload_if_changed(self):
+        """Reload the config if another worker process has rewritten it"""
+        now = time.monotonic()
+        if now - self._last_reload_check < self.RELOAD_CHECK_INTERVAL:
+            return
+        self._last_reload_check = now
+        
+        # Our own save has not reached the disk yet; the file is older than memory
+        if get_persistence_manager().is_pending(self.config_path):
+            return
+        mtime = self._file_mtime()
+        if mtime is None or mtime == self._mtime:
+            return
+        try:
+            with open(self.config_path, 'r') as f:
+                config = json.load(f)
+            with self._lock:
+                self.config = config
+                self._snapshot = BehaviorSnapshot.build(config, version=self._snapshot.version + 1)
+            self._mtime = mtime
+            logger.info(f"Reloaded behavior config (version {self._snapshot.version})")
+        except Exception as e:
+            logger.error(f"Failed to reload behavior config: {e}")
+    
+    @property
+    def version(self) -> int:
+        """Bumped on every change so dependants can rebuild derived state"""
+        return self._snapshot.version
+    
+    def snapshot(self) -> BehaviorSnapshot:
+        """The current config; take one per request so all settings agree"""
+        return self._snapshot
     
     def load(self) -> Dict[str, Any]:
         """Load configuration from JSON file"""
@@ -31,25 +141,26 @@ class BehaviorConfig:
             return self.default_config()
     
     def save(self) -> bool:
-        """Save current configuration to JSON file"""
+        """Save current configuration to JSON file (debounced, atomic)"""
         try:
-            with open(self.config_path, 'w') as f:
-                json.dump(self.config, f, indent=4)
+            get_persistence_manager().save_json(
+                self.config_path,
+                lambda: self.config,
+                indent=4,
+                on_written=self._on_written
+            )
             return True
         except Exception as e:
             logger.error(f"Error saving config: {e}")
             return False
     
+    def _on_written(self, path: Path):
+        # Our own write must not be picked up as an external change
+        self._mtime = self._file_mtime()
+    
     def get(self, key: str, default=None):
         """Get a configuration value"""
-        keys = key.split('.')
-        value = self.config
-        for k in keys:
-            if isinstance(value, dict) and k in value:
-                value = value[k]
-            else:
-                return default
-        return value
+        return self._snapshot.get(key, default)
     
     def update(self, updates: Dict[str, Any]) -> bool:
         """Update configuration values with deep merge support"""
@@ -63,7 +174,9 @@ class BehaviorConfig:
                     result[key] = value
             return result
         
-        self.config = deep_merge(self.config, updates)
+        with self._lock:
+            self.config = deep_merge(self.config, updates)
+            self._snapshot = BehaviorSnapshot.build(self.config, version=self._snapshot.version + 1)
         return self.save()
     
     def default_config(self) -> Dict[str, Any]:
@@ -76,6 +189,21 @@ class BehaviorConfig:
             "temperature": 0.8,
             "max_quotes_retrieved": 3,
             "max_quotes_for_empathetic": 2,
+            "model_routing": {
+                "enabled": True,
+                "fast_model": "gemma3:270m",
+                "fast_modes": ["casual"],
+                "route_simple": True,
+                "max_simple_words": 6,
+                "max_queue_wait": 5.0
+            },
+            "instant_replies": {
+                "enabled": True
+            },
+            "precomputed_answers": {
+                "enabled": True,
+                "min_similarity": 0.75
+            },
             "response_types": {
                 "casual": {
                     "max_tokens": 80,
@@ -103,8 +231,8 @@ class BehaviorConfig:
         }
     
     def to_dict(self) -> Dict[str, Any]:
-        """Return full config as dictionary"""
-        return self.config.copy()
+        """Return full config as a deep copy"""
+        return self._snapshot.to_dict()
 
 # Global instance
 _behavior_config = None
@@ -114,5 +242,6 @@ def get_behavior_config() -> BehaviorConfig:
     global _behavior_config
     if _behavior_config is None:
         _behavior_config = BehaviorConfig()
+    _behavior_config.reload_if_changed()
     return _behavior_config
 
@@ -0,0 +1,117 @@
+"""
+Instant Replies - Answer trivial messages without calling a model
+Messages that are nothing but a greeting, thanks or goodbye are answered from
+a pool of varied replies generated offline (scripts/generate_instant_replies.py)
+and stored in data/instant_replies.json.
+"""
+
+import logging
+import random
+import re
+from dataclasses import dataclass, field
+from typing import Any, Dict, Mapping, Optional, Tuple
+
+from core.config_store import ConfigStore
+
+logger = logging.getLogger(__name__)
+
+INSTANT_REPLIES_PATH = "data/instant_replies.json"
+
+# Longer messages are never trivial, so they skip normalization entirely
+MAX_MESSAGE_LENGTH = 40
+
+_NON_WORD = re.compile(r"[^\w\s']+")
+
+def normalize(message: str) -> str:
+    """Lowercase and drop punctuation and emoji: "Hi, Rumi!! 👋" -> "hi rumi" """
+    return " ".join(_NON_WORD.sub(" ", message.lower().replace("’", "'")).split())
+
+@dataclass(frozen=True)
+class InstantReplyPool:
+    """Parsed instant replies: trigger phrase -> category, and the replies per category"""
+    phrases: Dict[str, str] = field(default_factory=dict)
+    replies: Dict[str, Tuple[str, ...]] = field(default_factory=dict)
+    filler_words: frozenset = frozenset()
+    model: Optional[str] = None
+
+    @classmethod
+    def parse(cls, raw: Mapping[str, Any]) -> "InstantReplyPool":
+        phrases: Dict[str, str] = {}
+        replies: Dict[str, Tuple[str, ...]] = {}
+        for category, entry in (raw.get("categories") or {}).items():
+            pool = tuple(reply for reply in entry.get("replies", ()) if reply)
+            if not pool:
+                continue
+            replies[category] = pool
+            for phrase in entry.get("phrases", ()):
+                phrases[normalize(phrase)] = category
+        return cls(
+            phrases=phrases,
+            replies=replies,
+            filler_words=frozenset(normalize(word) for word in raw.get("filler_words", ())),
+            model=raw.get("model")
+        )
+
+    def match(self, message: str) -> Optional[str]:
+        """Category of a message that is only a trigger phrase, plus trailing filler ("thanks so much rumi")"""
+        if len(message) > MAX_MESSAGE_LENGTH:
+            return None
+        words = normalize(message).split()
+        while words:
+            category = self.phrases.get(" ".join(words))
+            if category is not None:
+                return category
+            if words[-1] not in self.filler_words:
+                return None
+            words.pop()
+        return None
+
+@dataclass(frozen=True)
+class InstantReply:
+    """A reply served from the pool"""
+    category: str
+    text: str
+
+class InstantResponder:
+    """
+    Serve trivial messages from the pre-generated pool
+
+    Only whole-message greetings match - a narrower test than
+    QueryAnalyzer.is_simple, so "hi, I feel lost" still reaches the model.
+    Matching is a dict lookup on the normalized message.
+    """
+
+    def __init__(self, path: str = INSTANT_REPLIES_PATH):
+        self.store: ConfigStore[InstantReplyPool] = ConfigStore(path, parse=InstantReplyPool.parse, indent=4, ensure_ascii=False)
+        self._last: Dict[str, str] = {}
+
+    def reply(self, message: str) -> Optional[InstantReply]:
+        """A reply for `message`, or None if it needs a real answer"""
+        pool = self.store.snapshot().data
+        category = pool.match(message)
+        if category is None:
+            return None
+        choices = pool.replies[category]
+        # Vary the reply, never repeating the previous one for a category
+        previous = self._last.get(category)
+        text = random.choice([c for c in choices if c != previous] or choices)
+        self._last[category] = text
+        return InstantReply(category, text)
+
+    def stats(self) -> Dict[str, Any]:
+        pool = self.store.snapshot().data
+        return {
+            "model": pool.model,
+            "phrases": len(pool.phrases),
+            "replies": {category: len(replies) for category, replies in pool.replies.items()}
+        }
+
+# Global instance
+_responder_instance = None
+
+def get_instant_responder() -> InstantResponder:
+    """Get global instant responder instance"""
+    global _responder_instance
+    if _responder_instance is None:
+        _responder_instance = InstantResponder()
+    return _responder_instance
@@ -0,0 +1,103 @@
+"""
+Model Router - Cascade between a large and a small fast model
+Short casual replies go to the small model instead of queueing behind long
+wisdom generations, and every mode falls back to it when the large model's
+queue gets too deep.
+"""
+
+import logging
+from dataclasses import dataclass
+from typing import Any, Mapping, Optional, Tuple
+
+from core.deadline import remaining_time
+from core.metrics import MODEL_ROUTES
+
+logger = logging.getLogger(__name__)
+
+@dataclass(frozen=True)
+class RoutingPolicy:
+    """The `model_routing` section of the behavior config"""
+    enabled: bool = True
+    fast_model: str = "gemma3:270m"
+    fast_modes: Tuple[str, ...] = ("casual",)
+    # Simple messages (greetings, introductions) also go to the fast model,
+    # except in empathetic mode where the reply needs the larger model
+    route_simple: bool = True
+    # ...as long as they are this short: "I am struggling with forgiveness,
+    # what does Rumi say?" counts as simple ("i am") but needs the large model
+    max_simple_words: int = 6
+    # Seconds of estimated queue wait on the large model before degrading
+    max_queue_wait: float = 5.0
+
+    @classmethod
+    def from_config(cls, raw: Optional[Mapping[str, Any]]) -> "RoutingPolicy":
+        raw = raw or {}
+        return cls(
+            enabled=bool(raw.get("enabled", cls.enabled)),
+            fast_model=str(raw.get("fast_model", cls.fast_model)),
+            fast_modes=tuple(raw.get("fast_modes", cls.fast_modes)),
+            route_simple=bool(raw.get("route_simple", cls.route_simple)),
+            max_simple_words=int(raw.get("max_simple_words", cls.max_simple_words)),
+            max_queue_wait=float(raw.get("max_queue_wait", cls.max_queue_wait))
+        )
+
+@dataclass(frozen=True)
+class RoutingDecision:
+    """The model chosen for a reply and why"""
+    model: str
+    reason: str  # "requested", "fast_mode", "simple", "degraded"
+    estimated_wait: float = 0.0
+
+class ModelRouter:
+    """Choose the model for an ask-rumi reply"""
+
+    async def choose(
+        self,
+        requested: str,
+        mode: str,
+        policy: RoutingPolicy,
+        is_simple: bool = False,
+        message: str = ""
+    ) -> RoutingDecision:
+        """Model for a reply in `mode` to `message`, given the model the client asked for"""
+        short = len(message.split()) <= policy.max_simple_words
+        decision = await self._decide(requested, mode, policy, is_simple and short)
+        MODEL_ROUTES.inc(model=decision.model, reason=decision.reason)
+        if decision.reason == "degraded":
+            logger.info(
+                f"Degrading {mode} reply from {requested} to {decision.model}: "
+                f"estimated queue wait {decision.estimated_wait:.1f}s"
+            )
+        return decision
+
+    async def _decide(self, requested: str, mode: str, policy: RoutingPolicy, is_simple: bool) -> RoutingDecision:
+        from core.local_runner import get_local_runner
+
+        if not policy.enabled or requested == policy.fast_model:
+            return RoutingDecision(requested, "requested")
+
+        runner = get_local_runner()
+        wait = runner.estimated_wait(requested)
+        if mode in policy.fast_modes:
+            reason = "fast_mode"
+        elif policy.route_simple and is_simple and mode != "empathetic":
+            reason = "simple"
+        elif wait > remaining_time(policy.max_queue_wait) and wait > runner.estimated_wait(policy.fast_model):
+            # The large model's queue is too deep, or deeper than the request has time for
+            reason = "degraded"
+        else:
+            return RoutingDecision(requested, "requested", wait)
+
+        if not await runner.is_model_available(policy.fast_model):
+            return RoutingDecision(requested, "requested", wait)
+        return RoutingDecision(policy.fast_model, reason, wait)
+
+# Global instance
+_router_instance = None
+
+def get_model_router() -> ModelRouter:
+    """Get global model router instance"""
+    global _router_instance
+    if _router_instance is None:
+        _router_instance = ModelRouter()
+    return _router_instance
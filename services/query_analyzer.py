@@ -5,7 +5,48 @@ Analyze user queries for intent, emotion, and themes
 import re
 from typing import Dict, List, Any
 from dataclasses import dataclass
-from typing import Optional
+from typing import Mapping, Optional
+
+from core.config_store import get_emotion_keywords_store
+from core.tracing import traced
+
+SIMPLE_INDICATORS = re.compile(r"\b(?:" + "|".join(re.escape(indicator) for indicator in [
+    "hi", "hello", "hey", "good morning", "good evening",
+    "my name is", "i'm", "im", "i am",
+    "how are you", "how's it going", "what's up",
+    "thanks", "thank you", "bye", "goodbye"
+]) + r")\b")
+
+# Used when the emotion keywords config does not list an emotion or theme
+DEFAULT_EMOTION_KEYWORDS = {
+    "fear": ["afraid", "scared", "worried", "anxiety", "terrified", "frightened"],
+    "love": ["love", "beloved", "adore", "cherish", "deeply", "heart"],
+    "longing": ["miss", "long", "yearn", "crave", "ache", "homesick"],
+    "sadness": ["sad", "depressed", "down", "melancholy", "sorrow", "grief"],
+    "joy": ["happy", "joy", "ecstatic", "delighted", "bliss", "elated"],
+    "seeking": ["search", "seek", "find", "look", "hunt", "pursue"],
+    "uncertainty": ["lost", "confused", "uncertain", "don't know", "unclear"],
+    "peace": ["calm", "peace", "tranquil", "serene", "still", "quiet"],
+    "wisdom": ["understand", "learn", "wisdom", "know", "realize"],
+    "transformation": ["change", "grow", "evolve", "become", "transform"]
+}
+
+DEFAULT_THEME_KEYWORDS = {
+    "love": ["love", "beloved", "heart", "romance", "relationship", "affection"],
+    "self-discovery": ["self", "identity", "who am i", "finding myself", "true self"],
+    "spirituality": ["soul", "divine", "god", "spiritual", "sacred", "holiness"],
+    "wisdom": ["wisdom", "knowledge", "understand", "learn", "truth"],
+    "purpose": ["purpose", "meaning", "destiny", "why", "reason", "path"],
+    "friendship": ["friend", "companion", "together", "bond", "connection"],
+    "unity": ["one", "unite", "whole", "together", "same", "union"]
+}
+
+def _merge_keywords(defaults: Dict[str, List[str]], configured: Optional[Mapping[str, Any]]) -> Dict[str, List[str]]:
+    """Built-in keywords, with each configured emotion or theme replacing or adding its own list"""
+    merged = dict(defaults)
+    for name, keywords in (configured or {}).items():
+        merged[name] = [keyword.lower() for keyword in keywords if keyword]
+    return merged
 
 @dataclass
 class QueryIntent:
@@ -35,33 +76,24 @@ class QueryAnalyzer:
             ]
         }
         
-        # Emotion keywords
-        self.emotion_keywords = {
-            "fear": ["afraid", "scared", "worried", "anxiety", "terrified", "frightened"],
-            "love": ["love", "beloved", "adore", "cherish", "deeply", "heart"],
-            "longing": ["miss", "long", "yearn", "crave", "ache", "homesick"],
-            "sadness": ["sad", "depressed", "down", "melancholy", "sorrow", "grief"],
-            "joy": ["happy", "joy", "ecstatic", "delighted", "bliss", "elated"],
-            "seeking": ["search", "seek", "find", "look", "hunt", "pursue"],
-            "uncertainty": ["lost", "confused", "uncertain", "don't know", "unclear"],
-            "peace": ["calm", "peace", "tranquil", "serene", "still", "quiet"],
-            "wisdom": ["understand", "learn", "wisdom", "know", "realize"],
-            "transformation": ["change", "grow", "evolve", "become", "transform"]
-        }
-        
-        # Theme keywords
-        self.theme_keywords = {
-            "love": ["love", "beloved", "heart", "romance", "relationship", "affection"],
-            "self-discovery": ["self", "identity", "who am i", "finding myself", "true self"],
-            "spirituality": ["soul", "divine", "god", "spiritual", "sacred", "holiness"],
-            "wisdom": ["wisdom", "knowledge", "understand", "learn", "truth"],
-            "purpose": ["purpose", "meaning", "destiny", "why", "reason", "path"],
-            "friendship": ["friend", "companion", "together", "bond", "connection"],
-            "unity": ["one", "unite", "whole", "together", "same", "union"]
-        }
+        # Built-in keyword tables, extended by the emotion keywords config
+        self.emotion_keywords: Dict[str, List[str]] = dict(DEFAULT_EMOTION_KEYWORDS)
+        self.theme_keywords: Dict[str, List[str]] = dict(DEFAULT_THEME_KEYWORDS)
+        self._keywords_version: Optional[int] = None
     
+    def _refresh_keywords(self):
+        """Rebuild the keyword tables when the emotion keywords config has a new version"""
+        snapshot = get_emotion_keywords_store().snapshot()
+        if snapshot.version == self._keywords_version:
+            return
+        self.emotion_keywords = _merge_keywords(DEFAULT_EMOTION_KEYWORDS, snapshot.data.get("emotion_keywords"))
+        self.theme_keywords = _merge_keywords(DEFAULT_THEME_KEYWORDS, snapshot.data.get("theme_keywords"))
+        self._keywords_version = snapshot.version
+    
+    @traced("QueryAnalyzer.analyze")
     def analyze(self, query: str) -> QueryIntent:
         """Analyze a user query"""
+        self._refresh_keywords()
         query_lower = query.lower()
         
         # Detect intent
@@ -157,17 +189,14 @@ class QueryAnalyzer:
         
         return keywords[:10]  # Return top 10 keywords
     
+    def is_simple(self, query: str) -> bool:
+        """Whether a query is a simple greeting or introduction, without the full analysis"""
+        return self._is_simple_query(query.lower(), query)
+    
     def _is_simple_query(self, query_lower: str, original_query: str) -> bool:
         """Detect if query is simple (greeting, introduction) vs deep (philosophical)"""
-        simple_indicators = [
-            "hi", "hello", "hey", "good morning", "good evening",
-            "my name is", "i'm", "im ", "i am",
-            "how are you", "how's it going", "what's up",
-            "thanks", "thank you", "bye", "goodbye"
-        ]
-        
-        # Check if it's a simple greeting/intro
-        if any(indicator in query_lower for indicator in simple_indicators):
+        # Check if it's a simple greeting/intro (whole words, so "this" is not "hi")
+        if SIMPLE_INDICATORS.search(query_lower):
             return True
         
         # Check query length and structure
@@ -5,6 +5,7 @@ Retrieve relevant quotes based on query intent
 from typing import List, Dict, Any, Tuple
 from services.knowledge_loader import get_knowledge_base
 from services.query_analyzer import QueryIntent
+from core.tracing import traced
 
 class QuoteRetriever:
     """Retrieve relevant quotes from knowledge base"""
@@ -12,6 +13,7 @@ class QuoteRetriever:
     def __init__(self):
         self.kb = get_knowledge_base()
     
+    @traced("QuoteRetriever.retrieve")
     def retrieve(self, intent: QueryIntent, max_quotes: int = 5) -> List[Dict[str, Any]]:
         """
         Retrieve quotes based on query intent
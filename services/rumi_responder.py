@@ -2,10 +2,62 @@
 Generate Rumi-style responses using retrieved quotes
 """
 
-from typing import List, Dict, Any
+from dataclasses import dataclass
+from string import Formatter
+from typing import List, Dict, Any, Optional, Tuple
+from core.metrics import CACHE_HITS, CACHE_MISSES
+from core.tracing import traced
 from services.query_analyzer import QueryIntent
 from services.rumi_config import get_config, RumiConfig
-from services.behavior_config import get_behavior_config
+from services.behavior_config import BehaviorSnapshot, get_behavior_config
+from services.stream_postprocessor import PostProcessingRules, StreamingPostProcessor
+
+class CompiledTemplate:
+    """Prompt template parsed once into literal text and named slots"""
+    
+    def __init__(self, source: str):
+        self.source = source
+        self._parts: List[str] = []
+        self._slots: List[Tuple[int, str]] = []
+        self._simple = True
+        
+        for literal, field, spec, conversion in Formatter().parse(source):
+            if literal:
+                self._parts.append(literal)
+            if field is None:
+                continue
+            if spec or conversion or not field.isidentifier():
+                # Attribute/index access or format specs - let str.format handle it
+                self._simple = False
+                break
+            self._slots.append((len(self._parts), field))
+            self._parts.append("")
+    
+    def render(self, **values: Any) -> str:
+        """Fill the template slots; raises KeyError on missing fields like str.format"""
+        if not self._simple:
+            return self.source.format(**values)
+        parts = self._parts.copy()
+        for index, name in self._slots:
+            parts[index] = str(values[name])
+        return "".join(parts)
+
+@dataclass(frozen=True)
+class CompiledPrompts:
+    """Prompt templates and formatting options resolved for one config version"""
+    version: int
+    casual_role: str
+    casual: CompiledTemplate
+    empathetic_role: str
+    empathetic: CompiledTemplate
+    empathetic_with_quotes: CompiledTemplate
+    empathetic_no_quotes: CompiledTemplate
+    wisdom: CompiledTemplate
+    quote_header: str
+    quote_max_display: int
+    quote_show_ids: bool
+    quote_show_sources: bool
+    post_processing: PostProcessingRules
 
 class RumiResponder:
     """Generate Rumi-style responses"""
@@ -14,6 +66,8 @@ class RumiResponder:
         """Initialize responder with configuration"""
         self.config = config if config else get_config()
         self.behavior_config = get_behavior_config()
+        self._compiled_prompts: Optional[CompiledPrompts] = None
+        self._quote_cache: Dict[Tuple[str, bool, bool], str] = {}
     
     RUMI_SYSTEM_PROMPT = """You are Jalaluddin Rumi, the 13th-century Persian mystic and poet.
 
@@ -33,23 +87,7 @@ User's Current State:
 
 Respond as Rumi would, weaving these themes into your answer. Be authentic, poetic, and transformative."""
     
-    def generate_casual_prompt(self, query: str, conversation_history: List[str] = None) -> str:
-        """Generate prompt for casual chat (no quotes, just friendly)"""
-        history = ""
-        if conversation_history:
-            history = "\nPrevious messages:\n" + "\n".join(conversation_history[-2:])
-        
-        # Load from config
-        template = self.behavior_config.get('prompt_templates.casual', {})
-        role = template.get('role', 'friendly, approachable person')
-        
-        # Use template from JSON config
-        prompt_template = template.get('prompt_template', '')
-        if prompt_template:
-            return prompt_template.format(role=role, history=history, query=query)
-        
-        # Fallback if no template
-        return f"""You are {role}, engaged in a warm, natural conversation.
+    CASUAL_FALLBACK_TEMPLATE = """You are {role}, engaged in a warm, natural conversation.
 {history}
 
 User just said: "{query}"
@@ -62,25 +100,8 @@ RESPOND NOW with 5-7 complete sentences:
 - Be authentic, engaging, and conversational
 
 Target: 80-180 words. Be natural and varied in your responses."""
-    
-    def generate_empathetic_prompt(self, query: str, quotes: List[Dict[str, Any]] = None, conversation_history: List[str] = None) -> str:
-        """Generate empathetic support prompt for emotional distress"""
-        history = ""
-        if conversation_history:
-            # Only get last message to avoid confusion
-            if len(conversation_history) >= 1:
-                history = f"\nPrevious context: {conversation_history[-1]}\n"
-        
-        # Load from config
-        template = self.behavior_config.get('prompt_templates.empathetic', {})
-        role = template.get('role', 'caring, wise companion speaking to someone in distress')
-        structure = template.get('structure_instructions', '')
-        word_limit = template.get('word_limit', [140, 200])
-        
-        # Format wisdom for natural integration
-        if quotes:
-            quotes_text = self._format_quotes(quotes[:2])
-            wisdom_instruction = f"""They said: "{query}"
+
+    EMPATHETIC_WITH_QUOTES_TEMPLATE = """They said: "{query}"
 
 Respond as a caring, wise companion to someone in distress:
 
@@ -96,8 +117,8 @@ Guidelines:
 - Don't be preachy or dismissive
 - Make them feel heard and understood
 - Total length: 180-280 words"""
-        else:
-            wisdom_instruction = f"""They said: "{query}"
+
+    EMPATHETIC_NO_QUOTES_TEMPLATE = """They said: "{query}"
 
 Respond as a caring, wise companion to someone in distress:
 
@@ -112,19 +133,102 @@ Guidelines:
 - Validate their feelings first
 - Offer perspective without being preachy
 - Total length: 150-220 words"""
-        
-        # Use template from JSON config
-        prompt_template = template.get('prompt_template', '')
-        if prompt_template:
-            return prompt_template.format(role=role, history=history, wisdom_instruction=wisdom_instruction)
-        
-        # Fallback
-        return f"""You are {role}.
+
+    EMPATHETIC_FALLBACK_TEMPLATE = """You are {role}.
 {history}
 CURRENT message you need to respond to:
 {wisdom_instruction}"""
+
+    WISDOM_FALLBACK_TEMPLATE = """You are Rumi. Someone asks: "{query}"
+
+Your teachings to guide you:
+{quotes_text}
+
+Respond as Rumi would. First engage with them conversationally (2-3 sentences), then naturally weave in your teachings from above. Make it complete and rich (150-250 words)."""
+
+    NO_QUOTES_TEXT = "No specific wisdom for this, but respond as Rumi would."
+
+    # Upper bound on cached quote snippets before the cache is reset
+    MAX_QUOTE_CACHE_SIZE = 2048
+    
+    def _compiled(self, behavior: Optional[BehaviorSnapshot] = None) -> "CompiledPrompts":
+        """Get compiled prompts for a config snapshot (the current one by default)"""
+        behavior = behavior or self.behavior_config.snapshot()
+        compiled = self._compiled_prompts
+        if compiled is not None and compiled.version == behavior.version:
+            return compiled
+        
+        CACHE_MISSES.inc(cache="compiled_prompts")
+        compiled = self._compile_prompts(behavior)
+        # A request still holding an older snapshot must not replace a newer build
+        if self._compiled_prompts is None or behavior.version > self._compiled_prompts.version:
+            # Formatting options may have changed, so cached snippets are stale
+            self._quote_cache.clear()
+            self._compiled_prompts = compiled
+        return compiled
     
-    def generate_wisdom_prompt(self, query: str, quotes: List[Dict[str, Any]], intent: QueryIntent, conversation_history: List[str] = None) -> str:
+    def _compile_prompts(self, behavior: BehaviorSnapshot) -> "CompiledPrompts":
+        """Resolve all template settings once and pre-parse the templates"""
+        templates = behavior.get('prompt_templates', {}) or {}
+        casual = templates.get('casual', {}) or {}
+        empathetic = templates.get('empathetic', {}) or {}
+        wisdom = templates.get('wisdom', {}) or {}
+        formatting = behavior.get('quote_formatting', {}) or {}
+        
+        return CompiledPrompts(
+            version=behavior.version,
+            casual_role=casual.get('role', 'friendly, approachable person'),
+            casual=CompiledTemplate(casual.get('prompt_template', '') or self.CASUAL_FALLBACK_TEMPLATE),
+            empathetic_role=empathetic.get('role', 'caring, wise companion speaking to someone in distress'),
+            empathetic=CompiledTemplate(empathetic.get('prompt_template', '') or self.EMPATHETIC_FALLBACK_TEMPLATE),
+            empathetic_with_quotes=CompiledTemplate(self.EMPATHETIC_WITH_QUOTES_TEMPLATE),
+            empathetic_no_quotes=CompiledTemplate(self.EMPATHETIC_NO_QUOTES_TEMPLATE),
+            wisdom=CompiledTemplate(wisdom.get('prompt_template', '') or self.WISDOM_FALLBACK_TEMPLATE),
+            quote_header=formatting.get('header', 'YOUR TEACHINGS (use these directly):'),
+            quote_max_display=formatting.get('max_display', 3),
+            quote_show_ids=formatting.get('show_ids', True),
+            quote_show_sources=formatting.get('show_sources', True),
+            post_processing=PostProcessingRules.from_config(
+                behavior.get('post_processing', {}) or {}
+            )
+        )
+    
+    @traced("RumiResponder.generate_casual_prompt")
+    def generate_casual_prompt(self, query: str, conversation_history: List[str] = None, behavior: Optional[BehaviorSnapshot] = None) -> str:
+        """Generate prompt for casual chat (no quotes, just friendly)"""
+        history = ""
+        if conversation_history:
+            history = "\nPrevious messages:\n" + "\n".join(conversation_history[-2:])
+        
+        compiled = self._compiled(behavior)
+        return compiled.casual.render(role=compiled.casual_role, history=history, query=query)
+    
+    @traced("RumiResponder.generate_empathetic_prompt")
+    def generate_empathetic_prompt(self, query: str, quotes: List[Dict[str, Any]] = None, conversation_history: List[str] = None, behavior: Optional[BehaviorSnapshot] = None) -> str:
+        """Generate empathetic support prompt for emotional distress"""
+        history = ""
+        if conversation_history:
+            # Only get last message to avoid confusion
+            if len(conversation_history) >= 1:
+                history = f"\nPrevious context: {conversation_history[-1]}\n"
+        
+        compiled = self._compiled(behavior)
+        
+        # Format wisdom for natural integration
+        if quotes:
+            quotes_text = self._format_quotes(quotes[:2], compiled)
+            wisdom_instruction = compiled.empathetic_with_quotes.render(query=query, quotes_text=quotes_text)
+        else:
+            wisdom_instruction = compiled.empathetic_no_quotes.render(query=query)
+        
+        return compiled.empathetic.render(
+            role=compiled.empathetic_role,
+            history=history,
+            wisdom_instruction=wisdom_instruction
+        )
+    
+    @traced("RumiResponder.generate_wisdom_prompt")
+    def generate_wisdom_prompt(self, query: str, quotes: List[Dict[str, Any]], intent: QueryIntent, conversation_history: List[str] = None, behavior: Optional[BehaviorSnapshot] = None) -> str:
         """
         Generate conversational prompt for LLM
         
@@ -133,79 +237,55 @@ CURRENT message you need to respond to:
             quotes: Retrieved relevant quotes
             intent: Analyzed query intent
             conversation_history: Previous messages for context
+            behavior: Config snapshot for this request (the current one by default)
             
         Returns:
             Complete conversational prompt for LLM
         """
         # Format quotes as knowledge base
-        quotes_text = self._format_quotes(quotes)
-        
-        # Get emotion context
-        emotion_context = self._format_emotion_context(intent)
+        compiled = self._compiled(behavior)
+        quotes_text = self._format_quotes(quotes, compiled)
         
-        # Build conversation context - LIMIT to avoid confusion
-        history_text = ""
-        if conversation_history and len(conversation_history) > 0:
-            # Only get LAST exchange to avoid confusing context
-            recent = conversation_history[-1:] if len(conversation_history) >= 1 else []
-            if recent:
-                history_text = f"Context from previous message:\n{recent[0]}"
-        
-        # Load from config
-        template = self.behavior_config.get('prompt_templates.wisdom', {})
-        role = template.get('role', 'Rumi')
-        structure = template.get('structure_instructions', '')
-        word_limit = template.get('word_limit', [100, 180])
-        quote_source = template.get('quote_source', 'rumi_knowledge_base.json')
-        
-        # Get guidelines
-        guidelines = self.behavior_config.get('response_guidelines', {})
-        emphasize = guidelines.get('emphasize_current_question', True)
-        ignore_old = guidelines.get('ignore_old_questions', True)
-        
-        # Use template from JSON config
-        prompt_template = template.get('prompt_template', '')
-        if prompt_template:
-            return prompt_template.format(query=query, quotes_text=quotes_text)
-        
-        # Fallback if no template
-        prompt = f"""You are Rumi. Someone asks: "{query}"
-
-Your teachings to guide you:
-{quotes_text}
-
-Respond as Rumi would. First engage with them conversationally (2-3 sentences), then naturally weave in your teachings from above. Make it complete and rich (150-250 words)."""
-        
-        return prompt
+        return compiled.wisdom.render(query=query, quotes_text=quotes_text)
     
-    def _format_quotes(self, quotes: List[Dict[str, Any]]) -> str:
+    def _format_quotes(self, quotes: List[Dict[str, Any]], compiled: Optional["CompiledPrompts"] = None) -> str:
         """Format quotes for prompt - uses config for formatting"""
         if not quotes:
-            return "No specific wisdom for this, but respond as Rumi would."
+            return self.NO_QUOTES_TEXT
         
-        # Load formatting config
-        formatting = self.behavior_config.get('quote_formatting', {})
-        header = formatting.get('header', 'YOUR TEACHINGS (use these directly):')
-        max_display = formatting.get('max_display', 3)
-        show_ids = formatting.get('show_ids', True)
-        show_sources = formatting.get('show_sources', True)
+        compiled = compiled or self._compiled()
         
-        formatted = []
-        formatted.append(header)
-        for i, quote in enumerate(quotes[:max_display], 1):
-            quote_text = quote.get('quote', '')
-            quote_id = quote.get('id', '')
-            source = quote.get('source_ref', '')
-            
-            if show_ids and show_sources:
-                formatted.append(f"{i}. [{quote_id}] {quote_text}\n   Source: {source}")
-            elif show_ids:
-                formatted.append(f"{i}. [{quote_id}] {quote_text}")
-            else:
-                formatted.append(f"{i}. {quote_text}")
+        formatted = [compiled.quote_header]
+        for i, quote in enumerate(quotes[:compiled.quote_max_display], 1):
+            formatted.append(f"{i}. {self._format_quote_snippet(quote, compiled)}")
         
         return "\n".join(formatted)
     
+    def _format_quote_snippet(self, quote: Dict[str, Any], compiled: "CompiledPrompts") -> str:
+        """Format a single quote, cached per quote ID and formatting options"""
+        quote_id = quote.get('id', '')
+        key = (quote_id, compiled.quote_show_ids, compiled.quote_show_sources)
+        if quote_id:
+            snippet = self._quote_cache.get(key)
+            if snippet is not None:
+                CACHE_HITS.inc(cache="quote_snippet")
+                return snippet
+            CACHE_MISSES.inc(cache="quote_snippet")
+        
+        quote_text = quote.get('quote', '')
+        if compiled.quote_show_ids and compiled.quote_show_sources:
+            snippet = f"[{quote_id}] {quote_text}\n   Source: {quote.get('source_ref', '')}"
+        elif compiled.quote_show_ids:
+            snippet = f"[{quote_id}] {quote_text}"
+        else:
+            snippet = quote_text
+        
+        if quote_id:
+            if len(self._quote_cache) >= self.MAX_QUOTE_CACHE_SIZE:
+                self._quote_cache.clear()
+            self._quote_cache[key] = snippet
+        return snippet
+    
     def _format_emotion_context(self, intent: QueryIntent) -> str:
         """Format emotion context for prompt"""
         emotions = intent.emotions
@@ -224,60 +304,23 @@ Respond as Rumi would. First engage with them conversationally (2-3 sentences),
         
         return ", ".join(emotions)
     
-    def post_process_response(self, response: str) -> str:
+    @property
+    def max_response_words(self) -> int:
+        """Word budget applied to responses, also used to stop generation early"""
+        return self.response_word_limit()
+    
+    def response_word_limit(self, behavior: Optional[BehaviorSnapshot] = None) -> int:
+        """Word budget for a config snapshot (the current one by default)"""
+        return self._compiled(behavior).post_processing.max_words
+    
+    def create_post_processor(self, behavior: Optional[BehaviorSnapshot] = None) -> StreamingPostProcessor:
+        """Create an incremental post-processor for a streamed response"""
+        return StreamingPostProcessor(self._compiled(behavior).post_processing)
+    
+    @traced("RumiResponder.post_process_response")
+    def post_process_response(self, response: str, behavior: Optional[BehaviorSnapshot] = None) -> str:
         """Post-process LLM response for quality and conversational flow"""
-        # Load post-processing config
-        post_config = self.behavior_config.get('post_processing', {})
-        markers = post_config.get('markers_to_remove', [])
-        skip_patterns = post_config.get('skip_patterns', [])
-        max_words = post_config.get('max_word_limit', 150)
-        min_words = post_config.get('min_word_limit', 30)
-        trim_to_sentence = post_config.get('trim_to_sentence', True)
-        
-        # Clean up common issues
-        response = response.strip()
-        
-        # Remove any system prompt remnants
-        for marker in markers:
-            if marker in response:
-                parts = response.split(marker)
-                if len(parts) > 1:
-                    response = parts[-1].strip()
-                    break
-        
-        # Remove any remaining prompt artifacts
-        lines = response.split('\n')
-        cleaned_lines = []
-        for line in lines:
-            if not any(skip in line.lower() for skip in skip_patterns):
-                if line.strip() and line.strip() not in ['', '...']:
-                    cleaned_lines.append(line.strip())
-        
-        response = '\n'.join(cleaned_lines).strip()
-        
-        # If response is still empty or just artifacts, give fallback
-        if not response or response == '' or len(response) < min_words:
-            pass
-        
-        # Count words and trim if too long
-        words = response.split()
-        if len(words) > max_words:
-            if trim_to_sentence:
-                # Find a good stopping point at sentence end
-                for i in range(max_words - 30, min(max_words, len(words))):
-                    if i < len(words) and words[i][-1] in '.!?':
-                        response = ' '.join(words[:i+1])
-                        break
-                else:
-                    # No sentence end found, cut at max_words
-                    response = ' '.join(words[:max_words])
-            else:
-                response = ' '.join(words[:max_words])
-        
-        # Remove excessive whitespace but keep single line breaks for paragraph structure
-        response = ' '.join(response.split())
-        
-        return response
+        return self.create_post_processor(behavior).process(response)
 
 # Global instance
 _responder_instance = None
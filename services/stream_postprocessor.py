@@ -0,0 +1,183 @@
+"""
+Incremental post-processing of LLM output
+Cleans a token stream on the fly: marker removal, artifact stripping and
+sentence-aware truncation in a single pass with bounded memory.
+"""
+
+import re
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Pattern
+
+SENTENCE_END = ".!?"
+CLOSING_CHARS = "\"')]”’"
+
+@dataclass(frozen=True)
+class PostProcessingRules:
+    """Post-processing settings compiled once per behavior config version"""
+    marker_pattern: Optional[Pattern]
+    skip_pattern: Optional[Pattern]
+    max_words: int = 150
+    trim_to_sentence: bool = True
+    # Words held back before the limit so truncation can end on a sentence
+    sentence_window: int = 30
+
+    @classmethod
+    def from_config(cls, post_config: Dict[str, Any]) -> "PostProcessingRules":
+        """Build rules from the `post_processing` section of the behavior config"""
+        markers = [m for m in post_config.get('markers_to_remove', []) if m]
+        skip_patterns = [p.lower() for p in post_config.get('skip_patterns', []) if p]
+
+        return cls(
+            marker_pattern=re.compile("|".join(map(re.escape, markers))) if markers else None,
+            skip_pattern=re.compile("|".join(map(re.escape, skip_patterns))) if skip_patterns else None,
+            max_words=post_config.get('max_word_limit', 150),
+            trim_to_sentence=post_config.get('trim_to_sentence', True)
+        )
+
+class StreamingPostProcessor:
+    """
+    Clean LLM output incrementally as tokens arrive
+
+    Text is split into segments at line breaks and sentence ends. Each segment is
+    dropped if it matches a skip pattern, cut after any marker, and its words are
+    counted against the word budget. Once the budget is exceeded the output is
+    trimmed to a sentence end (or the hard limit) and `done` is set so callers can
+    stop generation early.
+
+    Text already returned by `feed` cannot be retracted: a marker seen later only
+    resets the final text returned by `text`/`process`, not previously streamed deltas.
+    """
+
+    # Force a segment break when a line grows this long without a boundary
+    MAX_SEGMENT_CHARS = 2000
+
+    def __init__(self, rules: PostProcessingRules):
+        self.rules = rules
+        self.done = False
+        self._pending = ""
+        self._words: List[str] = []
+        self._tail: List[str] = []
+        self._streamed_any = False
+        self._window_start = (
+            max(rules.max_words - rules.sentence_window, 0)
+            if rules.trim_to_sentence else rules.max_words
+        )
+
+    @property
+    def word_count(self) -> int:
+        """Number of words accepted into the output so far"""
+        return len(self._words) + len(self._tail)
+
+    @property
+    def text(self) -> str:
+        """Cleaned text produced so far"""
+        return " ".join(self._words)
+
+    def feed(self, chunk: str) -> str:
+        """Consume a chunk of generated text and return newly finalized output"""
+        if self.done or not chunk:
+            return ""
+
+        pending = self._pending + chunk
+        scan_from = len(self._pending)
+        start = 0
+        deltas = []
+
+        for i in range(scan_from, len(pending)):
+            ch = pending[i]
+            if ch == "\n" or (ch.isspace() and self._ends_sentence(pending, start, i)):
+                deltas.append(self._accept_segment(pending[start:i]))
+                start = i + 1
+                if self.done:
+                    break
+
+        pending = "" if self.done else pending[start:]
+        if len(pending) > self.MAX_SEGMENT_CHARS:
+            cut = pending.rfind(" ")
+            if cut <= 0:
+                cut = len(pending)
+            deltas.append(self._accept_segment(pending[:cut]))
+            pending = "" if self.done else pending[cut:]
+
+        self._pending = pending
+        return "".join(deltas)
+
+    def finish(self) -> str:
+        """Flush buffered text at the end of the stream"""
+        deltas = []
+        if not self.done and self._pending:
+            deltas.append(self._accept_segment(self._pending))
+        self._pending = ""
+
+        if not self.done and self._tail:
+            deltas.append(self._emit(self._tail))
+            self._tail = []
+        self.done = True
+        return "".join(deltas)
+
+    def process(self, text: str) -> str:
+        """Clean a complete response in one pass"""
+        self.feed(text)
+        self.finish()
+        return self.text
+
+    @staticmethod
+    def _ends_sentence(text: str, start: int, index: int) -> bool:
+        """Check whether the whitespace at `index` follows a sentence end"""
+        j = index - 1
+        while j >= start and text[j] in CLOSING_CHARS:
+            j -= 1
+        return j >= start and text[j] in SENTENCE_END
+
+    def _accept_segment(self, segment: str) -> str:
+        """Filter a complete segment and push its words through the budget"""
+        rules = self.rules
+
+        # Drop everything up to the last prompt marker
+        if rules.marker_pattern is not None:
+            last = None
+            for last in rules.marker_pattern.finditer(segment):
+                pass
+            if last is not None:
+                segment = segment[last.end():]
+                self._words.clear()
+                self._tail.clear()
+
+        stripped = segment.strip()
+        if not stripped or stripped == "...":
+            return ""
+        if rules.skip_pattern is not None and rules.skip_pattern.search(stripped.lower()):
+            return ""
+
+        new_words = []
+        for word in stripped.split():
+            if len(self._words) + len(new_words) < self._window_start:
+                new_words.append(word)
+                continue
+
+            self._tail.append(word)
+            if self._window_start + len(self._tail) > rules.max_words:
+                new_words.extend(self._trim_tail())
+                self._tail = []
+                self.done = True
+                break
+
+        return self._emit(new_words) if new_words else ""
+
+    def _trim_tail(self) -> List[str]:
+        """Pick the held-back words to keep once the budget is exceeded"""
+        limit = self.rules.max_words - self._window_start
+        if self.rules.trim_to_sentence:
+            for i, word in enumerate(self._tail[:limit]):
+                if word[-1] in SENTENCE_END:
+                    return self._tail[:i + 1]
+        return self._tail[:limit]
+
+    def _emit(self, words: List[str]) -> str:
+        """Append words to the output and return them as a stream delta"""
+        self._words.extend(words)
+        delta = " ".join(words)
+        if self._streamed_any:
+            delta = " " + delta
+        self._streamed_any = True
+        return delta
@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# Make the backend packages (core, services, routes) importable from the tests
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
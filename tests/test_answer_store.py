@@ -0,0 +1,42 @@
+import pytest
+
+from services.answer_store import AnswerIndex, clean_question, common_questions, tokens
+
+INDEX = AnswerIndex.parse({"answers": [
+    {"question": "What does Rumi say about love?", "answer": "Love is the bridge.", "mode": "wisdom"},
+    {"question": "How do I find peace?", "answer": "Be still.", "mode": "wisdom"},
+    {"question": "How do I find peace?", "answer": "You are not alone.", "mode": "empathetic"},
+    {"question": "Why do we suffer?", "answer": "", "mode": "wisdom"},
+]})
+
+def test_tokens_keep_content_and_question_words():
+    assert tokens("What's Rumi's view of love?") == frozenset({"what", "view", "love"})
+    assert tokens("Why do I suffer") != tokens("How do I suffer")
+
+def test_exact_question_matches_with_full_similarity():
+    match = INDEX.lookup("what does rumi say about LOVE", "wisdom", 0.75)
+    assert match is not None
+    assert match.entry["answer"] == "Love is the bridge."
+    assert match.similarity == pytest.approx(1.0)
+
+def test_lookup_is_limited_to_the_reply_mode():
+    assert INDEX.lookup("How do I find peace?", "empathetic", 0.75).entry["answer"] == "You are not alone."
+    assert INDEX.lookup("How do I find peace?", "casual", 0.75) is None
+
+def test_below_the_similarity_threshold_nothing_matches():
+    # {how, find, peace, today} against {how, find, peace}: 3/4
+    assert INDEX.lookup("How do I find peace today?", "wisdom", 0.75) is not None
+    assert INDEX.lookup("How do I find peace today?", "wisdom", 0.8) is None
+    assert INDEX.lookup("Tell me a joke", "wisdom", 0.1) is None
+
+def test_entries_without_an_answer_are_not_indexed():
+    assert INDEX.lookup("Why do we suffer?", "wisdom", 0.5) is None
+    assert len(INDEX.entries) == 3
+
+def test_common_questions_are_cleaned_and_ranked_by_frequency():
+    quotes = [
+        {"user_questions": ["How do I find peace? (Targeting anxiety)", "What does Rumi say about?"]},
+        {"user_questions": ["how do i find peace"], "query_intent": ["What is love.?"]},
+    ]
+    assert clean_question("What does Rumi say about?") is None
+    assert common_questions(quotes) == ["How do I find peace?", "What is love?"]
@@ -0,0 +1,69 @@
+import pytest
+
+from core import provider_health
+from core.provider_health import CircuitBreaker, ProviderHealthMonitor
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(provider_health.time, "monotonic", clock)
+    return clock
+
+def test_opens_after_consecutive_failures(clock):
+    breaker = CircuitBreaker(failure_threshold=3, reset_timeout=30.0)
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.state == "closed" and breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == "open"
+    assert not breaker.allow()
+
+def test_success_resets_the_failure_count(clock):
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=30.0)
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    assert breaker.state == "closed"
+
+def test_half_open_after_the_reset_timeout(clock):
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=30.0)
+    breaker.record_failure()
+    clock.now += 29.9
+    assert breaker.state == "open"
+    clock.now += 0.1
+    assert breaker.state == "half_open"
+    assert breaker.allow()
+
+def test_successful_trial_closes_the_circuit(clock):
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=30.0)
+    breaker.record_failure()
+    clock.now += 30.0
+    breaker.record_success()
+    assert breaker.state == "closed"
+    assert breaker.failures == 0
+
+def test_failed_trial_reopens_and_restarts_the_timeout(clock):
+    breaker = CircuitBreaker(failure_threshold=3, reset_timeout=30.0)
+    for _ in range(3):
+        breaker.record_failure()
+    clock.now += 30.0
+    assert breaker.state == "half_open"
+    breaker.record_failure()
+    assert breaker.state == "open"
+    clock.now += 29.0
+    assert breaker.state == "open"
+    clock.now += 1.0
+    assert breaker.state == "half_open"
+
+def test_monitor_shares_one_breaker_per_provider(clock):
+    monitor = ProviderHealthMonitor(failure_threshold=2, reset_timeout=5.0)
+    assert monitor.breaker("ollama") is monitor.breaker("ollama")
+    assert monitor.breaker("ollama").failure_threshold == 2
+    assert monitor.breaker("ollama").reset_timeout == 5.0
@@ -0,0 +1,83 @@
+import multiprocessing
+import threading
+
+import pytest
+
+from core.conversation_store import ConversationStore
+
+def message(i: int) -> dict:
+    return {"role": "user", "content": f"message {i}", "timestamp": None}
+
+@pytest.fixture
+def db_path(tmp_path):
+    return str(tmp_path / "state.db")
+
+def test_append_creates_then_extends_a_conversation(db_path):
+    store = ConversationStore(db_path)
+    first = store.append("conv_1", "phi3-mini", [message(0)])
+    second = store.append("conv_1", "gemma3:270m", [message(1), message(2)])
+    assert [m["content"] for m in second["messages"]] == ["message 0", "message 1", "message 2"]
+    assert second["model"] == "phi3-mini"
+    assert second["created_at"] == first["created_at"]
+    assert store.get("conv_1") == second
+    assert store.list()[0]["message_count"] == 3
+
+def test_concurrent_appends_from_threads_are_never_lost(db_path):
+    store = ConversationStore(db_path)
+
+    def turns(worker: int):
+        for i in range(25):
+            store.append("conv_1", "phi3-mini", [message(worker * 100 + i)])
+
+    threads = [threading.Thread(target=turns, args=(n,)) for n in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    messages = store.get("conv_1")["messages"]
+    assert len(messages) == 200
+    assert len({m["content"] for m in messages}) == 200
+
+def _append_from_worker(db_path: str, worker: int):
+    store = ConversationStore(db_path)
+    for i in range(20):
+        store.append("conv_1", "phi3-mini", [message(worker * 100 + i)])
+
+def test_concurrent_appends_from_worker_processes_are_never_lost(db_path):
+    # Spawned like uvicorn's workers, so no process inherits another's SQLite state
+    context = multiprocessing.get_context("spawn")
+    workers = [context.Process(target=_append_from_worker, args=(db_path, n)) for n in range(4)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join(timeout=60)
+        assert worker.exitcode == 0
+
+    assert len(ConversationStore(db_path).get("conv_1")["messages"]) == 80
+
+def test_clear_empties_the_conversation_and_later_turns_append(db_path):
+    store = ConversationStore(db_path)
+    store.append("conv_1", "phi3-mini", [message(0), message(1)])
+    assert store.clear("conv_1")
+    store.append("conv_1", "phi3-mini", [message(2)])
+    assert [m["content"] for m in store.get("conv_1")["messages"]] == ["message 2"]
+    assert not store.clear("missing")
+
+def test_next_id_is_unique_across_threads(db_path):
+    store = ConversationStore(db_path)
+    ids = []
+    threads = [threading.Thread(target=lambda: ids.extend(store.next_id() for _ in range(20))) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert sorted(ids) == list(range(1, 101))
+
+def test_delete(db_path):
+    store = ConversationStore(db_path)
+    store.append("conv_1", "phi3-mini", [message(0)])
+    assert store.delete("conv_1")
+    assert store.get("conv_1") is None
+    assert not store.delete("conv_1")
+    assert store.count() == 0
@@ -0,0 +1,41 @@
+import math
+
+from core.backends import GenerationBudget
+
+def test_counts_words_split_across_chunks():
+    budget = GenerationBudget(max_words=100)
+    for chunk in ["Lo", "ve is", " the bri", "dge", "\nbetween ", " you"]:
+        budget.update(chunk)
+    assert budget.words == 6
+
+def test_keeps_going_below_the_limit_even_at_a_sentence_end():
+    budget = GenerationBudget(max_words=5)
+    assert not budget.update("One two three.")
+
+def test_stops_at_the_first_sentence_end_past_the_limit():
+    budget = GenerationBudget(max_words=3)
+    assert not budget.update("one two three four")
+    assert not budget.update(" five")
+    assert budget.update(" six.")
+
+def test_sentence_end_may_be_followed_by_closing_quotes():
+    budget = GenerationBudget(max_words=2)
+    assert budget.update('He said "go now."')
+
+def test_stops_after_the_grace_words_without_a_sentence_end():
+    budget = GenerationBudget(max_words=2)
+    words = ["w"] * (2 + GenerationBudget.GRACE_WORDS)
+    assert not budget.update(" ".join(words[:-1]))
+    assert budget.update(" w")
+
+def test_tokens_saved_against_the_word_budget():
+    budget = GenerationBudget(max_words=100)
+    limit = math.ceil((100 + GenerationBudget.GRACE_WORDS) * GenerationBudget.TOKENS_PER_WORD)
+    assert budget.tokens_saved(50) == limit - 50
+    assert budget.tokens_saved(50, max_tokens=10_000) == limit - 50
+
+def test_tokens_saved_capped_by_max_tokens_and_never_negative():
+    budget = GenerationBudget(max_words=100)
+    assert budget.tokens_saved(50, max_tokens=80) == 30
+    assert budget.tokens_saved(500) == 0
+    assert budget.tokens_saved(90, max_tokens=80) == 0
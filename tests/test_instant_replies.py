@@ -0,0 +1,48 @@
+import pytest
+
+from services.instant_replies import MAX_MESSAGE_LENGTH, InstantReplyPool, normalize
+
+POOL = InstantReplyPool.parse({
+    "filler_words": ["Rumi", "there", "so", "much"],
+    "categories": {
+        "greeting": {"phrases": ["hi", "Hello", "good morning"], "replies": ["Welcome, friend."]},
+        "thanks": {"phrases": ["thanks", "thank you"], "replies": ["You are most welcome."]},
+        "farewell": {"phrases": ["bye"], "replies": []}
+    }
+})
+
+def test_normalize_drops_case_punctuation_and_emoji():
+    assert normalize("Hi, Rumi!! 👋") == "hi rumi"
+    assert normalize("  What’s   up?? ") == "what's up"
+
+@pytest.mark.parametrize("message, category", [
+    ("hi", "greeting"),
+    ("Hello!", "greeting"),
+    ("Good morning, Rumi 🌞", "greeting"),
+    ("hi there", "greeting"),
+    ("Thank you so much Rumi!", "thanks"),
+    ("THANKS", "thanks"),
+])
+def test_matches_whole_trigger_phrases_with_trailing_filler(message, category):
+    assert POOL.match(message) == category
+
+@pytest.mark.parametrize("message", [
+    "hi, I feel lost",
+    "thanks for the quote about patience",
+    "there hi",
+    "this",
+    "",
+    "bye",
+])
+def test_everything_else_needs_a_real_answer(message):
+    # "bye" has no replies, so its category is dropped
+    assert POOL.match(message) is None
+
+def test_long_messages_never_match():
+    message = "hi " + "rumi " * (MAX_MESSAGE_LENGTH // 5 + 1)
+    assert len(message) > MAX_MESSAGE_LENGTH
+    assert POOL.match(message) is None
+
+def test_parse_keeps_only_categories_with_replies():
+    assert set(POOL.replies) == {"greeting", "thanks"}
+    assert POOL.phrases["hello"] == "greeting"
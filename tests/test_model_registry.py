@@ -0,0 +1,55 @@
+import json
+
+import pytest
+
+from core.model_manager import DEFAULT_BACKEND, ModelRegistry, ModelRoute
+
+def model(name, **fields):
+    return {
+        "name": name,
+        "display_name": name,
+        "description": "",
+        "size_gb": 1.0,
+        "provider": "ollama",
+        "status": "not_available",
+        **fields
+    }
+
+@pytest.fixture
+def registry(tmp_path):
+    path = tmp_path / "model_registry.json"
+    path.write_text(json.dumps({"models": [
+        model("phi3-mini", backend_model="phi3:mini", aliases=["phi3"], tags=["chat", "fast"]),
+        model("gemma3:270m", status="available", aliases=["phi3-mini"], tags=["chat", "fast", "tiny"]),
+        model("tinyllama", provider="local", model_path="models/tinyllama.gguf", tags=["offline"]),
+        model("whisper-base", provider="huggingface", tags=["transcription"]),
+    ]}))
+    return ModelRegistry(str(path))
+
+def test_registry_name_routes_to_the_backend_model(registry):
+    assert registry.resolve("phi3-mini") == ModelRoute(name="phi3-mini", backend="ollama", target="phi3:mini")
+
+@pytest.mark.parametrize("alias", ["phi3", "phi3:mini"])
+def test_aliases_and_backend_names_route_to_the_registry_model(registry, alias):
+    assert registry.resolve(alias) == registry.resolve("phi3-mini")
+
+def test_an_alias_never_shadows_a_registry_name(registry):
+    assert registry.resolve("phi3-mini").name == "phi3-mini"
+
+def test_backend_follows_the_provider(registry):
+    assert registry.resolve("tinyllama").backend == "llama_cpp"
+    assert registry.resolve("whisper-base").backend is None
+
+def test_tag_prefers_available_models(registry):
+    assert registry.resolve("tag:fast").name == "gemma3:270m"
+    assert registry.resolve("tag:offline").name == "tinyllama"
+    assert registry.models_with_tag("chat") == ["gemma3:270m", "phi3-mini"]
+
+def test_unregistered_names_go_to_the_default_backend(registry):
+    assert registry.resolve("llama3.2:1b") == ModelRoute(name="llama3.2:1b", backend=DEFAULT_BACKEND, target="llama3.2:1b")
+    assert registry.resolve("tag:unknown").target == "tag:unknown"
+
+def test_registry_name_strips_the_latest_tag(registry):
+    assert registry.registry_name("phi3:mini") == "phi3-mini"
+    assert registry.registry_name("phi3:latest") == "phi3-mini"
+    assert registry.registry_name("mistral:latest") == "mistral:latest"
@@ -0,0 +1,75 @@
+from typing import Tuple
+
+import pytest
+
+from services.stream_postprocessor import PostProcessingRules, StreamingPostProcessor
+
+RULES = PostProcessingRules.from_config({
+    "markers_to_remove": ["Response:", "Your response:"],
+    "skip_patterns": ["you are", "rules:"],
+    "max_word_limit": 40,
+    "trim_to_sentence": True
+})
+
+LONG_REPLY = (
+    "Response: The wound is the place where the Light enters you.\n"
+    "You are Rumi, answer warmly.\n"
+    "Sit with your longing a while... it is not an enemy! "
+    "What you seek is seeking you. Let the silence take you to the core of life. "
+    "Be like a river, flowing and giving, never holding on. "
+    "Every storm passes, and the sky remains, patient and open, waiting for you to look up again."
+)
+
+def stream(text: str, size: int, rules: PostProcessingRules = RULES) -> Tuple[StreamingPostProcessor, str]:
+    """Feed `text` in chunks of `size` characters, returning the processor and everything it streamed"""
+    processor = StreamingPostProcessor(rules)
+    output = []
+    for i in range(0, len(text), size):
+        output.append(processor.feed(text[i:i + size]))
+        if processor.done:
+            break
+    output.append(processor.finish())
+    return processor, "".join(output)
+
+@pytest.mark.parametrize("size", [1, 2, 3, 7, 16, 1000])
+def test_streamed_output_matches_process(size):
+    expected = StreamingPostProcessor(RULES).process(LONG_REPLY)
+    processor, streamed = stream(LONG_REPLY, size)
+    assert streamed == expected
+    assert processor.text == expected
+
+@pytest.mark.parametrize("text", [
+    "",
+    "Hello.",
+    "Response: hi there",
+    "line one\n\nline two\n",
+    "Rules: be kind\nLove is the bridge between you and everything.",
+    "\"Is it?\" she asked. (Yes.) Then silence.",
+])
+def test_streamed_output_matches_process_for_short_replies(text):
+    expected = StreamingPostProcessor(RULES).process(text)
+    assert stream(text, 1)[1] == expected
+    assert stream(text, 5)[1] == expected
+
+def test_removes_text_before_marker_and_skipped_lines():
+    text = StreamingPostProcessor(RULES).process(LONG_REPLY)
+    assert text.startswith("The wound is the place")
+    assert "Response:" not in text
+    assert "You are Rumi" not in text
+
+def test_truncates_to_a_sentence_end_within_the_budget():
+    processor, _ = stream(LONG_REPLY, 4)
+    assert processor.done
+    assert processor.word_count <= RULES.max_words
+    assert processor.text.endswith((".", "!", "?"))
+    assert "Every storm passes" not in processor.text
+
+def test_hard_limit_without_sentence_trimming():
+    rules = PostProcessingRules(marker_pattern=None, skip_pattern=None, max_words=5, trim_to_sentence=False)
+    processor, _ = stream("one two three four five six seven eight", 3, rules)
+    assert processor.text == "one two three four five"
+    assert processor.done
+
+def test_feed_after_done_returns_nothing():
+    processor, _ = stream(LONG_REPLY, 50)
+    assert processor.feed("more words.") == ""